@@ -0,0 +1,564 @@
+# backups.py
+"""Backup archives (.parça.zst): a tar of the database, the PDF storage dirs and exports, zstd-compressed.
+
+Archives are written as a stream. tarfile writes through a zstd stream_writer into a bounded queue that the
+/backup response drains, so memory use stays at a few MiB no matter how large the PDF library is.
+The database is copied with SQLite's online backup API first, so the archive holds a consistent snapshot
+even while the app keeps writing (and includes transactions still sitting in the WAL file).
+"""
+import hashlib
+import io
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import tarfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import zstandard as zstd
+from werkzeug.sansio.multipart import NEED_DATA, Epilogue, Field, File, MultipartDecoder
+
+BACKUP_EXTENSION = '.parça.zst'
+STREAM_CHUNK_SIZE = 1 << 20     # Bytes per chunk handed to the response
+STREAM_QUEUE_CHUNKS = 8         # Chunks buffered between the archive writer and the response
+# zstd settings (overridable per request with /backup?level=N&threads=M):
+DEFAULT_COMPRESSION_LEVEL = 1   # Fastest level: PDFs barely compress, so higher levels mostly cost time
+MAX_COMPRESSION_LEVEL = 19      # 20+ ("ultra") need a much larger decompression window
+DEFAULT_COMPRESSION_THREADS = -1    # -1 = one compression worker per logical CPU, 0 = single-threaded
+ENABLE_LONG_DISTANCE_MATCHING = True    # Finds repeats far apart, e.g. the same PDF in pdf/ and pdf_annotated/
+
+# Incremental/differential backups:
+BACKUP_MODES = ('full', 'incremental', 'differential')
+MANIFEST_NAME = 'backup_manifest.json'     # Stored at the root of every archive
+
+last_backup_stats = None        # Stats of the most recent archive, see write_archive()
+_stats_lock = threading.Lock()
+
+
+class BackupCancelled(Exception):
+    """Raised inside the archive writer when the client stopped reading the stream."""
+
+
+def parse_compression_options(level=None, threads=None):
+    """(level, threads) from request/CLI values, falling back to the defaults and clamped to sane ranges."""
+    try:
+        level = min(max(int(level), 1), MAX_COMPRESSION_LEVEL)
+    except (TypeError, ValueError):
+        level = DEFAULT_COMPRESSION_LEVEL
+    try:
+        threads = max(int(threads), -1)
+    except (TypeError, ValueError):
+        threads = DEFAULT_COMPRESSION_THREADS
+    return level, threads
+
+
+def make_compressor(level=DEFAULT_COMPRESSION_LEVEL, threads=DEFAULT_COMPRESSION_THREADS):
+    """ZstdCompressor for backup archives: multi-threaded, with long-distance matching."""
+    params = zstd.ZstdCompressionParameters.from_level(
+        level, threads=threads, enable_ldm=ENABLE_LONG_DISTANCE_MATCHING)
+    return zstd.ZstdCompressor(compression_params=params)
+
+
+def snapshot_database(db_path, dest_path):
+    """Consistent copy of a live database (including its WAL) via the SQLite online backup API."""
+    source = sqlite3.connect(db_path)
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest)
+    finally:
+        dest.close()
+        source.close()
+
+
+class _HashingReader:
+    """Read-only file object passing the data it reads to a hashlib digest."""
+
+    def __init__(self, fileobj, digest):
+        self._fileobj = fileobj
+        self._digest = digest
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self._digest.update(data)
+        return data
+
+
+class _CountingWriter:
+    """Pass-through file object counting the bytes written to it."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self._fileobj.write(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+
+def write_archive(fileobj, members, level=DEFAULT_COMPRESSION_LEVEL, threads=DEFAULT_COMPRESSION_THREADS, manifest=None):
+    """Writes a zstd-compressed tar of members [(path, arcname), ...] to fileobj.
+       Paths that don't exist are skipped; directories are added recursively.
+       With a manifest (see plan_backup), the files it lists are hashed while they are archived and the
+       completed manifest is added last, as MANIFEST_NAME.
+       Returns the achieved ratio and throughput, also kept in last_backup_stats."""
+    global last_backup_stats
+    started = time.perf_counter()
+    compressed = _CountingWriter(fileobj)
+    with make_compressor(level, threads).stream_writer(compressed, closefd=False) as compressor:
+        uncompressed = _CountingWriter(compressor)
+        with tarfile.open(fileobj=uncompressed, mode='w|') as tar:
+            for path, arcname in members:
+                if not os.path.exists(path):
+                    continue
+                entry = manifest['files'].get(arcname) if manifest else None
+                if entry is None or not os.path.isfile(path):
+                    tar.add(path, arcname=arcname)
+                    continue
+                tarinfo = tar.gettarinfo(path, arcname=arcname)
+                digest = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    tar.addfile(tarinfo, _HashingReader(f, digest))
+                entry['sha256'] = digest.hexdigest()
+            if manifest is not None:
+                data = json.dumps(manifest).encode('utf-8')
+                tarinfo = tarfile.TarInfo(MANIFEST_NAME)
+                tarinfo.size = len(data)
+                tarinfo.mtime = int(time.time())
+                tar.addfile(tarinfo, io.BytesIO(data))
+    seconds = time.perf_counter() - started
+    stats = {
+        'level': level,
+        'threads': threads,
+        'uncompressed_bytes': uncompressed.bytes_written,
+        'compressed_bytes': compressed.bytes_written,
+        'ratio': round(uncompressed.bytes_written / compressed.bytes_written, 3) if compressed.bytes_written else 0.0,
+        'seconds': round(seconds, 3),
+        'mb_per_second': round(uncompressed.bytes_written / seconds / 1e6, 1) if seconds > 0 else 0.0,
+        'finished': time.time(),
+    }
+    with _stats_lock:
+        last_backup_stats = stats
+    print(f"Backup archive: {stats['uncompressed_bytes']} -> {stats['compressed_bytes']} bytes "
+          f"(ratio {stats['ratio']}, {stats['mb_per_second']} MB/s, level {level}, threads {threads})")
+    return stats
+
+
+def get_last_backup_stats():
+    with _stats_lock:
+        return dict(last_backup_stats) if last_backup_stats else None
+
+
+class _QueueWriter:
+    """Write-only file object that hands the compressed stream to stream_archive() in fixed-size chunks."""
+
+    def __init__(self, chunks, cancelled):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+
+    def _put(self, item):
+        # Blocks while the queue is full (backpressure), but gives up once the reader is gone
+        while True:
+            if self._cancelled.is_set():
+                raise BackupCancelled()
+            try:
+                self._chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= STREAM_CHUNK_SIZE:
+            self._put(bytes(self._buffer[:STREAM_CHUNK_SIZE]))
+            del self._buffer[:STREAM_CHUNK_SIZE]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        """Sends the buffered tail and the end-of-stream marker."""
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer = bytearray()
+        self._put(None)
+
+
+def stream_archive(members, level=DEFAULT_COMPRESSION_LEVEL, threads=DEFAULT_COMPRESSION_THREADS, on_complete=None,
+                   manifest=None):
+    """Generator yielding a zstd-compressed tar of members as it is written, for a streamed Response.
+       The archive is built by a background thread; at most STREAM_QUEUE_CHUNKS chunks are buffered.
+       Closing the generator (e.g. the client disconnected) stops the writer thread.
+       Headers are sent before compression starts, so the ratio/throughput end up in last_backup_stats.
+       on_complete(stats), if given, runs once the whole archive was sent. manifest: see write_archive()."""
+    chunks = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    writer = _QueueWriter(chunks, cancelled)
+    result = {}
+
+    def produce():
+        try:
+            result['stats'] = write_archive(writer, members, level=level, threads=threads, manifest=manifest)
+            writer.finish()
+        except BackupCancelled:
+            pass
+        except Exception as e:
+            print(f"Backup stream error: {e}")
+            try:
+                writer._put(e)
+            except BackupCancelled:
+                pass
+
+    producer = threading.Thread(target=produce, name='backup-writer', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is None:
+                # Every chunk was handed to the client
+                if on_complete:
+                    on_complete(result['stats'])
+                break
+            if isinstance(item, Exception):
+                raise item  # Headers are already sent: the download ends truncated
+            yield item
+    finally:
+        cancelled.set()
+        producer.join()
+
+
+# --- Incremental / differential backups ---
+# Every archive carries a manifest listing all files (size, mtime, sha256) that existed when it was made,
+# plus its own id and the id of the backup it builds on (parent). The app keeps the manifests of the last
+# backup and of the last full backup in a state file, so the next backup only needs the changed files:
+#   incremental:  changes since the last backup of any kind (restore needs the whole chain)
+#   differential: changes since the last full backup (restore needs the full backup + this one)
+
+def scan_files(roots, known_files=None):
+    """Lists every file under roots [(directory, arcname prefix), ...] without reading any of them.
+       Returns ({arcname: {'size', 'mtime_ns', 'sha256'}}, {arcname: path}). Hashes are reused from
+       known_files when size and mtime are unchanged; new or modified files get sha256 None, to be
+       hashed by write_archive() while they are archived."""
+    known_files = known_files or {}
+    files, paths = {}, {}
+    for directory, prefix in roots:
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                arcname = '/'.join([prefix] + os.path.relpath(path, directory).split(os.sep))
+                stat = os.stat(path)
+                known = known_files.get(arcname)
+                if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+                    sha256 = known['sha256']
+                else:
+                    sha256 = None
+                files[arcname] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+                paths[arcname] = path
+    return files, paths
+
+
+def load_backup_state(state_path):
+    """{'last': manifest or None, 'last_full': manifest or None}"""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'last': None, 'last_full': None}
+
+
+def save_backup_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)  # Never leave a half-written state file
+
+
+def plan_backup(roots, state_path, mode='full'):
+    """Decides what a backup of roots must contain.
+       Returns (manifest, members): members are the (path, arcname) of the files to archive. Nothing is
+       read here: the members' hashes are filled in while write_archive() archives them, so the manifest is
+       only complete once the archive is. Incremental/differential backups fall back to full when there is
+       no previous backup to build on (manifest['mode'] says which one was made)."""
+    state = load_backup_state(state_path)
+    files, paths = scan_files(roots, (state.get('last') or {}).get('files'))
+    base = {'incremental': state.get('last'), 'differential': state.get('last_full')}.get(mode)
+    if base is None:
+        mode = 'full'
+    base_files = base['files'] if base else {}
+    # Unhashed files are new or were modified since the last backup
+    changed = sorted(arcname for arcname, info in files.items()
+                     if info['sha256'] is None or base_files.get(arcname, {}).get('sha256') != info['sha256'])
+    manifest = {
+        'backup_id': uuid.uuid4().hex,
+        'parent': base['backup_id'] if base else None,
+        'mode': mode,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'files': files,
+        'deleted': sorted(set(base_files) - set(files)),
+    }
+    return manifest, [(paths[arcname], arcname) for arcname in changed]
+
+
+def record_backup(state_path, manifest):
+    """Makes manifest the base of the next incremental (and, for full backups, differential) backup.
+       Called only once the archive was completely written."""
+    state = load_backup_state(state_path)
+    state['last'] = manifest
+    if manifest['mode'] == 'full':
+        state['last_full'] = manifest
+    save_backup_state(state_path, state)
+
+
+def record_restore(state_path, manifests):
+    """After restoring a chain the data matches its last archive, so that archive becomes the base of the
+       next incremental backup (and the chain's full backup the base of the next differential).
+       Archives without manifests leave nothing to build on: the next backup will be full."""
+    if manifests[-1] is None:
+        save_backup_state(state_path, {'last': None, 'last_full': None})
+    else:
+        save_backup_state(state_path, {'last': manifests[-1], 'last_full': manifests[0]})
+
+
+def read_manifest(extract_dir):
+    """Manifest of an extracted archive, or None for archives made before manifests existed (always full)."""
+    try:
+        with open(os.path.join(extract_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def order_backup_chain(manifests):
+    """Orders the archives of a restore: a full backup first, then each archive whose parent was applied last
+       (or, for differentials, whose parent is the full backup). manifests is a list with None for archives
+       without a manifest. Returns the list of indexes in apply order; raises ValueError if the set of
+       archives is not exactly one complete chain."""
+    full = [i for i, m in enumerate(manifests) if m is None or m.get('mode', 'full') == 'full']
+    if len(full) != 1:
+        raise ValueError('A restore needs exactly one full backup, plus the incremental/differential backups made after it')
+    order = [full[0]]
+    full_id = manifests[full[0]]['backup_id'] if manifests[full[0]] else None
+    remaining = set(range(len(manifests))) - set(order)
+    while remaining:
+        last_id = manifests[order[-1]]['backup_id'] if manifests[order[-1]] else None
+        candidates = [i for i in remaining if manifests[i]['parent'] == last_id
+                      or (manifests[i]['mode'] == 'differential' and manifests[i]['parent'] == full_id)]
+        if len(candidates) != 1:
+            problem = 'is missing a link' if not candidates else 'has more than one archive for the same step'
+            raise ValueError(f'The selected backups do not form a single chain: it {problem}')
+        order.append(candidates[0])
+        remaining.discard(candidates[0])
+    return order
+
+
+def merge_backup_chain(extract_dirs, manifests, prefixes):
+    """Applies extracted archives (already in chain order) on top of the first one and returns its directory.
+       Files of later archives replace earlier ones; files under prefixes (the archived roots, e.g. 'data/pdf')
+       that are absent from the last manifest were deleted since the full backup and are removed."""
+    base_dir = extract_dirs[0]
+    for extract_dir in extract_dirs[1:]:
+        for dirpath, _, filenames in os.walk(extract_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                target = os.path.join(base_dir, os.path.relpath(path, extract_dir))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+    if manifests[-1] is not None:
+        listed = set(manifests[-1]['files'])
+        for prefix in prefixes:
+            directory = os.path.join(base_dir, *prefix.split('/'))
+            os.makedirs(directory, exist_ok=True)  # Archives only hold files: an empty root has no entry
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    arcname = '/'.join([prefix] + os.path.relpath(path, directory).split(os.sep))
+                    if arcname not in listed:
+                        os.remove(path)
+    return base_dir
+
+
+# --- Restore ---
+# Archives are extracted straight from the upload stream into a staging directory next to data/, then the
+# staged tree replaces data/ with two renames: nothing is copied or recompressed, and the swapped-out tree
+# is kept as the pre-restore snapshot. Marker files make an interrupted swap recoverable at startup.
+ARCHIVE_TOP_LEVEL_FILES = (MANIFEST_NAME, 'export.html', 'export.xlsx')
+SWAP_IN_PROGRESS_MARKER = '.restore_in_progress'   # In the tree being swapped out
+SWAP_RESTORED_MARKER = '.restore_staged'            # In the tree being swapped in
+
+
+class UnsafeArchiveError(ValueError):
+    """Raised by safe_extract() for members that could escape the staging dir or aren't plain files."""
+
+
+def validate_member(member):
+    """Only regular files and directories under data/ (plus the manifest and exports) may be extracted."""
+    name = member.name
+    parts = name.split('/')
+    if name.startswith(('/', '\\')) or '..' in parts or '\\' in name or ':' in parts[0]:
+        raise UnsafeArchiveError(f'Unsafe path in backup: {name}')
+    if not (member.isfile() or member.isdir()):
+        raise UnsafeArchiveError(f'Unsupported entry type in backup (links and devices are not allowed): {name}')
+    if not (parts[0] == 'data' or name in ARCHIVE_TOP_LEVEL_FILES):
+        raise UnsafeArchiveError(f'Unexpected file in backup: {name}')
+
+
+def safe_extract(fileobj, dest_dir):
+    """Decompresses a .parça.zst from fileobj (e.g. the upload stream) and extracts it into dest_dir as it
+       is read, validating every member first. Nothing is written outside dest_dir."""
+    os.makedirs(dest_dir, exist_ok=True)
+    with zstd.ZstdDecompressor().stream_reader(fileobj) as decomp_stream:
+        with tarfile.open(fileobj=decomp_stream, mode='r|') as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extraction_filter = tarfile.data_filter  # Second line of defence where available
+            for member in tar:
+                validate_member(member)
+                tar.extract(member, dest_dir)
+
+
+MULTIPART_READ_SIZE = 1 << 16   # Bytes read from the request body per decoder step
+
+
+class _MultipartEvents:
+    """Pull interface over werkzeug's push-based MultipartDecoder, reading the body as events are needed."""
+
+    def __init__(self, stream, boundary):
+        self._stream = stream
+        self._decoder = MultipartDecoder(boundary)
+        self._eof = False
+
+    def next_event(self):
+        while True:
+            event = self._decoder.next_event()
+            if event is not NEED_DATA:
+                return event
+            if self._eof:
+                raise ValueError('Incomplete upload: the multipart body ended early')
+            chunk = self._stream.read(MULTIPART_READ_SIZE)
+            self._eof = not chunk
+            self._decoder.receive_data(chunk or None)
+
+
+class _MultipartPart(io.RawIOBase):
+    """Read-only file object over the body of the current multipart part."""
+
+    def __init__(self, events):
+        self._events = events
+        self._data = memoryview(b'')
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._data and not self._done:
+            event = self._events.next_event()
+            self._data = memoryview(event.data)
+            self._done = not event.more_data
+        count = min(len(buffer), len(self._data))
+        buffer[:count] = self._data[:count]
+        self._data = self._data[count:]
+        return count
+
+    def drain(self):
+        """Skips whatever the reader left of this part."""
+        while not self._done:
+            self._done = not self._events.next_event().more_data
+        self._data = memoryview(b'')
+
+
+def iter_multipart_files(stream, boundary, field_name):
+    """Yields (filename, file object) for every file part named field_name of a multipart/form-data body,
+       decoded from stream as it is read: nothing is buffered to memory or temp files first. Each file object
+       is only valid until the next one is requested. Other parts are skipped."""
+    events = _MultipartEvents(stream, boundary.encode('latin-1'))
+    while True:
+        event = events.next_event()
+        if isinstance(event, Epilogue):
+            return
+        if isinstance(event, (File, Field)):
+            part = _MultipartPart(events)
+            if isinstance(event, File) and event.name == field_name:
+                yield event.filename, part
+            part.drain()
+
+
+def link_or_copy(source, target):
+    """Hardlinks source to target, copying instead across filesystems or where hardlinks aren't supported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def stage_data_dir(extract_root, data_dir, db_name, pdf_dirs):
+    """Turns the merged extraction (extract_root/data/...) into a complete replacement for data_dir.
+       The restored database (data/new.sqlite) is renamed to db_name, if given; the PDF dirs are created if
+       the backup has none; any other file of the current data_dir (e.g. the backup state) is hardlinked in,
+       not copied. Returns the staged directory, which must be on the same filesystem as data_dir."""
+    staged = os.path.join(extract_root, 'data')
+    os.makedirs(staged, exist_ok=True)
+    replaced = {os.path.basename(p) for p in pdf_dirs}
+    if db_name:
+        os.replace(os.path.join(staged, 'new.sqlite'), os.path.join(staged, db_name))
+        replaced |= {db_name + suffix for suffix in ('', '-wal', '-shm', '-journal')}
+    for pdf_dir in pdf_dirs:
+        os.makedirs(os.path.join(staged, os.path.basename(pdf_dir)), exist_ok=True)
+    for name in os.listdir(data_dir):
+        source = os.path.join(data_dir, name)
+        target = os.path.join(staged, name)
+        if name in replaced or name.startswith('.restore') or not os.path.isfile(source) or os.path.exists(target):
+            continue
+        link_or_copy(source, target)
+    open(os.path.join(staged, SWAP_RESTORED_MARKER), 'w').close()
+    return staged
+
+
+def swap_data_dir(data_dir, staged_dir, previous_dir):
+    """Replaces data_dir with staged_dir using renames only; the old tree becomes previous_dir
+       (an older previous_dir is deleted in the background)."""
+    if os.path.exists(previous_dir):
+        discarded = f"{previous_dir}.discarded_{uuid.uuid4().hex[:8]}"
+        os.rename(previous_dir, discarded)
+        threading.Thread(target=shutil.rmtree, args=(discarded,), kwargs={'ignore_errors': True}, daemon=True).start()
+    open(os.path.join(data_dir, SWAP_IN_PROGRESS_MARKER), 'w').close()
+    os.rename(data_dir, previous_dir)
+    try:
+        os.rename(staged_dir, data_dir)
+    except OSError:
+        os.rename(previous_dir, data_dir)  # Put the current data back
+        os.remove(os.path.join(data_dir, SWAP_IN_PROGRESS_MARKER))
+        raise
+    os.remove(os.path.join(previous_dir, SWAP_IN_PROGRESS_MARKER))
+    os.remove(os.path.join(data_dir, SWAP_RESTORED_MARKER))
+
+
+def recover_interrupted_swap(data_dir, previous_dir):
+    """Finishes or rolls back a swap_data_dir() that was interrupted (e.g. by a crash). Call at startup.
+       Returns True if anything had to be fixed."""
+    in_progress = os.path.join(previous_dir, SWAP_IN_PROGRESS_MARKER)
+    if not os.path.exists(in_progress):
+        return False
+    restored = os.path.join(data_dir, SWAP_RESTORED_MARKER)
+    if os.path.exists(restored):
+        # Both renames happened: only the markers are left over
+        os.remove(restored)
+    else:
+        # Stopped between the renames: put the old tree back. Whatever is at data_dir now is normally just
+        # the empty dirs globals.py creates at startup; anything more is moved aside, never deleted.
+        if os.path.exists(data_dir):
+            if any(files for _, _, files in os.walk(data_dir)):
+                os.rename(data_dir, f"{data_dir}.recovered_{uuid.uuid4().hex[:8]}")
+            else:
+                shutil.rmtree(data_dir)
+        os.rename(previous_dir, data_dir)
+        in_progress = os.path.join(data_dir, SWAP_IN_PROGRESS_MARKER)
+    os.remove(in_progress)
+    return True
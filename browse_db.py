@@ -3,38 +3,58 @@ import sqlite3
 import json
 import argparse
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, abort, send_from_directory, Response, send_file
-from markupsafe import Markup 
+from flask import Flask, render_template, stream_template, stream_with_context, request, jsonify, abort, send_from_directory, Response, send_file
+from markupsafe import Markup, escape
 import tempfile
 import os
 import sys
 import threading
+import warnings
 import webbrowser
 import rjsmin
-import io
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
 from openpyxl.styles import Font, PatternFill 
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
 from werkzeug.utils import secure_filename 
-import gzip
+import zlib
 import base64
 import zstandard as zstd
 import tarfile
 import shutil
+import signal
+import functools
+import hashlib
 
 import globals
+import backups
+import compression
+import db_pool
+import dedup
+import export_cache
+import fragment_cache
+import import_jobs
+import migrations
+import paper_stats
 
 # Define default year range - For this app:
 DEFAULT_YEAR_FROM = 1800
 DEFAULT_YEAR_TO = 2100
 DEFAULT_MIN_PAGE_COUNT = 4
+# Keyset pagination for /load_table and / (only used when a page_size parameter is passed):
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 2000
 
 app = Flask(__name__)
 DATABASE = None # Will be set from command line argument
 
-def render_papers_table(hide_offtopic_param=None, year_from_param=None, year_to_param=None, min_page_count_param=None):
+def render_papers_table(hide_offtopic_param=None, year_from_param=None, year_to_param=None, min_page_count_param=None,
+                        page_size_param=None, sort_by_param=None, sort_dir_param=None):
     """Fetches papers based on filters and renders the papers_table.html template. 
-       Used for initial render from / and XHR updates."""
+       Used for initial render from / and XHR updates.
+       If page_size_param is given, only the first window of the keyset-paginated result is rendered."""
     # Determine hide_offtopic state
     hide_offtopic = True # Default
     if hide_offtopic_param is not None:
@@ -45,40 +65,149 @@ def render_papers_table(hide_offtopic_param=None, year_from_param=None, year_to_
     year_to_value = int(year_to_param) if year_to_param is not None else DEFAULT_YEAR_TO
     min_page_count_value = int(min_page_count_param) if min_page_count_param is not None else DEFAULT_MIN_PAGE_COUNT
 
-    # Fetch papers with ALL the filters applied
-    papers = fetch_papers(
-        hide_offtopic=hide_offtopic,
-        year_from=year_from_value,
-        year_to=year_to_value,
-        min_page_count=min_page_count_value,
-    )
+    page_size = parse_page_size(page_size_param)
+    next_cursor = None
+    filtered_total = None
+    if page_size:
+        # Paginated mode: only the first window, plus the total for the footer
+        papers, filtered_total, next_cursor = fetch_papers_page(
+            hide_offtopic=hide_offtopic,
+            year_from=year_from_value,
+            year_to=year_to_value,
+            min_page_count=min_page_count_value,
+            sort_by=sort_by_param,
+            sort_dir=sort_dir_param,
+            limit=page_size,
+        )
+    else:
+        # Fetch papers with ALL the filters applied
+        papers = fetch_papers(
+            hide_offtopic=hide_offtopic,
+            year_from=year_from_value,
+            year_to=year_to_value,
+            min_page_count=min_page_count_value,
+        )
 
     # Render the table template fragment, passing the search query value for the input field
     rendered_table = render_template(
         'papers_table.html',
-        papers=papers,
-        type_emojis=globals.TYPE_EMOJIS,
-        default_type_emoji=globals.DEFAULT_TYPE_EMOJI,
-        pdf_emojis=globals.PDF_EMOJIS, # Pass the PDF emojis dictionary
+        rows_html=render_paper_rows(papers),
         hide_offtopic=hide_offtopic,
         # Pass the *string representations* of the values to the template for input fields
         year_from_value=str(year_from_value),
         year_to_value=str(year_to_value),
-        min_page_count_value=str(min_page_count_value)
+        min_page_count_value=str(min_page_count_value),
+        page_size=page_size,
+        filtered_total=filtered_total,
+        next_cursor=next_cursor
     )
     return rendered_table
 
+def render_papers_window(hide_offtopic_param=None, year_from_param=None, year_to_param=None, min_page_count_param=None,
+                         page_size_param=None, sort_by_param=None, sort_dir_param=None, cursor_param=None):
+    """Renders a single keyset-paginated window of table rows (no <tbody> wrapper) for /load_table.
+       Returns a dict ready to be serialized as JSON."""
+    hide_offtopic, year_from_value, year_to_value, min_page_count_value = get_default_filter_values(
+        hide_offtopic_param, year_from_param, year_to_param, min_page_count_param
+    )
+    page_size = parse_page_size(page_size_param) or DEFAULT_PAGE_SIZE
+    papers, filtered_total, next_cursor = fetch_papers_page(
+        hide_offtopic=hide_offtopic,
+        year_from=year_from_value,
+        year_to=year_to_value,
+        min_page_count=min_page_count_value,
+        sort_by=sort_by_param,
+        sort_dir=sort_dir_param,
+        cursor=cursor_param,
+        limit=page_size,
+    )
+    rows_html = render_template(
+        'papers_table_rows.html',
+        rows_html=render_paper_rows(papers),
+        next_cursor=next_cursor
+    )
+    return {
+        'status': 'success',
+        'html': rows_html,
+        'count': len(papers),
+        'total': filtered_total,
+        'next_cursor': next_cursor
+    }
+
+# --- Per-row fragment cache ---
+ROW_TEMPLATE = 'papers_table_row.html'
+_fragment_cache = None
+_fragment_cache_lock = threading.Lock()
+
+def get_fragment_cache():
+    """Returns the in-memory cache of rendered table rows, created on first use."""
+    global _fragment_cache
+    with _fragment_cache_lock:
+        if _fragment_cache is None:
+            _fragment_cache = fragment_cache.FragmentCache(globals.FRAGMENT_CACHE_MAX_BYTES)
+        return _fragment_cache
+
+def row_template_key():
+    """Identity of the row template (edits must not serve old fragments) and of the URL prefix url_for() adds."""
+    stat = os.stat(os.path.join(app.root_path, app.template_folder, ROW_TEMPLATE))
+    return (stat.st_mtime_ns, stat.st_size, request.script_root)
+
+def render_paper_rows(papers):
+    """HTML of the table rows for papers (process_paper_row dicts): cached fragments are concatenated and
+       only papers changed since their last render go through Jinja."""
+    cache = get_fragment_cache()
+    template_key = row_template_key()
+    render_row = None
+    fragments = []
+    for paper in papers:
+        version = (paper.get('changed'), paper['pdf_state'], paper['pdf_filename'], template_key)
+        html = cache.get(paper['id'], version)
+        if html is None:
+            if render_row is None:
+                # The template's macro, bound to the shared context once: cheaper than a render per row
+                context = {
+                    'type_emojis': globals.TYPE_EMOJIS,
+                    'default_type_emoji': globals.DEFAULT_TYPE_EMOJI,
+                    'pdf_emojis': globals.PDF_EMOJIS,
+                }
+                app.update_template_context(context)
+                render_row = app.jinja_env.get_template(ROW_TEMPLATE).make_module(context).render_row
+            html = str(render_row(paper))
+            cache.put(paper['id'], version, html)
+        fragments.append(html)
+    return Markup(''.join(fragments))
+
+# --- Known PDF state per paper ---
+# (pdf_filename, pdf_state) of the papers served by /serve_pdf, as last reconciled with the files on
+# disk. Lets serve_pdf skip the database unless the files changed; writes to the paper drop the entry.
+_pdf_states = {}
+_pdf_states_lock = threading.Lock()
+
+def get_pdf_state(paper_id):
+    with _pdf_states_lock:
+        return _pdf_states.get(paper_id)
+
+def remember_pdf_state(paper_id, pdf_filename, pdf_state):
+    with _pdf_states_lock:
+        _pdf_states[paper_id] = (pdf_filename, pdf_state)
+
+def forget_pdf_states(paper_id=None):
+    """Drops the known PDF state of one paper (after it was updated or deleted), or of all papers."""
+    with _pdf_states_lock:
+        if paper_id is None:
+            _pdf_states.clear()
+        else:
+            _pdf_states.pop(paper_id, None)
+
 # DB functions - should not be moved away from Flask process here:
 def get_db_connection():
-    """Create a connection to the SQLite database and ensure FTS tables."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row 
-    return conn
+    """Get this thread's pooled connection to the SQLite database (see db_pool.py).
+       conn.close(), or leaving `with get_db_connection() as conn:`, returns it to the pool; rows come back
+       as sqlite3.Row."""
+    return db_pool.get_connection(DATABASE)
 
-def fetch_papers(hide_offtopic=True, year_from=None, year_to=None, min_page_count=None):
-    """Fetch papers from the database, applying various optional filters."""
-    conn = get_db_connection()
-    base_query = "SELECT p.* FROM papers p"
+def build_filter_conditions(hide_offtopic=True, year_from=None, year_to=None, min_page_count=None):
+    """Builds the WHERE conditions and parameters shared by fetch_papers and fetch_papers_page."""
     conditions = []
     params = []
 
@@ -105,6 +234,26 @@ def fetch_papers(hide_offtopic=True, year_from=None, year_to=None, min_page_coun
             params.append(min_page_count)
         except (ValueError, TypeError):
             pass
+    return conditions, params
+
+def process_paper_row(paper):
+    """Converts a DB row into the dict shape expected by the table templates."""
+    paper_dict = dict(paper)
+    paper_dict['pdf_filename'] = paper_dict.get('pdf_filename')     # Could be None or a string
+    paper_dict['pdf_state'] = paper_dict.get('pdf_state', 'none')   # Default state if not present
+    paper_dict['changed_formatted'] = format_changed_timestamp(paper_dict.get('changed'))
+    return paper_dict
+
+def fetch_papers(hide_offtopic=True, year_from=None, year_to=None, min_page_count=None):
+    """Fetch papers from the database, applying various optional filters."""
+    return list(iter_papers(hide_offtopic, year_from, year_to, min_page_count))
+
+def iter_papers(hide_offtopic=True, year_from=None, year_to=None, min_page_count=None):
+    """Same papers as fetch_papers, yielded one at a time from the cursor: exports that write each paper out
+       as they go never hold the whole result. The connection is held until the iteration ends."""
+    conn = get_db_connection()
+    base_query = "SELECT p.* FROM papers p"
+    conditions, params = build_filter_conditions(hide_offtopic, year_from, year_to, min_page_count)
 
     # --- Build Final Query ---
     # Start with base query
@@ -115,142 +264,276 @@ def fetch_papers(hide_offtopic=True, year_from=None, year_to=None, min_page_coun
         query_parts.append("WHERE " + " AND ".join(conditions))
 
     # Add ORDER BY clause for user comments first
-    # This sorts rows where user_trace is NOT NULL and NOT empty string first
-    query_parts.append("ORDER BY (p.user_trace IS NULL OR p.user_trace = '') ASC")
+    # has_user_trace is an indexed generated column: 1 when user_trace is NOT NULL and NOT empty string
+    query_parts.append("ORDER BY p.has_user_trace DESC")
 
     # Combine all parts
     query = " ".join(query_parts)
 
     try:
-        papers = conn.execute(query, params).fetchall()
+        try:
+            cursor = conn.execute(query, params)
+        except sqlite3.Error as e:
+            print(f"Database error during fetch_papers: {e}")
+            raise # Re-raise to be caught by the calling function (e.g., render_papers_table)
+        for paper in cursor:
+            yield process_paper_row(paper)
+    finally:
+        conn.close()
+
+# Keyset pagination:
+# Maps the client-side sort keys (th[data-sort] in index.html) to SQL expressions that order
+# the same way filtering.js performSort() does. NULLs are coalesced so row-value comparisons work.
+# Text keys use COLLATE NOCASE, which performSort() reproduces with compareNoCase() for windowed tables.
+SORT_KEY_EXPRESSIONS = {
+    'pdf-link': "CASE p.pdf_state WHEN 'annotated' THEN 3 WHEN 'PDF' THEN 2 WHEN 'paywalled' THEN 0 ELSE 1 END",
+    'title': "COALESCE(p.title, '') COLLATE NOCASE",
+    'authors': "COALESCE(p.authors, '') COLLATE NOCASE",
+    'year': "COALESCE(p.year, 0)",
+    'page_count': "COALESCE(p.page_count, 0)",
+    'journal': "COALESCE(p.journal, '') COLLATE NOCASE",
+    'type': "COALESCE(p.type, '') COLLATE NOCASE",
+    'is_offtopic': "CASE p.is_offtopic WHEN 1 THEN 2 WHEN 0 THEN 1 ELSE 0 END",
+    'relevance': "COALESCE(p.relevance, 0)",
+    'is_survey': "CASE p.is_survey WHEN 1 THEN 2 WHEN 0 THEN 1 ELSE 0 END",
+    'changed': "COALESCE(p.changed, '')",
+    'user_comment_state': "CASE WHEN p.user_trace IS NULL OR p.user_trace = '' THEN 1 ELSE 2 END",
+}
+# Default order (no client sort): commented papers first, same as fetch_papers
+DEFAULT_SORT_EXPRESSION = "CASE WHEN p.user_trace IS NULL OR p.user_trace = '' THEN 1 ELSE 0 END"
+
+def parse_page_size(page_size_param):
+    """Returns a clamped page size, or None if pagination was not requested."""
+    if page_size_param is None or page_size_param == '':
+        return None
+    try:
+        page_size = int(page_size_param)
+    except (ValueError, TypeError):
+        return None
+    if page_size <= 0:
+        return None
+    return min(page_size, MAX_PAGE_SIZE)
+
+def encode_cursor(sort_value, paper_id):
+    """Encodes the last (sort value, id) of a window into an opaque URL-safe cursor."""
+    raw = json.dumps([sort_value, paper_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decodes a cursor created by encode_cursor. Returns None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, paper_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return sort_value, paper_id
+    except (ValueError, TypeError):
+        return None
+
+def fetch_papers_page(hide_offtopic=True, year_from=None, year_to=None, min_page_count=None,
+                      sort_by=None, sort_dir=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Fetch one window of papers using keyset pagination on (sort key, id).
+       Returns (papers, filtered_total, next_cursor); next_cursor is None on the last window."""
+    sort_expression = SORT_KEY_EXPRESSIONS.get(sort_by, DEFAULT_SORT_EXPRESSION)
+    descending = sort_by in SORT_KEY_EXPRESSIONS and (sort_dir or '').upper() == 'DESC'
+    conditions, params = build_filter_conditions(hide_offtopic, year_from, year_to, min_page_count)
+    where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    page_conditions = list(conditions)
+    page_params = list(params)
+    decoded_cursor = decode_cursor(cursor)
+    if decoded_cursor is not None:
+        # Row-value comparison lets SQLite seek straight past the previous window
+        page_conditions.append(f"({sort_expression}, p.id) {'<' if descending else '>'} (?, ?)")
+        page_params.extend(decoded_cursor)
+    page_where_clause = ("WHERE " + " AND ".join(page_conditions)) if page_conditions else ""
+    direction = "DESC" if descending else "ASC"
+    query = (f"SELECT p.*, {sort_expression} AS sort_value FROM papers p {page_where_clause} "
+             f"ORDER BY sort_value {direction}, p.id {direction} LIMIT ?")
+
+    conn = get_db_connection()
+    try:
+        # Fetch one extra row to know whether there is a next window
+        rows = conn.execute(query, page_params + [limit + 1]).fetchall()
+        filtered_total = conn.execute(f"SELECT COUNT(*) FROM papers p {where_clause}", params).fetchone()[0]
     except sqlite3.Error as e:
+        print(f"Database error during fetch_papers_page: {e}")
+        raise
+    finally:
         conn.close()
-        print(f"Database error during fetch_papers: {e}")
-        raise # Re-raise to be caught by the calling function (e.g., render_papers_table)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    papers = [process_paper_row(row) for row in rows]
+    next_cursor = encode_cursor(rows[-1]['sort_value'], rows[-1]['id']) if has_more and rows else None
+    return papers, filtered_total, next_cursor
+
+# Full-text search (FTS5 index created by migrations.create_fts_index):
+DEFAULT_SEARCH_LIMIT = 100
+# bm25 column weights, in migrations.FTS_COLUMNS order: title, abstract, keywords, authors, user_trace
+FTS_BM25_WEIGHTS = (10.0, 1.0, 4.0, 3.0, 2.0)
+SNIPPET_START_MARK = '\x02'
+SNIPPET_END_MARK = '\x03'
+
+def build_fts_query(search_text):
+    """Turns free user input into a safe FTS5 MATCH expression.
+       Every whitespace-separated term is quoted (so FTS operators/punctuation can't raise syntax errors)
+       and prefix-matched; terms are ANDed, like the client-side search."""
+    terms = []
+    for term in search_text.split():
+        term = term.replace('"', '')
+        if term:
+            terms.append(f'"{term}"*')
+    return " ".join(terms)
+
+def search_papers(search_text, limit=DEFAULT_SEARCH_LIMIT, with_snippets=True):
+    """Ranked full-text search. Returns a list of dicts with id, score (bm25, lower is better) and snippet."""
+    fts_query = build_fts_query(search_text or '')
+    if not fts_query:
+        return []
+    weights = ", ".join(str(w) for w in FTS_BM25_WEIGHTS)
+    snippet_column = (f", snippet(papers_fts, -1, '{SNIPPET_START_MARK}', '{SNIPPET_END_MARK}', '…', 16) AS snippet"
+                      if with_snippets else "")
+    query = (f"SELECT p.id, bm25(papers_fts, {weights}) AS score{snippet_column} "
+             "FROM papers_fts JOIN papers p ON p.rowid = papers_fts.rowid "
+             "WHERE papers_fts MATCH ? ORDER BY score")
+    params = [fts_query]
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(query, params).fetchall()
     finally:
         conn.close()
 
-    # --- Process Results (Same as before) ---
-    paper_list = []
-    for paper in papers:
-        paper_dict = dict(paper)
-        paper_dict['pdf_filename'] = paper_dict.get('pdf_filename')     # Could be None or a string
-        paper_dict['pdf_state'] = paper_dict.get('pdf_state', 'none')   # Default state if not present
-        paper_dict['changed_formatted'] = format_changed_timestamp(paper_dict.get('changed'))
-        paper_list.append(paper_dict)
-    
-    return paper_list
+    results = []
+    for row in rows:
+        result = {'id': row['id'], 'score': row['score']}
+        if with_snippets:
+            # Escape the user text first, then turn the match markers into <mark> tags
+            snippet = str(escape(row['snippet'] or ''))
+            result['snippet'] = snippet.replace(SNIPPET_START_MARK, '<mark>').replace(SNIPPET_END_MARK, '</mark>')
+        results.append(result)
+    return results
 
 def update_paper_custom_fields(paper_id, data, changed_by="user"):
     """Update the custom fields for a paper and audit fields.
        Handles partial updates based on keys present in `data`."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    changed_timestamp = datetime.utcnow().isoformat() + 'Z'
-    update_fields = []
-    update_values = []
-
-    # Handle Main Boolean Fields (Partial Update)
-    main_bool_fields = ['is_survey', 'is_offtopic']
-    for field in main_bool_fields:
-        if field in data:
-            value = data[field]
-            if isinstance(value, str):
-                if value.lower() in ('true', '1', 'on'):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        changed_timestamp = datetime.utcnow().isoformat() + 'Z'
+        update_fields = []
+        update_values = []
+
+        # Handle Main Boolean Fields (Partial Update)
+        main_bool_fields = ['is_survey', 'is_offtopic']
+        for field in main_bool_fields:
+            if field in data:
+                value = data[field]
+                if isinstance(value, str):
+                    if value.lower() in ('true', '1', 'on'):
+                        update_fields.append(f"{field} = ?")
+                        update_values.append(1)
+                    elif value.lower() in ('false', '0'):
+                        update_fields.append(f"{field} = ?")
+                        update_values.append(0)
+                    else: # 'unknown', '', None, etc.
+                        update_fields.append(f"{field} = ?")
+                        update_values.append(None)
+                elif value is True:
                     update_fields.append(f"{field} = ?")
                     update_values.append(1)
-                elif value.lower() in ('false', '0'):
+                elif value is False:
                     update_fields.append(f"{field} = ?")
                     update_values.append(0)
-                else: # 'unknown', '', None, etc.
+                else: # value is None or numeric
                     update_fields.append(f"{field} = ?")
-                    update_values.append(None)
-            elif value is True:
-                update_fields.append(f"{field} = ?")
-                update_values.append(1)
-            elif value is False:
-                update_fields.append(f"{field} = ?")
-                update_values.append(0)
-            else: # value is None or numeric
-                update_fields.append(f"{field} = ?")
-                update_values.append(int(bool(value)) if value is not None else None)
-
-    # Handle Research Area (Partial Update)
-    if 'research_area' in data:
-        update_fields.append("research_area = ?")
-        update_values.append(data['research_area'])
-
-    # Handle Page Count and potentially update 'pages' column
-    page_count_value_for_pages_update = None # Variable to hold the value for potential 'pages' update
-    if 'page_count' in data:
-        page_count_value = data['page_count']
-        if page_count_value is not None:
-            try:
-                page_count_value = int(page_count_value)
-                # Store the integer value for potential 'pages' update
-                page_count_value_for_pages_update = page_count_value
-            except (ValueError, TypeError):
-                page_count_value = None
-                page_count_value_for_pages_update = None # Reset if invalid
-        else:
-            page_count_value_for_pages_update = None # Reset if None
-        update_fields.append("page_count = ?")
-        update_values.append(page_count_value)
-
-        # NEW LOGIC: If 'pages' column is empty and 'page_count' is valid, update 'pages'
-        cursor.execute("SELECT pages FROM papers WHERE id = ?", (paper_id,))
-        row = cursor.fetchone()
-        if row:
-            current_pages_value = row['pages']
-            # Check if 'pages' is effectively empty/blank/null
-            if current_pages_value is None or (isinstance(current_pages_value, str) and current_pages_value.strip() == ""):
-                # If 'pages' is blank and we have a valid page_count to set
-                if page_count_value_for_pages_update is not None:
-                    # Add the update for the 'pages' column
-                    update_fields.append("pages = ?")
-                    # Convert the integer page count back to string for the 'pages' TEXT column
-                    update_values.append(str(page_count_value_for_pages_update))
-
-    # Handle Verified By (Simplified - only allow 'user' or clear)
-    if 'verified_by' in data:
-        verified_by_value = data['verified_by']
-        # Ensure value is either 'user' or None.
-        if verified_by_value != 'user':
-            verified_by_value = None
-        update_fields.append("verified_by = ?")
-        update_values.append(verified_by_value)
+                    update_values.append(int(bool(value)) if value is not None else None)
+
+        # Handle Research Area (Partial Update)
+        if 'research_area' in data:
+            update_fields.append("research_area = ?")
+            update_values.append(data['research_area'])
+
+        # Handle Page Count and potentially update 'pages' column
+        page_count_value_for_pages_update = None # Variable to hold the value for potential 'pages' update
+        if 'page_count' in data:
+            page_count_value = data['page_count']
+            if page_count_value is not None:
+                try:
+                    page_count_value = int(page_count_value)
+                    # Store the integer value for potential 'pages' update
+                    page_count_value_for_pages_update = page_count_value
+                except (ValueError, TypeError):
+                    page_count_value = None
+                    page_count_value_for_pages_update = None # Reset if invalid
+            else:
+                page_count_value_for_pages_update = None # Reset if None
+            update_fields.append("page_count = ?")
+            update_values.append(page_count_value)
+
+            # NEW LOGIC: If 'pages' column is empty and 'page_count' is valid, update 'pages'
+            cursor.execute("SELECT pages FROM papers WHERE id = ?", (paper_id,))
+            row = cursor.fetchone()
+            if row:
+                current_pages_value = row['pages']
+                # Check if 'pages' is effectively empty/blank/null
+                if current_pages_value is None or (isinstance(current_pages_value, str) and current_pages_value.strip() == ""):
+                    # If 'pages' is blank and we have a valid page_count to set
+                    if page_count_value_for_pages_update is not None:
+                        # Add the update for the 'pages' column
+                        update_fields.append("pages = ?")
+                        # Convert the integer page count back to string for the 'pages' TEXT column
+                        update_values.append(str(page_count_value_for_pages_update))
+
+        # Handle Verified By (Simplified - only allow 'user' or clear)
+        if 'verified_by' in data:
+            verified_by_value = data['verified_by']
+            # Ensure value is either 'user' or None.
+            if verified_by_value != 'user':
+                verified_by_value = None
+            update_fields.append("verified_by = ?")
+            update_values.append(verified_by_value)
         
-    # Always update audit fields for any change
-    update_fields.append("changed = ?")
-    update_values.append(changed_timestamp)
-    update_fields.append("changed_by = ?")
-    update_values.append(changed_by)
-
-    # Any remaining keys in 'data' are assumed to be direct column names
-    for key, value in data.items():
-        # Skip keys already handled or special keys
-        if key in ['id', 'changed', 'changed_by', 'verified_by'] or key in main_bool_fields:
-            continue
-        # Treat remaining keys as direct column updates
-        update_fields.append(f"{key} = ?")
-        update_values.append(value)
-
-    if update_fields:
-        update_query = f"UPDATE papers SET {', '.join(update_fields)} WHERE id = ?"
-        update_values.append(paper_id)
-
-        cursor.execute(update_query, update_values)
-        conn.commit()
-        rows_affected = cursor.rowcount
-    else:
-        rows_affected = 0 # No fields to update
+        # Always update audit fields for any change
+        update_fields.append("changed = ?")
+        update_values.append(changed_timestamp)
+        update_fields.append("changed_by = ?")
+        update_values.append(changed_by)
+
+        # Any remaining keys in 'data' are assumed to be direct column names
+        for key, value in data.items():
+            # Skip keys already handled or special keys
+            if key in ['id', 'changed', 'changed_by', 'verified_by'] or key in main_bool_fields:
+                continue
+            # Treat remaining keys as direct column updates
+            update_fields.append(f"{key} = ?")
+            update_values.append(value)
+
+        if update_fields:
+            update_query = f"UPDATE papers SET {', '.join(update_fields)} WHERE id = ?"
+            update_values.append(paper_id)
+
+            with db_pool.write_lock():
+                cursor.execute(update_query, update_values)
+                if cursor.rowcount:
+                    if 'title' in data:
+                        # The title trigger cleared the fingerprint: store the new one in the same transaction
+                        conn.execute("UPDATE papers SET title_fingerprint = ? WHERE id = ?",
+                                     (dedup.title_fingerprint(data['title']), paper_id))
+                    migrations.bump_revision(conn)
+                conn.commit()
+            rows_affected = cursor.rowcount
+            get_fragment_cache().invalidate(paper_id)
+            forget_pdf_states(paper_id)
+        else:
+            rows_affected = 0 # No fields to update
 
-    conn.close()
+        # Re-read the row on the same connection instead of opening a second one
+        updated_paper = conn.execute("SELECT * FROM papers WHERE id = ?", (paper_id,)).fetchone() if rows_affected > 0 else None
 
     if rows_affected > 0:
-        conn = get_db_connection()
-        updated_paper = conn.execute("SELECT * FROM papers WHERE id = ?", (paper_id,)).fetchone()
-        conn.close()
         if updated_paper:
             updated_dict = dict(updated_paper)
             updated_dict['changed_formatted'] = format_changed_timestamp(updated_dict.get('changed'))
@@ -364,17 +647,18 @@ def font_to_data_uri(font_path):
         
     return f"data:{mime_type};base64,{base64_data}", format_str
 
+# Font files embedded in the static export (file under static/fonts, family, weight, style)
+EMBEDDED_FONT_FILES = [
+    ('Twemoji.Mozilla.ttf', 'Twemoji Mozilla', 400, 'normal'),
+    ('inter-tight-v7-latin_latin-ext-300.woff2', 'Inter Tight', 300, 'normal'),
+    ('inter-tight-v7-latin_latin-ext-regular.woff2', 'Inter Tight', 400, 'normal'),
+    ('inter-tight-v7-latin_latin-ext-600.woff2', 'Inter Tight', 600, 'normal'),
+]
+
 def embed_fonts_in_css(static_dir):
     """Convert font files to Base64 data URIs and return CSS with embedded fonts."""
     fonts_dir = os.path.join(static_dir, 'fonts')
-    
-    # Define font files to embed
-    font_files = [
-        ('Twemoji.mozilla.ttf', 'Twemoji Mozilla', 400, 'normal'),
-        ('inter-tight-v7-latin_latin-ext-300.woff2', 'Inter Tight', 300, 'normal'),
-        ('inter-tight-v7-latin_latin-ext-regular.woff2', 'Inter Tight', 400, 'normal'),
-        ('inter-tight-v7-latin_latin-ext-600.woff2', 'Inter Tight', 600, 'normal'),
-    ]
+    font_files = EMBEDDED_FONT_FILES
     
     css_content = "/* Embedded Fonts */\n"
     
@@ -416,247 +700,483 @@ def embed_fonts_in_css(static_dir):
     return css_content
 
 # Core Export Generation Functions
-def generate_html_export_content(papers, hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export=False):
-    """Generates the full HTML content string for the static export."""
-    # Strip fat text for lite export:
-    if is_lite_export: # Blank Abstract, AI traces;
-        for paper in papers:
-            paper['abstract'] = '' 
-
-    style_css_content = ""
-    chart_js_content = ""
-    chart_js_datalabels_content = ""
-    d3_js_content = ""
-    d3_cloud_js_content = ""
-    ghpages_js_content = ""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    static_dir = os.path.join(script_dir, 'static')
-    
-    # Load and embed fonts as Base64 data URIs
-    fonts_css_content = embed_fonts_in_css(static_dir)
-    
-    try:
-        with open(os.path.join(static_dir, 'libs/chart.min.js'), 'r', encoding='utf-8') as f:
-            chart_js_content = f.read()
-        with open(os.path.join(static_dir, 'libs/chartjs-plugin-datalabels.min.js'), 'r', encoding='utf-8') as f:
-            chart_js_datalabels_content = f.read()
-        with open(os.path.join(static_dir, 'libs/d3.min.js'), 'r', encoding='utf-8') as f:
-            d3_js_content = f.read()
-        with open(os.path.join(static_dir, 'libs/d3-cloud.min.js'), 'r', encoding='utf-8') as f:
-            d3_cloud_js_content = f.read()
+# --- Static export asset bundle ---
+# Scripts embedded in every static export: template variable -> file under static/
+EXPORT_SCRIPT_FILES = {
+    'chart_js_content': 'libs/chart.min.js',
+    'chart_js_datalabels_content': 'libs/chartjs-plugin-datalabels.min.js',
+    'd3_js_content': 'libs/d3.min.js',
+    'd3_cloud_js_content': 'libs/d3-cloud.min.js',
+    'stats_js_content': 'stats.js',
+    'filtering_js_content': 'filtering.js',
+    'ghpages_js_content': 'ghpages.js',
+    'pako_js_content': 'libs/pako.min.js',  # Used by loader.html
+}
+_export_assets = {'key': None, 'assets': None}
+_export_assets_lock = threading.Lock()
+
+def export_asset_key(static_dir):
+    """Identity of the current asset sources: (path, mtime, size) of every script, style.css and font."""
+    paths = [os.path.join(static_dir, path) for path in EXPORT_SCRIPT_FILES.values()]
+    paths.append(os.path.join(static_dir, 'style.css'))
+    paths += [os.path.join(static_dir, 'fonts', font[0]) for font in EMBEDDED_FONT_FILES]
+    key = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            key.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            key.append((path, None, None))
+    return tuple(key)
 
+def build_export_assets(static_dir):
+    """Reads and minifies the static export scripts and builds the CSS with embedded fonts."""
+    assets = {}
+    try:
+        for name, path in EXPORT_SCRIPT_FILES.items():
+            with open(os.path.join(static_dir, path), 'r', encoding='utf-8') as f:
+                content = f.read()
+            # Libraries shipped as .min.js are already minified: running jsmin again only costs time
+            assets[name] = Markup(content if path.endswith('.min.js') else rjsmin.jsmin(content))
         with open(os.path.join(static_dir, 'style.css'), 'r', encoding='utf-8') as f:
             style_css_content = f.read()
-        with open(os.path.join(static_dir, 'ghpages.js'), 'r', encoding='utf-8') as f:
-            ghpages_js_content = f.read()
-        with open(os.path.join(static_dir, 'stats.js'), 'r', encoding='utf-8') as f:
-            stats_js_content = f.read()
-        with open(os.path.join(static_dir, 'filtering.js'), 'r', encoding='utf-8') as f:
-            filtering_js_content = f.read()
     except FileNotFoundError as e:
         print(f"Warning: Static file not found during HTML export generation: {e}")
         raise
-
     # Combine fonts CSS with main CSS
-    style_css_content = fonts_css_content + "\n" + style_css_content
-    
     # style_css_content = rcssmin.cssmin(style_css_content)
-    
-    chart_js_content = rjsmin.jsmin(chart_js_content)
-    chart_js_datalabels_content = rjsmin.jsmin(chart_js_datalabels_content)
-    d3_js_content = rjsmin.jsmin(d3_js_content)
-    d3_cloud_js_content = rjsmin.jsmin(d3_cloud_js_content)
-
-    stats_js_content = rjsmin.jsmin(stats_js_content)
-    filtering_js_content = rjsmin.jsmin(filtering_js_content)
-    ghpages_js_content = rjsmin.jsmin(ghpages_js_content)
-
-    # --- Render the static export template ---
-    papers_table_static_export = render_template(
-        'papers_table_static_export.html',
-        papers=papers,
-        type_emojis=globals.TYPE_EMOJIS,
-        pdf_emojis=globals.PDF_EMOJIS,
-        default_type_emoji=globals.DEFAULT_TYPE_EMOJI,
-        hide_offtopic=hide_offtopic,
-        year_from_value=str(year_from_value),
-        year_to_value=str(year_to_value),
-        min_page_count_value=str(min_page_count_value),
-    )
-    full_html_content = render_template(
+    assets['style_css_content'] = Markup(embed_fonts_in_css(static_dir) + "\n" + style_css_content)
+    return assets
+
+def get_export_assets():
+    """Embedded scripts and CSS for the static export ({template variable: Markup}). Built on first use and
+       reused until one of the source files changes, instead of re-reading and re-minifying every export."""
+    static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    key = export_asset_key(static_dir)
+    with _export_assets_lock:
+        if _export_assets['key'] != key:
+            _export_assets['assets'] = build_export_assets(static_dir)
+            _export_assets['key'] = key
+        return _export_assets['assets']
+
+# --- Columnar paper data for the static export ---
+# The export embeds the papers as one JSON payload that ghpages.js turns into table rows, instead of
+# pre-rendered HTML: repeated strings are stored once (dictionary-encoded), numbers and flags as ints,
+# and the detail rows (abstract, BibTeX, clickable terms) are only built when a paper is expanded.
+# The BibTeX entries come from generate_bibtex_string(), so they match the ones the server shows.
+# The columns are written in chunks of EXPORT_PAYLOAD_CHUNK_SIZE papers as they are read from the cursor,
+# so memory is bounded by one chunk plus the dictionaries (distinct journals, authors, keywords, ...),
+# which are only complete at the end and so come after the chunks.
+EXPORT_PAYLOAD_VERSION = 3
+EXPORT_PAYLOAD_CHUNK_SIZE = 1000
+EXPORT_PAYLOAD_COLUMNS = (
+    'id', 'title', 'doi', 'type', 'journal', 'authors', 'keywords', 'year', 'page_count', 'relevance',
+    'flags', 'changed', 'research_area', 'user_trace', 'pdf_filename',
+    'abstract', 'pages', 'issn', 'bibtex',
+)
+# is_offtopic/is_survey are packed into 'flags' with 2 bits each (0 = unknown, 1 = true, 2 = false),
+# followed by the pdf_state dictionary index:
+FLAG_OFFTOPIC_SHIFT = 0
+FLAG_SURVEY_SHIFT = 2
+FLAG_PDF_STATE_SHIFT = 4
+
+def _export_status_bits(value):
+    """Same three states as render_status(): 1 = true, 2 = false, 0 = unknown."""
+    if value == 1 or value == "true" or value is True:
+        return 1
+    if value == 0 or value == "false" or value is False:
+        return 2
+    return 0
+
+def _export_number(value):
+    """Integer columns (year, page_count, relevance). Empty values become 0, which the table shows as ''
+       like the `value or ''` the templates use; anything that is not a plain number is kept as text."""
+    if not value:
+        return 0
+    if isinstance(value, str) and value.isdigit() and value[0] != '0':
+        return int(value)
+    return value
+
+def iter_export_payload_json(papers):
+    """Yields the static export's paper data (see the comments above) as compact JSON that is safe inside a
+       <script> element, one chunk of papers at a time. papers can be an iterator, e.g. iter_papers()."""
+    dicts = {'journals': [], 'authors': [], 'keywords': [], 'types': [], 'research_areas': [], 'pdf_states': []}
+    indexes = {name: {} for name in dicts}
+
+    def encode(name, value):
+        """Index of value in dicts[name], adding it on first use."""
+        index = indexes[name].get(value)
+        if index is None:
+            index = indexes[name][value] = len(dicts[name])
+            dicts[name].append(value)
+        return index
+
+    def encode_terms(name, value):
+        """'a; b; c' -> [index_a, index_b, index_c]. Strings that would not come back identical
+           from '; '.join() (odd separators, empty terms) are kept as they are."""
+        if not value:
+            return 0
+        terms = [term.strip() for term in value.split(';')]
+        if '; '.join(terms) != value or not all(terms):
+            return value
+        return [encode(name, term) for term in terms]
+
+    def to_json(value):
+        # A literal '</script>' in a title or abstract must not end the element
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+    header = {
+        'version': EXPORT_PAYLOAD_VERSION,
+        'type_emojis': globals.TYPE_EMOJIS,
+        'default_type_emoji': globals.DEFAULT_TYPE_EMOJI,
+        'pdf_emojis': globals.PDF_EMOJIS,
+    }
+    yield to_json(header)[:-1] + ',"chunks":['
+    columns = {name: [] for name in EXPORT_PAYLOAD_COLUMNS}
+    chunk_count = 0
+    for paper in papers:
+        columns['id'].append(paper['id'])
+        columns['title'].append(paper.get('title') or '')
+        columns['doi'].append(paper.get('doi') or '')
+        columns['type'].append(encode('types', paper.get('type') or ''))
+        columns['journal'].append(encode('journals', paper.get('journal') or ''))
+        columns['authors'].append(encode_terms('authors', paper.get('authors')))
+        columns['keywords'].append(encode_terms('keywords', paper.get('keywords')))
+        columns['year'].append(_export_number(paper.get('year')))
+        columns['page_count'].append(_export_number(paper.get('page_count')))
+        columns['relevance'].append(_export_number(paper.get('relevance')))
+        columns['flags'].append(
+            _export_status_bits(paper.get('is_offtopic')) << FLAG_OFFTOPIC_SHIFT
+            | _export_status_bits(paper.get('is_survey')) << FLAG_SURVEY_SHIFT
+            | encode('pdf_states', paper.get('pdf_state') or 'none') << FLAG_PDF_STATE_SHIFT
+        )
+        columns['changed'].append(paper.get('changed_formatted') or '')
+        columns['research_area'].append(encode('research_areas', paper.get('research_area') or ''))
+        columns['user_trace'].append(paper.get('user_trace') or '')
+        columns['pdf_filename'].append(paper.get('pdf_filename') or '')
+        columns['abstract'].append(paper.get('abstract') or '')
+        for name in ('pages', 'issn'):
+            value = paper.get(name)
+            columns[name].append('' if value is None else str(value))
+        columns['bibtex'].append(generate_bibtex_string(paper))
+        if len(columns['id']) >= EXPORT_PAYLOAD_CHUNK_SIZE:
+            yield (',' if chunk_count else '') + to_json(columns)
+            chunk_count += 1
+            columns = {name: [] for name in EXPORT_PAYLOAD_COLUMNS}
+    if columns['id'] or not chunk_count:    # At least one chunk, so the client always knows the column names
+        yield (',' if chunk_count else '') + to_json(columns)
+    yield '],"dicts":' + to_json(dicts) + '}'
+
+EXPORT_PAYLOAD_MARKER = '__EXPORT_PAYLOAD_DATA__'
+EXPORT_STREAM_CHUNK_SIZE = 64 * 1024     # Characters of rendered HTML gathered before each compress() call
+EXPORT_GZIP_LEVEL = 9                   # Same level gzip.compress() used
+LOADER_DATA_MARKER = '__COMPRESSED_HTML_DATA__'
+
+def iter_static_export_html(papers, hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export=False):
+    """Renders the static export page (what loader.html decompresses) as a stream of text pieces.
+       papers can be an iterator: the JSON payload is written while it is consumed."""
+    # Strip fat text for lite export:
+    if is_lite_export: # Blank Abstract, AI traces;
+        papers = ({**paper, 'abstract': ''} for paper in papers)
+
+    # Scripts, CSS and fonts come from the cached bundle; only the papers table is rendered per request
+    assets = get_export_assets()
+
+    # --- Render the static export template (rows are built client-side from the JSON payload) ---
+    # The payload is streamed in place of a marker, so it is never one string
+    pieces = stream_template(
         'index_static_export.html',
-        papers_table_static_export=papers_table_static_export,
+        export_payload_json=EXPORT_PAYLOAD_MARKER,
         hide_offtopic=hide_offtopic,
         year_from_value=year_from_value,
         year_to_value=year_to_value,
         min_page_count_value=min_page_count_value,
 
-        style_css_content=Markup(style_css_content),
+        style_css_content=assets['style_css_content'],
         
-        chart_js_content=Markup(chart_js_content),
-        chart_js_datalabels_content=Markup(chart_js_datalabels_content),
-        d3_js_content=Markup(d3_js_content),
-        d3_cloud_js_content=Markup(d3_cloud_js_content),
-
-        filtering_js_content=Markup(filtering_js_content),
-        stats_js_content=Markup(stats_js_content),
-        ghpages_js_content=Markup(ghpages_js_content)
+        chart_js_content=assets['chart_js_content'],
+        chart_js_datalabels_content=assets['chart_js_datalabels_content'],
+        d3_js_content=assets['d3_js_content'],
+        d3_cloud_js_content=assets['d3_cloud_js_content'],
+
+        filtering_js_content=assets['filtering_js_content'],
+        stats_js_content=assets['stats_js_content'],
+        ghpages_js_content=assets['ghpages_js_content']
     )
+    for piece in pieces:
+        if EXPORT_PAYLOAD_MARKER in piece:
+            before, after = piece.split(EXPORT_PAYLOAD_MARKER, 1)
+            yield before
+            yield from iter_export_payload_json(papers)
+            yield after
+        else:
+            yield piece
+
+def iter_gzip_base64(text_chunks):
+    """Gzips a stream of text and yields it Base64-encoded, never holding the whole output.
+       Each piece encodes a multiple of 3 bytes, so the pieces concatenate into one valid Base64 string."""
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31: gzip container, as pako.inflate expects
+    leftover = b''  # Compressed bytes not encoded yet (at most 2)
+
+    def encode(compressed, final=False):
+        nonlocal leftover
+        data = leftover + compressed
+        cut = len(data) if final else len(data) - len(data) % 3
+        leftover = data[cut:]
+        return base64.b64encode(data[:cut]).decode('ascii')
+
+    pending, pending_size = [], 0
+    for chunk in text_chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= EXPORT_STREAM_CHUNK_SIZE:
+            encoded = encode(compressor.compress(''.join(pending).encode('utf-8')))
+            pending, pending_size = [], 0
+            if encoded:
+                yield encoded
+    yield encode(compressor.compress(''.join(pending).encode('utf-8')) + compressor.flush(), final=True)
+
+def generate_html_export_stream(papers, hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export=False):
+    """Yields the static export (loader.html with the gzipped, Base64-encoded page inside) piece by piece,
+       so the page, its compressed bytes and their Base64 text never sit in memory at once."""
+    assets = get_export_assets()
+
+    # --- Render the LOADER template around a marker, then stream the compressed data in its place ---
+    loader_prefix, loader_suffix = render_template(
+        'loader.html',
+        compressed_html_data=LOADER_DATA_MARKER,
+        pako_js_content=assets['pako_js_content']
+    ).split(LOADER_DATA_MARKER)
 
-    # --- Compress the full HTML content ---
-    html_bytes = full_html_content.encode('utf-8')  # 1. Encode the HTML string to bytes (UTF-8)
-    compressed_bytes = gzip.compress(html_bytes)    # 2. Compress the bytes
-    compressed_base64 = base64.b64encode(compressed_bytes).decode('ascii')  # 3. Encode the compressed bytes to Base64 for embedding in JS
-
-    pako_js_content = ""
-    try:
-        with open(os.path.join(static_dir, 'libs/pako.min.js'), 'r', encoding='utf-8') as f:
-            pako_js_content = f.read()
-    except FileNotFoundError as e:
-        print(f"Warning: pako.min.js not found during HTML export generation: {e}")
-        raise
+    yield loader_prefix
+    yield from iter_gzip_base64(iter_static_export_html(
+        papers, hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export
+    ))
+    yield loader_suffix
 
-    # --- Render the LOADER template, passing the compressed data ---
-    loader_html_content = render_template(
-        'loader.html',
-        compressed_html_data=compressed_base64,
-        pako_js_content=Markup(pako_js_content)
-    )
-    return loader_html_content
-
-def generate_xlsx_export_content(papers):
-    """Generates the Excel file content as bytes."""
-    output = io.BytesIO()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Research Papers"
-
-    # --- Define Headers - Match the table columns ---
-    headers = [
-        "PDF", "Title", "Authors", "Year", "Pages", 
-        "Journal/Conf", "Type", "Off-topic", "Relevance", "Survey",
-        "Last Changed", "Commented", "Details"
+def generate_html_export_content(papers, hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export=False):
+    """Generates the full HTML content string for the static export."""
+    return ''.join(generate_html_export_stream(
+        papers, hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export
+    ))
+
+# --- XLSX export ---
+XLSX_HEADERS = [
+    "PDF", "Title", "Authors", "Year", "Pages", 
+    "Journal/Conf", "Type", "Off-topic", "Relevance", "Survey",
+    "Last Changed", "Commented", "Details"
+]
+XLSX_BOOLEAN_COLUMNS = ('H', 'J', 'L')  # Off-topic, Survey, Commented
+XLSX_MAX_COLUMN_WIDTH = 50
+# Widest value of the columns whose values have a known length: "PDF", FALSE, 'YYYY-MM-DD HH:MM:SS', "Show"
+XLSX_FIXED_WIDTHS = {0: 3, 7: 5, 9: 5, 10: 19, 11: 5, 12: 4}
+# The other columns are measured in SQL (LENGTH of an integer is that of its text), in XLSX_HEADERS order
+XLSX_MEASURED_COLUMNS = {1: 'p.title', 2: 'p.authors', 3: 'p.year', 4: 'p.page_count', 5: 'p.journal', 6: 'p.type', 8: 'p.relevance'}
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def format_excel_value(val):
+    """
+    Converts Python/DB values to Excel-friendly values:
+    - True/1   -> TRUE (Excel boolean)
+    - False/0  -> FALSE (Excel boolean)
+    - None/''/etc. -> "" (Empty string for blank Excel cell)
+    - Other    -> str(val) (Text)
+    """
+    if val is True or (isinstance(val, (int, float)) and val == 1):
+        return True # Excel TRUE
+    elif val is False or (isinstance(val, (int, float)) and val == 0):
+        return False # Excel FALSE
+    elif val is None or val == "":
+         return "" # Explicitly empty cell for NULL/empty
+    else:
+        # Handle potential string representations of booleans from inconsistent DB
+        if isinstance(val, str):
+            lower_val = val.lower()
+            if lower_val in ('true', '1'):
+                return True
+            elif lower_val in ('false', '0'):
+                return False
+        # Default: Convert to string for text fields
+        return str(val)
+
+def xlsx_row(paper):
+    """One worksheet row for a paper, matching XLSX_HEADERS."""
+    # --- Format the 'Last Changed' date ---
+    changed_timestamp_str = paper.get('changed', '')
+    formatted_changed_date = ""
+    if changed_timestamp_str:
+        try:
+            # Parse the ISO format timestamp
+            dt = datetime.fromisoformat(changed_timestamp_str.replace('Z', '+00:00'))
+            # Format as 'YYYY-MM-DD HH:MM:SS' for Excel compatibility
+            formatted_changed_date = dt.strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            # If parsing fails, keep the original string or leave blank
+            formatted_changed_date = changed_timestamp_str # Or ""
+
+    return [
+        "PDF" if paper.get('pdf_filename') else "", # PDF (show indicator if available)
+        paper.get('title', ''),                   # Title (text)
+        paper.get('authors', ''),                 # Authors (text)
+        paper.get('year', ''),                    # Year (integer)
+        paper.get('page_count', ''),              # Pages count (integer)
+        paper.get('journal', ''),                 # Journal/Conf name (text)
+        paper.get('type', ''),                    # Type (text)
+        format_excel_value(paper.get('is_offtopic')), # Off-topic (boolean/null)
+        paper.get('relevance', ''),               # Relevance (integer)
+        format_excel_value(paper.get('is_survey')), # Survey (boolean/null)
+        formatted_changed_date,                  # Last Changed (formatted date string)
+        format_excel_value(paper.get('user_trace') is not None and str(paper.get('user_trace', '')).strip() != ""), # Commented (boolean based on user_trace)
+        "Show" # Details (static text since this is just a toggle button in the UI)
     ]
 
-    # --- Write Headers ---
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.font = Font(bold=True)
-
-    # --- Write Data Rows ---
-    for row_num, paper in enumerate(papers, 2): # Start from row 2
-        # --- Helper function for consistent Excel value conversion ---
-        def format_excel_value(val):
-            """
-            Converts Python/DB values to Excel-friendly values:
-            - True/1   -> TRUE (Excel boolean)
-            - False/0  -> FALSE (Excel boolean)
-            - None/''/etc. -> "" (Empty string for blank Excel cell)
-            - Other    -> str(val) (Text)
-            """
-            if val is True or (isinstance(val, (int, float)) and val == 1):
-                return True # Excel TRUE
-            elif val is False or (isinstance(val, (int, float)) and val == 0):
-                return False # Excel FALSE
-            elif val is None or val == "":
-                 return "" # Explicitly empty cell for NULL/empty
-            else:
-                # Handle potential string representations of booleans from inconsistent DB
-                if isinstance(val, str):
-                    lower_val = val.lower()
-                    if lower_val in ('true', '1'):
-                        return True
-                    elif lower_val in ('false', '0'):
-                        return False
-                # Default: Convert to string for text fields
-                return str(val)
-
-        # --- Format the 'Last Changed' date ---
-        changed_timestamp_str = paper.get('changed', '')
-        formatted_changed_date = ""
-        if changed_timestamp_str:
-            try:
-                # Parse the ISO format timestamp
-                dt = datetime.fromisoformat(changed_timestamp_str.replace('Z', '+00:00'))
-                # Format as 'YYYY-MM-DD HH:MM:SS' for Excel compatibility
-                formatted_changed_date = dt.strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                # If parsing fails, keep the original string or leave blank
-                formatted_changed_date = changed_timestamp_str # Or ""
-
-        # Extract and format data based on table columns
-        row_data = [
-            "PDF" if paper.get('pdf_filename') else "", # PDF (show indicator if available)
-            paper.get('title', ''),                   # Title (text)
-            paper.get('authors', ''),                 # Authors (text)
-            paper.get('year', ''),                    # Year (integer)
-            paper.get('page_count', ''),              # Pages count (integer)
-            paper.get('journal', ''),                 # Journal/Conf name (text)
-            paper.get('type', ''),                    # Type (text)
-            format_excel_value(paper.get('is_offtopic')), # Off-topic (boolean/null)
-            paper.get('relevance', ''),               # Relevance (integer)
-            format_excel_value(paper.get('is_survey')), # Survey (boolean/null)
-            formatted_changed_date,                  # Last Changed (formatted date string)
-            format_excel_value(paper.get('user_trace') is not None and str(paper.get('user_trace', '')).strip() != ""), # Commented (boolean based on user_trace)
-            "Show" # Details (static text since this is just a toggle button in the UI)
-        ]
-
-        # Write the row data to Excel
-        for col_num, cell_value in enumerate(row_data, 1):
-            ws.cell(row=row_num, column=col_num, value=cell_value)
-
-    # Optional: Auto-adjust column widths (basic attempt)
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter # Get the column name
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        # Cap the width to prevent extremely wide columns
-        ws.column_dimensions[column_letter].width = min(adjusted_width, 50)
-
-    # Optional: Format the data as a table (requires openpyxl >= 2.5)
+def xlsx_column_widths(hide_offtopic=True, year_from=None, year_to=None, min_page_count=None):
+    """Width of each XLSX column for the papers matching the filters: its longest value or header.
+       Measured with one aggregate query, since write-only sheets need the widths before the first row."""
+    widths = [len(header) for header in XLSX_HEADERS]
+    for col_idx, width in XLSX_FIXED_WIDTHS.items():
+        widths[col_idx] = max(widths[col_idx], width)
+    conditions, params = build_filter_conditions(hide_offtopic, year_from, year_to, min_page_count)
+    query = "SELECT " + ", ".join(f"MAX(LENGTH({column}))" for column in XLSX_MEASURED_COLUMNS.values()) + " FROM papers p"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    conn = get_db_connection()
+    try:
+        lengths = conn.execute(query, params).fetchone()
+    finally:
+        conn.close()
+    for col_idx, length in zip(XLSX_MEASURED_COLUMNS, lengths):
+        widths[col_idx] = max(widths[col_idx], length or 0)
+    return widths
+
+def generate_xlsx_export_file(papers, path, widths):
+    """Writes the Excel export to path with a write-only (streaming) workbook.
+       Each paper is appended as it comes, so papers can be iter_papers() over the cursor;
+       widths (see xlsx_column_widths) must be known up front."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Research Papers")
+
+    # Auto-adjust column widths, capped to prevent extremely wide columns
+    for col_idx, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, XLSX_MAX_COLUMN_WIDTH)
+
+    # --- Write Headers, then the data rows ---
+    header_font = Font(bold=True)
+    header_cells = []
+    for header in XLSX_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        header_cells.append(cell)
+    ws.append(header_cells)
+    last_row = 1
+    for paper in papers:
+        ws.append(xlsx_row(paper))
+        last_row += 1
+
+    # Format the data as a table (requires openpyxl >= 2.5)
     try:
-        if len(papers) > 0:
-            # Adjust the column reference to 'M' (13 columns: A through M)
-            tab = Table(displayName="PapersTable", ref=f"A1:M{len(papers) + 1}")
+        if last_row > 1:
+            tab = Table(displayName="PapersTable", ref=f"A1:M{last_row}")
+            # Write-only sheets can't be read back, so the table columns are named here
+            tab.tableColumns = [TableColumn(id=col_idx, name=header) for col_idx, header in enumerate(XLSX_HEADERS, 1)]
             style = TableStyleInfo(name="TableStyleMedium2", showFirstColumn=False,
                                    showLastColumn=False, showRowStripes=True, showColumnStripes=False)
             tab.tableStyleInfo = style
-            ws.add_table(tab)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)  # openpyxl always warns about the columns set above
+                ws.add_table(tab)
     except Exception as e:
         print(f"Warning: Could not create Excel table: {e}")
 
-    # --- Apply Conditional Formatting for Boolean Cells ---
-    # Define fills for TRUE and FALSE
-    true_fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid") # Light Green
-    false_fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid") # Light Red
-    # Boolean column indices (1-based indexing) - Off-topic, Survey, Commented
-    boolean_columns = [7, 8, 11]  # Actually 8, 10, 12 based on the headers above
-
-    # Corrected boolean column indices
-    boolean_columns = [8, 10, 12]  # Off-topic (col 8), Survey (col 10), Commented (col 12)
-
-    # Iterate through rows and specified boolean columns to apply formatting
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-        for col_idx in boolean_columns:
-            # Adjust for 0-based indexing in the row list
-            cell = row[col_idx - 1] # col_idx is 1-based, list index is 0-based
-            if cell.value is True:
-                cell.fill = true_fill
-            elif cell.value is False:
-                cell.fill = false_fill
-            # If cell.value is None or "", it remains unformatted (blank cell)
-
-    # --- Save Workbook to BytesIO object ---
-    wb.save(output)
-    output.seek(0)
-    return output.getvalue()
-    
+    # --- Conditional Formatting for Boolean Cells (one rule per column instead of per-cell fills) ---
+    if last_row > 1:
+        true_fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid") # Light Green
+        false_fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid") # Light Red
+        for column in XLSX_BOOLEAN_COLUMNS:
+            cell_range = f"{column}2:{column}{last_row}"
+            # ISLOGICAL() so that empty ("") cells stay unformatted
+            ws.conditional_formatting.add(cell_range, FormulaRule(formula=[f"AND(ISLOGICAL({column}2),{column}2)"], fill=true_fill))
+            ws.conditional_formatting.add(cell_range, FormulaRule(formula=[f"AND(ISLOGICAL({column}2),NOT({column}2))"], fill=false_fill))
+
+    wb.save(path)
+
+# --- Export cache ---
+_export_cache = None
+_export_cache_lock = threading.Lock()
+
+def get_export_cache():
+    """Returns the on-disk export cache, created on first use."""
+    global _export_cache
+    with _export_cache_lock:
+        if _export_cache is None:
+            _export_cache = export_cache.ExportCache(globals.EXPORT_CACHE_DIR, globals.EXPORT_CACHE_MAX_BYTES)
+        return _export_cache
+
+# --- Caches of /stats and /duplicates results ---
+DUPLICATES_CACHE_SIZE = 4   # Thresholds kept per revision; clustering does not depend on the table filters
+_stats_cache = None
+_duplicates_cache = None
+_revision_caches_lock = threading.Lock()
+
+def get_stats_cache():
+    """Returns the in-memory cache of /stats aggregates, created on first use."""
+    global _stats_cache
+    with _revision_caches_lock:
+        if _stats_cache is None:
+            _stats_cache = paper_stats.RevisionCache()
+        return _stats_cache
+
+def get_duplicates_cache():
+    """Returns the in-memory cache of /duplicates clusters, created on first use."""
+    global _duplicates_cache
+    with _revision_caches_lock:
+        if _duplicates_cache is None:
+            _duplicates_cache = paper_stats.RevisionCache(DUPLICATES_CACHE_SIZE)
+        return _duplicates_cache
+
+def export_cache_key(kind, hide_offtopic, year_from, year_to, min_page_count, is_lite_export=False):
+    """Identifies an export's content: the database and its data revision, the filters and, for HTML,
+       the embedded assets (editing a script or style.css must not serve a stale export).
+       Read before the papers are fetched, so a concurrent write can only make the entry newer than its key."""
+    conn = get_db_connection()
+    try:
+        revision = migrations.get_revision(conn)
+    finally:
+        conn.close()
+    assets = None
+    if kind == 'html':
+        assets = export_asset_key(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    return (kind, os.path.abspath(DATABASE), revision, bool(hide_offtopic), year_from, year_to, min_page_count,
+            bool(is_lite_export), assets)
+
+def iter_cached_export(cache, key, extension, chunks):
+    """Passes the text chunks of an export through while writing them to the cache. The entry is only
+       added once the whole export was generated; a dropped connection leaves nothing behind."""
+    temp_file, temp_path = cache.new_temp_file(extension)
+    try:
+        with temp_file:
+            for chunk in chunks:
+                temp_file.write(chunk.encode('utf-8'))
+                yield chunk
+        cache.put(key, extension, temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+def get_cached_export_file(key, extension, generate):
+    """Path of the cached export for key; on a miss generate(path) writes it and it is added to the cache."""
+    cache = get_export_cache()
+    path = cache.get(key, extension)
+    if path is None:
+        temp_file, temp_path = cache.new_temp_file(extension)
+        temp_file.close()
+        try:
+            generate(temp_path)
+            path = cache.put(key, extension, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+    return path
 
 def generate_filename(base_name, year_from, year_to, min_page_count, hide_offtopic, extra_suffix=""):
     """Generates a filename based on filters."""
@@ -845,6 +1365,54 @@ def render_verified_by_filter(value):
     # Use Markup to tell Jinja2 that the output is safe HTML
     return Markup(render_verified_by(value)) 
 
+# --- Conditional GET and compression ---
+# Rendered pages only depend on the data, the query args and the templates, so their ETag is built from
+# the data revision instead of the body: a matching If-None-Match is answered before any query or render.
+SERVER_INSTANCE = os.urandom(8).hex()  # Code changes (restarts) invalidate every ETag
+
+def templates_key():
+    """Identity of the current templates: (name, mtime, size) of every file in the template folder."""
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    return tuple(sorted((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                        for entry in os.scandir(template_dir) if entry.is_file()))
+
+def revision_etag():
+    """Strong ETag of the current request's response: database, data revision, templates, path and args."""
+    conn = get_db_connection()
+    try:
+        revision = migrations.get_revision(conn)
+    finally:
+        conn.close()
+    key = (SERVER_INSTANCE, os.path.abspath(DATABASE), revision, templates_key(),
+           request.path, sorted(request.args.items(multi=True)))
+    return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32]
+
+def revision_conditional(view):
+    """Route decorator: answers 304 Not Modified if the client's copy (If-None-Match, in any content coding)
+       is current, and tags successful responses with the revision ETag. Clients must revalidate
+       (Cache-Control: no-cache), so an edit is visible on the next request."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = revision_etag()  # Read before rendering: a concurrent write can only make the body newer than its tag
+        for tag in compression.etag_variants(etag):
+            if request.if_none_match.contains_weak(tag):
+                response = Response(status=304)
+                response.set_etag(tag)
+                response.headers['Cache-Control'] = 'no-cache'
+                response.vary.add('Accept-Encoding')
+                return response
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli for HTML and JSON responses (see compression.py)."""
+    return compression.compress_response(response, request.accept_encodings)
+
 
 
 
@@ -852,6 +1420,7 @@ def render_verified_by_filter(value):
 
 #Routes: 
 @app.route('/', methods=['GET'])
+@revision_conditional
 def index():
     """Main page to display the table."""
     # Get initial filter parameters from the request (or they will default inside render_papers_table)
@@ -859,17 +1428,23 @@ def index():
     year_from_param = request.args.get('year_from')
     year_to_param = request.args.get('year_to')
     min_page_count_param = request.args.get('min_page_count')
+    # Optional keyset pagination (see fetch_papers_page):
+    page_size_param = request.args.get('page_size')
+    sort_by_param = request.args.get('sort_by')
+    sort_dir_param = request.args.get('sort_dir')
         
     # Get the total number of papers in the database.
-    conn = get_db_connection()
-    total_paper_count = conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
-    conn.close()
+    with get_db_connection() as conn:
+        total_paper_count = conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
 
     papers_table_content = render_papers_table(
         hide_offtopic_param=hide_offtopic_param,
         year_from_param=year_from_param,
         year_to_param=year_to_param,
         min_page_count_param=min_page_count_param,
+        page_size_param=page_size_param,
+        sort_by_param=sort_by_param,
+        sort_dir_param=sort_dir_param,
     )
     # Pass the rendered table content and filter values to the main index template
     # Determine values to display in the input fields (use defaults if URL params were missing/invalid)
@@ -898,163 +1473,193 @@ def index():
     )
 
 #Backup/restore
+RESTORE_DRAIN_TIMEOUT = 30     # Seconds /restore waits for running imports and requests before giving up
+# Directories included in backups, with their path inside the archive
+BACKUP_ROOTS = [
+    (globals.PDF_STORAGE_DIR, 'data/pdf'),
+    (globals.ANNOTATED_PDF_STORAGE_DIR, 'data/pdf_annotated'),
+]
+
 @app.route('/backup', methods=['GET'])
 def backup_database():
-    """Creates a backup of the database and related files."""
+    """Creates a backup of the database and related files, streamed to the client as it is compressed.
+       /backup?mode=incremental only archives PDFs changed since the last backup, mode=differential those
+       changed since the last full backup; both always include the database and skip the exports."""
+    # Optional zstd settings: /backup?level=N&threads=M (threads -1 = all cores)
+    level, threads = backups.parse_compression_options(request.args.get('level'), request.args.get('threads'))
+    mode = request.args.get('mode', 'full').lower()
+    if mode not in backups.BACKUP_MODES:
+        return jsonify({'status': 'error', 'message': f'Invalid backup mode. Must be one of: {", ".join(backups.BACKUP_MODES)}'}), 400
+    staging_dir = tempfile.mkdtemp(prefix='backup_')
     try:
+        # Which files changed since the backup this one builds on (falls back to full if there is none)
+        manifest, file_members = backups.plan_backup(BACKUP_ROOTS, globals.BACKUP_STATE_FILE, mode)
+        mode = manifest['mode']
+
         # Create backup filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{timestamp}.parça.zst"
-
-        # Create temporary directory for exports
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Generate HTML export (full, not lite)
-            papers = fetch_papers(hide_offtopic=True, year_from=0, year_to=9999, min_page_count=0)
-            html_content = generate_html_export_content(papers, True, 0, 9999, 0, is_lite_export=False)
-            html_path = os.path.join(temp_dir, 'export.html')
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-
-            # Generate XLSX export
-            xlsx_content = generate_xlsx_export_content(papers)
-            xlsx_path = os.path.join(temp_dir, 'export.xlsx')
-            with open(xlsx_path, 'wb') as f:
-                f.write(xlsx_content)
-
-            # Create in-memory buffer for the backup
-            buffer = io.BytesIO()
-            
-            # Create a Zstandard compressor
-            cctx = zstd.ZstdCompressor(level=1)  # Fastest compression level
-            
-            # Compress the tar directly to the buffer
-            with tarfile.open(fileobj=buffer, mode='w') as tar:
-                # Add database file
-                tar.add(DATABASE, arcname='data/new.sqlite')
-                
-                # Add PDF storage directory
-                if os.path.exists(globals.PDF_STORAGE_DIR):
-                    tar.add(globals.PDF_STORAGE_DIR, arcname='data/pdf')
-                
-                # Add annotated PDF storage directory
-                if os.path.exists(globals.ANNOTATED_PDF_STORAGE_DIR):
-                    tar.add(globals.ANNOTATED_PDF_STORAGE_DIR, arcname='data/pdf_annotated')
-                
-                # Add export files
-                tar.add(html_path, arcname='export.html')
-                tar.add(xlsx_path, arcname='export.xlsx')
-            
-            # Get the uncompressed tar data
-            tar_data = buffer.getvalue()
-            
-            # Now compress the tar data with zstd
-            compressed_data = cctx.compress(tar_data)
-            
-            # Create a new buffer with the compressed data
-            compressed_buffer = io.BytesIO(compressed_data)
-            compressed_buffer.seek(0)
-            
-            # Create a response with the in-memory backup
-            response = send_file(
-                compressed_buffer,
-                as_attachment=True,
-                download_name=backup_filename,
-                mimetype='application/zstd'
-            )
-            
-            # Ensure the filename is set correctly in Content-Disposition
-            response.headers['Content-Disposition'] = f'attachment; filename="{backup_filename}"'
-            
-            return response
+        backup_filename = f"{timestamp}{backups.BACKUP_EXTENSION}" if mode == 'full' else f"{timestamp}_{mode}{backups.BACKUP_EXTENSION}"
+
+        # Consistent copy of the live database, taken before any byte is sent
+        db_snapshot_path = os.path.join(staging_dir, 'new.sqlite')
+        backups.snapshot_database(DATABASE, db_snapshot_path)
+        members = [(db_snapshot_path, 'data/new.sqlite')] + file_members
+
+        if mode == 'full':
+            # HTML (full, not lite) and XLSX exports, from the export cache when the data is unchanged
+            def generate_html(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.writelines(generate_html_export_stream(iter_papers(True, 0, 9999, 0), True, 0, 9999, 0, is_lite_export=False))
+            def generate_xlsx(path):
+                generate_xlsx_export_file(iter_papers(True, 0, 9999, 0), path, xlsx_column_widths(True, 0, 9999, 0))
+            for kind, generate in (('html', generate_html), ('xlsx', generate_xlsx)):
+                cached_path = get_cached_export_file(export_cache_key(kind, True, 0, 9999, 0), f'.{kind}', generate)
+                # Linked into the staging dir, so evicting the cache entry can't pull it from under the archive
+                member_path = os.path.join(staging_dir, f'export.{kind}')
+                backups.link_or_copy(cached_path, member_path)
+                members.append((member_path, f'export.{kind}'))
     except Exception as e:
+        shutil.rmtree(staging_dir, ignore_errors=True)
         print(f"Backup error: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    # The archive is tarred and compressed while it is sent, never held in memory or on disk.
+    # Only a completely sent archive becomes the base of the next incremental backup.
+    # The manifest is added at the end of the archive, once the PDFs in it have been hashed
+    stream = backups.stream_archive(members, level=level, threads=threads, manifest=manifest,
+                                    on_complete=lambda stats: backups.record_backup(globals.BACKUP_STATE_FILE, manifest))
+    response = Response(stream, mimetype='application/zstd')
+    response.headers['Content-Disposition'] = f'attachment; filename="{backup_filename}"'
+    response.headers['X-Backup-Mode'] = mode
+    # Ratio and throughput are only known once the stream ends: see /backup/stats
+    response.headers['X-Backup-Compression'] = f'zstd; level={level}; threads={threads}'
+    # Runs after the stream ends or the client disconnects
+    response.call_on_close(lambda: shutil.rmtree(staging_dir, ignore_errors=True))
+    return response
     
+@app.route('/backup/stats', methods=['GET'])
+def backup_stats():
+    """Compression ratio and throughput of the most recent backup archive (streamed backups can't send them as headers)."""
+    return jsonify({'status': 'success', 'stats': backups.get_last_backup_stats()})
+
 @app.route('/restore', methods=['POST'])
 def restore_database():
-    """Restores database and related files from a backup."""
+    """Restores database and related files from a backup.
+       The backup is either the raw request body (Content-Type: application/zstd, decompressed while it
+       is uploaded) or one or more backup_file form parts to replay a chain: one full backup plus the
+       incremental/differential backups made after it, in any order.
+       Everything is extracted and checked in a staging dir first; data/ is then swapped for it with two
+       renames, and the replaced tree is kept as globals.PREVIOUS_DATA_DIR."""
+    data_dir = globals.DATA_DIR
+    db_in_data_dir = os.path.dirname(os.path.abspath(DATABASE)) == os.path.abspath(data_dir)
+    # Next to data/, so the staged tree can be renamed into place
+    staging_dir = tempfile.mkdtemp(prefix='.restore_staging_', dir=os.path.dirname(os.path.abspath(data_dir)))
     try:
-        if 'backup_file' not in request.files:
+        # Decompress and extract every archive into its own directory, straight from the upload
+        extract_dirs = []
+        if request.mimetype == 'multipart/form-data':
+            # Parsed from request.stream as it arrives: request.files would first spool every part to disk
+            boundary = request.mimetype_params.get('boundary')
+            if not boundary:
+                return jsonify({'status': 'error', 'message': 'No backup file provided'}), 400
+            for filename, file in backups.iter_multipart_files(request.stream, boundary, 'backup_file'):
+                if filename == '':
+                    return jsonify({'status': 'error', 'message': 'No file selected'}), 400
+                if not filename.endswith(backups.BACKUP_EXTENSION):
+                    return jsonify({'status': 'error', 'message': 'Invalid backup file format. Expected .parça.zst'}), 400
+                extract_dirs.append(os.path.join(staging_dir, f'archive_{len(extract_dirs)}'))
+                backups.safe_extract(file, extract_dirs[-1])
+            if not extract_dirs:
+                return jsonify({'status': 'error', 'message': 'No backup file provided'}), 400
+        elif request.mimetype in ('application/zstd', 'application/octet-stream'):
+            extract_dirs.append(os.path.join(staging_dir, 'archive_0'))
+            backups.safe_extract(request.stream, extract_dirs[-1])
+        else:
             return jsonify({'status': 'error', 'message': 'No backup file provided'}), 400
 
-        file = request.files['backup_file']
-        if file.filename == '':
-            return jsonify({'status': 'error', 'message': 'No file selected'}), 400
-
-        if not file.filename.endswith('.parça.zst'):
-            return jsonify({'status': 'error', 'message': 'Invalid backup file format. Expected .parça.zst'}), 400
-
-        # Create temporary directory for extraction
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Save uploaded file temporarily
-            temp_backup_path = os.path.join(temp_dir, 'backup.parça.zst')
-            file.save(temp_backup_path)
-
-            # Decompress and extract
-            dctx = zstd.ZstdDecompressor()
-            with open(temp_backup_path, 'rb') as compressed_file:
-                with dctx.stream_reader(compressed_file) as decomp_stream:
-                    with tarfile.open(fileobj=decomp_stream, mode='r|') as tar:
-                        tar.extractall(path=temp_dir)
-
-            # Paths in the extracted archive
-            extracted_db_path = os.path.join(temp_dir, 'data', 'new.sqlite')
-            extracted_pdf_dir = os.path.join(temp_dir, 'data', 'pdf')
-            extracted_annotated_pdf_dir = os.path.join(temp_dir, 'data', 'pdf_annotated')
-
-            # Verify required files exist
-            if not os.path.exists(extracted_db_path):
-                return jsonify({'status': 'error', 'message': 'Backup does not contain required database file'}), 500
-
-            # Backup current data before restoring (single file name, overwrites previous)
-            backup_current = "backup_before_restore.parça.zst"
-            backup_current_path = os.path.join(os.getcwd(), backup_current)
-            cctx = zstd.ZstdCompressor(level=1)
-            with cctx.stream_writer(open(backup_current_path, 'wb')) as compressor:
-                with tarfile.open(fileobj=compressor, mode='w|') as tar:
-                    if os.path.exists(DATABASE):
-                        tar.add(DATABASE, arcname='data/new.sqlite')
-                    if os.path.exists(globals.PDF_STORAGE_DIR):
-                        tar.add(globals.PDF_STORAGE_DIR, arcname='data/pdf')
-                    if os.path.exists(globals.ANNOTATED_PDF_STORAGE_DIR):
-                        tar.add(globals.ANNOTATED_PDF_STORAGE_DIR, arcname='data/pdf_annotated')
-
-            # Perform restoration
-            # 1. Replace database
-            shutil.move(extracted_db_path, DATABASE)
-            
-            # 2. Replace PDF directories - only if they exist in the backup
-            if os.path.exists(extracted_pdf_dir):
-                # Create parent directory if it doesn't exist
-                os.makedirs(os.path.dirname(globals.PDF_STORAGE_DIR), exist_ok=True)
-                # Remove existing directory if it exists
-                if os.path.exists(globals.PDF_STORAGE_DIR):
-                    shutil.rmtree(globals.PDF_STORAGE_DIR)
-                # Move the extracted directory
-                shutil.move(extracted_pdf_dir, globals.PDF_STORAGE_DIR)
-            else:
-                # Create empty PDF directory if not in backup
-                os.makedirs(globals.PDF_STORAGE_DIR, exist_ok=True)
-                
-            if os.path.exists(extracted_annotated_pdf_dir):
-                # Create parent directory if it doesn't exist
-                os.makedirs(os.path.dirname(globals.ANNOTATED_PDF_STORAGE_DIR), exist_ok=True)
-                # Remove existing directory if it exists
-                if os.path.exists(globals.ANNOTATED_PDF_STORAGE_DIR):
-                    shutil.rmtree(globals.ANNOTATED_PDF_STORAGE_DIR)
-                # Move the extracted directory
-                shutil.move(extracted_annotated_pdf_dir, globals.ANNOTATED_PDF_STORAGE_DIR)
-            else:
-                # Create empty annotated PDF directory if not in backup
-                os.makedirs(globals.ANNOTATED_PDF_STORAGE_DIR, exist_ok=True)
+        # Replay the chain: full backup first, then each incremental/differential on top of it
+        manifests = [backups.read_manifest(extract_dir) for extract_dir in extract_dirs]
+        order = backups.order_backup_chain(manifests)
+        manifests = [manifests[i] for i in order]
+        extract_root = backups.merge_backup_chain([extract_dirs[i] for i in order], manifests,
+                                                  [prefix for _, prefix in BACKUP_ROOTS])
+
+        # Verify required files exist
+        extracted_db_path = os.path.join(extract_root, 'data', 'new.sqlite')
+        if not os.path.exists(extracted_db_path):
+            return jsonify({'status': 'error', 'message': 'Backup does not contain required database file'}), 400
+        # Backups made by older versions have an older schema: upgrade before going live
+        restored_conn = sqlite3.connect(extracted_db_path)
+        try:
+            migrations.migrate_database(restored_conn)
+        finally:
+            restored_conn.close()
+
+        if not db_in_data_dir:
+            # Database given on the command line, outside data/: it is swapped on its own below
+            restored_db_path = os.path.join(staging_dir, 'restored.sqlite')
+            os.replace(extracted_db_path, restored_db_path)
+        staged_dir = backups.stage_data_dir(extract_root, data_dir, os.path.basename(DATABASE) if db_in_data_dir else None,
+                                            [globals.PDF_STORAGE_DIR, globals.ANNOTATED_PDF_STORAGE_DIR])
+
+        # Perform restoration: nothing may keep the old database open or write to it while it is swapped out.
+        # Running imports are cancelled (after their current chunk) and requests holding a connection finish
+        # first; requests arriving meanwhile wait in db_pool until the restored database is in place.
+        with _import_jobs_lock:
+            jobs = _import_jobs
+        if jobs is not None and not jobs.suspend(RESTORE_DRAIN_TIMEOUT):
+            jobs.resume()
+            return jsonify({'status': 'error', 'message': 'An import is still running, try again in a moment'}), 503
+        pool = db_pool.get_pool(DATABASE)
+        try:
+            if not pool.drain(RESTORE_DRAIN_TIMEOUT):
+                return jsonify({'status': 'error', 'message': 'The database is busy, try again in a moment'}), 503
+            try:
+                with db_pool.write_lock():
+                    conn = sqlite3.connect(DATABASE)
+                    old_revision = migrations.get_revision(conn)
+                    conn.close()
+                    backups.swap_data_dir(data_dir, staged_dir, globals.PREVIOUS_DATA_DIR)
+                    if not db_in_data_dir:
+                        # Keep the old database (and its WAL) with the rest of the snapshot
+                        for suffix in ('', '-wal', '-shm'):
+                            if os.path.exists(DATABASE + suffix):
+                                shutil.move(DATABASE + suffix, os.path.join(globals.PREVIOUS_DATA_DIR, os.path.basename(DATABASE) + suffix))
+                        shutil.move(restored_db_path, DATABASE)
+
+                    # The restored data may carry a revision number already used for other data: move past it
+                    # before any request can see it
+                    conn = sqlite3.connect(DATABASE)
+                    migrations.bump_revision(conn, above=old_revision)
+                    conn.commit()
+                    conn.close()
+            finally:
+                pool.resume()
+        finally:
+            if jobs is not None:
+                jobs.resume()
+        get_export_cache().clear()
+        get_stats_cache().clear()
+        get_duplicates_cache().clear()
+        get_fragment_cache().clear()
+        forget_pdf_states()
+
+        # The next incremental backup builds on what was just restored
+        backups.record_restore(globals.BACKUP_STATE_FILE, manifests)
 
         return jsonify({
             'status': 'success',
-            'message': f'Restored successfully from backup. Previous data backed up as {backup_current}'
+            'message': f'Restored successfully from backup. Previous data kept in {globals.PREVIOUS_DATA_DIR}'
         })
+    except (ValueError, tarfile.TarError, zstd.ZstdError) as e:
+        # Invalid, unsafe or incomplete backup: nothing was changed
+        print(f"Restore error: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
         print(f"Restore error: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
 
 # PDF storage/annotation routes
 @app.route('/upload_pdf/<paper_id>', methods=['POST']) # Removed int: converter
@@ -1118,62 +1723,41 @@ def serve_pdf(paper_id):
     Serves the correct PDF file (annotated or original) for the PDF.js viewer/annotator
     based on the paper_id. Also updates the pdf_state in the database
     based on the actual existence of the annotated files.
+    Range requests are answered with 206 Partial Content, so PDF.js only fetches the pages it shows.
     """
-    conn = get_db_connection()
-    paper = conn.execute("SELECT pdf_filename, pdf_state FROM papers WHERE id = ?", (paper_id,)).fetchone()
-    
-    if not paper or not paper['pdf_filename']:
-        conn.close()
-        print(f"No PDF filename found in DB for paper_id: {paper_id}")
-        abort(404)
-
-    filename = paper['pdf_filename']
-    current_db_state = paper['pdf_state']
-    
-    # NEW LOGIC: Check for annotated and original files
-    annotated_path = os.path.join(globals.ANNOTATED_PDF_STORAGE_DIR, filename)
-    original_path = os.path.join(globals.PDF_STORAGE_DIR, filename)
-
-    print(f"Serving PDF for paper_id {paper_id} (filename: {filename})") # Debug print
-    print(f"Looking for annotated: {annotated_path}") # Debug print
-    print(f"Looking for original: {original_path}") # Debug print
-
-    new_state = None
-    file_to_serve = None
-
-    if os.path.exists(annotated_path):
-        print(f"Found annotated file: {filename}")
-        new_state = 'annotated'
-        file_to_serve = annotated_path
-    elif os.path.exists(original_path):
-        print(f"Found original file: {filename}")
-        new_state = 'PDF' # Reset to 'PDF' if annotated file is missing but original exists
-        file_to_serve = original_path
-    else:
-        print(f"No PDF file found for paper_id: {paper_id} (filename: {filename})")
-        # File doesn't exist at all, set state to 'none'
-        new_state = 'none'
-        # Update the database record
-        update_query = "UPDATE papers SET pdf_state = ? WHERE id = ?"
-        conn.execute(update_query, (new_state, paper_id))
-        conn.commit()
-        conn.close()
-        abort(404) # Still abort 404 as no file to serve
-
-    # Check if the state in the DB needs updating
+    cached = get_pdf_state(paper_id)
+    if cached is None:
+        with get_db_connection() as conn:
+            paper = conn.execute("SELECT pdf_filename, pdf_state FROM papers WHERE id = ?", (paper_id,)).fetchone()
+        if not paper or not paper['pdf_filename']:
+            abort(404)
+        cached = (paper['pdf_filename'], paper['pdf_state'])
+    filename, current_db_state = cached
+
+    # Annotated copy first, then the original; 'none' if neither exists (anymore)
+    pdf_dir = None
+    new_state = 'none'
+    for directory, state in ((globals.ANNOTATED_PDF_STORAGE_DIR, 'annotated'), (globals.PDF_STORAGE_DIR, 'PDF')):
+        if os.path.isfile(os.path.join(directory, filename)):
+            pdf_dir = directory
+            new_state = state
+            break
+
+    # The database is only written when the files on disk no longer match the known state
     if current_db_state != new_state:
         print(f"Updating pdf_state for {paper_id} from '{current_db_state}' to '{new_state}'")
-        update_query = "UPDATE papers SET pdf_state = ? WHERE id = ?"
-        conn.execute(update_query, (new_state, paper_id))
-        conn.commit()
-    else:
-        print(f"pdf_state for {paper_id} is already correct ('{new_state}')")
-
-    conn.close()
-
-    # Serve the determined file
-    # Use os.path.basename to get just the filename from the full path for send_from_directory
-    return send_from_directory(os.path.dirname(file_to_serve), os.path.basename(file_to_serve), as_attachment=False)
+        with get_db_connection() as conn, db_pool.write_lock():
+            conn.execute("UPDATE papers SET pdf_state = ? WHERE id = ?", (new_state, paper_id))
+            migrations.bump_revision(conn)
+            conn.commit()
+        get_fragment_cache().invalidate(paper_id)
+    remember_pdf_state(paper_id, filename, new_state)
+
+    if pdf_dir is None:
+        abort(404)
+    # conditional=True (the default): ETag/Last-Modified revalidation and single-range requests (206);
+    # the file is handed to the server's wsgi.file_wrapper instead of being read into memory
+    return send_from_directory(pdf_dir, filename, mimetype='application/pdf', as_attachment=False)
 
 @app.route('/upload_annotated_pdf/<paper_id>', methods=['POST'])
 def upload_annotated_pdf(paper_id):
@@ -1190,9 +1774,8 @@ def upload_annotated_pdf(paper_id):
         return jsonify({'status': 'error', 'message': 'Invalid or missing file'}), 400
 
     # Look up filename from paper_id to save it correctly.
-    conn = get_db_connection()
-    paper = conn.execute("SELECT pdf_filename FROM papers WHERE id = ?", (paper_id,)).fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        paper = conn.execute("SELECT pdf_filename FROM papers WHERE id = ?", (paper_id,)).fetchone()
 
     if not paper or not paper['pdf_filename']:
         return jsonify({'status': 'error', 'message': f'Paper ID {paper_id} not found in DB'}), 404
@@ -1238,21 +1821,8 @@ def static_export():
         hide_offtopic_param, year_from_param, year_to_param, min_page_count_param
     )
 
-    # --- Fetch papers based on these filters ---
-    papers = fetch_papers(
-        hide_offtopic=hide_offtopic,
-        year_from=year_from_value,
-        year_to=year_to_value,
-        min_page_count=min_page_count_value,
-    )
-
     is_lite_export = lite_param.lower() in ['1', 'true', 'yes']
 
-    # --- Generate the content using the core function ---
-    full_html_content = generate_html_export_content(
-        papers, hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export
-    )
-
     # --- Create a filename based on filters ---
     extra_suffix = "lite" if is_lite_export else ""
     filename = generate_filename("ResearchParça", year_from_value, year_to_value, min_page_count_value, hide_offtopic, extra_suffix) + ".html"
@@ -1266,8 +1836,30 @@ def static_export():
         response_headers["Content-Disposition"] = f"attachment; filename={filename}"
         print(f"Sending static export as attachment: {filename}") # Optional: Log action
 
+    # --- Unchanged data and filters: send the export generated last time ---
+    cache = get_export_cache()
+    cache_key = export_cache_key('html', hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export)
+    cached_path = cache.get(cache_key, '.html')
+    if cached_path:
+        response = send_file(cached_path, mimetype="text/html")
+        response.headers["Content-Disposition"] = response_headers["Content-Disposition"]
+        return response
+
+    # --- Papers matching these filters, read from the cursor while the export is written ---
+    papers = iter_papers(
+        hide_offtopic=hide_offtopic,
+        year_from=year_from_value,
+        year_to=year_to_value,
+        min_page_count=min_page_count_value,
+    )
+
+    # --- Generate the content using the core function (streamed, sent while it is rendered and cached) ---
+    html_stream = stream_with_context(iter_cached_export(cache, cache_key, '.html', generate_html_export_stream(
+        papers, hide_offtopic, year_from_value, year_to_value, min_page_count_value, is_lite_export
+    )))
+
     return Response(
-        full_html_content,
+        html_stream,
         mimetype="text/html",
         headers=response_headers
     )
@@ -1286,29 +1878,23 @@ def export_excel():
         hide_offtopic_param, year_from_param, year_to_param, min_page_count_param
     )
 
-    # --- Fetch papers based on these filters ---
-    papers = fetch_papers(
-        hide_offtopic=hide_offtopic,
-        year_from=year_from_value,
-        year_to=year_to_value,
-        min_page_count=min_page_count_value,
-    )
-
-    # --- Generate the content using the core function ---
-    excel_bytes = generate_xlsx_export_content(papers)
+    # --- Generate the workbook into the export cache (never the whole file in memory), unless it is there ---
+    def generate(xlsx_path):
+        # --- Stream the papers matching these filters from the cursor into the sheet ---
+        filters = (hide_offtopic, year_from_value, year_to_value, min_page_count_value)
+        generate_xlsx_export_file(iter_papers(*filters), xlsx_path, xlsx_column_widths(*filters))
+    cache_key = export_cache_key('xlsx', hide_offtopic, year_from_value, year_to_value, min_page_count_value)
+    xlsx_path = get_cached_export_file(cache_key, '.xlsx', generate)
 
     # --- Create a filename based on filters ---
     filename = generate_filename("ResearchParça", year_from_value, year_to_value, min_page_count_value, hide_offtopic) + ".xlsx"
 
-    # --- Return as a downloadable attachment ---
-    return Response(
-        excel_bytes, # Get the bytes from the core function
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    # --- Stream it as a downloadable attachment ---
+    return send_file(xlsx_path, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename)
 
 # Table generation routes
 @app.route('/get_detail_row', methods=['GET'])
+@revision_conditional
 def get_detail_row():
     """Endpoint to fetch and render the detail row content for a specific paper."""
     paper_id = request.args.get('paper_id')
@@ -1316,9 +1902,8 @@ def get_detail_row():
         return jsonify({'status': 'error', 'message': 'Paper ID is required'}), 400
 
     try:
-        conn = get_db_connection()
-        paper = conn.execute("SELECT * FROM papers WHERE id = ?", (paper_id,)).fetchone()
-        conn.close()
+        with get_db_connection() as conn:
+            paper = conn.execute("SELECT * FROM papers WHERE id = ?", (paper_id,)).fetchone()
 
         if paper:
             # Process the paper data like in fetch_papers for consistency
@@ -1332,14 +1917,110 @@ def get_detail_row():
         print(f"Error fetching detail row for paper {paper_id}: {e}")
         return jsonify({'status': 'error', 'message': 'Failed to fetch detail row'}), 500
 
+@app.route('/db_stats', methods=['GET'])
+def db_stats():
+    """Connection pool counters (opened/reused connections, reuse rate) and row fragment cache counters for monitoring."""
+    return jsonify({'status': 'success', 'pool': db_pool.get_pool(DATABASE).stats(),
+                    'fragments': get_fragment_cache().stats()})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Aggregates for the stats modal (status counts, per-year and per-type counts, journal/conference,
+       keyword, author and research area frequencies, relevance histogram) over the current filters.
+       Query params: the table's filters (hide_offtopic, year_from, year_to, min_page_count) and survey_filter."""
+    hide_offtopic, year_from_value, year_to_value, min_page_count_value = get_default_filter_values(
+        request.args.get('hide_offtopic'), request.args.get('year_from'),
+        request.args.get('year_to'), request.args.get('min_page_count')
+    )
+    survey_filter = request.args.get('survey_filter', 'all')
+    conditions, params = build_filter_conditions(hide_offtopic, year_from_value, year_to_value, min_page_count_value)
+    survey_condition = paper_stats.survey_filter_condition(survey_filter)
+    if survey_condition:
+        conditions.append(survey_condition)
+    filter_key = (hide_offtopic, year_from_value, year_to_value, min_page_count_value, survey_condition)
+
+    conn = get_db_connection()
+    try:
+        stats = get_stats_cache().get_or_compute(
+            conn, filter_key, lambda c: paper_stats.compute_stats(c, conditions, params))
+        return jsonify({'status': 'success', 'stats': stats})
+    except sqlite3.Error as e:
+        print(f"Error computing stats: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to compute statistics'}), 500
+    finally:
+        conn.close()
+
+@app.route('/duplicates', methods=['GET'])
+def duplicates():
+    """Clusters of (near-)duplicate papers across the whole database: same normalized title, or similar
+       titles (trigram similarity >= threshold) from compatible years. See dedup.py.
+       Query params: threshold (0.5-1.0, default dedup.FUZZY_THRESHOLD)."""
+    try:
+        threshold = float(request.args.get('threshold', dedup.FUZZY_THRESHOLD))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid threshold'}), 400
+    if not 0.5 <= threshold <= 1.0:
+        return jsonify({'status': 'error', 'message': 'Threshold must be between 0.5 and 1.0'}), 400
+
+    conn = get_db_connection()
+    try:
+        clusters = get_duplicates_cache().get_or_compute(
+            conn, threshold, lambda c: dedup.find_duplicate_clusters(c, threshold))
+        return jsonify({'status': 'success', 'threshold': threshold, 'count': len(clusters), 'clusters': clusters})
+    except sqlite3.Error as e:
+        print(f"Error finding duplicates: {e}")
+        return jsonify({'status': 'error', 'message': 'Failed to find duplicates'}), 500
+    finally:
+        conn.close()
+
+@app.route('/search', methods=['GET'])
+def search():
+    """Full-text search endpoint. Returns paper IDs ranked by bm25, with highlighted snippets.
+       Query params: q (search text), limit (0 = all matches), snippets (0 to skip snippet generation)."""
+    search_text = request.args.get('q', '').strip()
+    try:
+        limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid limit'}), 400
+    with_snippets = request.args.get('snippets', '1').lower() not in ('0', 'false', 'no')
+
+    try:
+        results = search_papers(search_text, limit=limit, with_snippets=with_snippets)
+        return jsonify({'status': 'success', 'query': search_text, 'count': len(results), 'results': results})
+    except sqlite3.Error as e:
+        print(f"Error running search '{search_text}': {e}")
+        return jsonify({'status': 'error', 'message': 'Search failed'}), 500
+
 @app.route('/load_table', methods=['GET'])
+@revision_conditional
 def load_table():
-    """Endpoint to fetch and render the table content based on current filters."""
+    """Endpoint to fetch and render the table content based on current filters.
+       With page_size and/or cursor, returns a JSON window of rows instead of the whole <tbody>."""
     # Get filter parameters from the request
     hide_offtopic_param = request.args.get('hide_offtopic')
     year_from_param = request.args.get('year_from')
     year_to_param = request.args.get('year_to')
     min_page_count_param = request.args.get('min_page_count')
+    page_size_param = request.args.get('page_size')
+    cursor_param = request.args.get('cursor')
+
+    if cursor_param is not None:
+        # Follow-up window requested by the client while scrolling
+        try:
+            window = render_papers_window(
+                hide_offtopic_param=hide_offtopic_param,
+                year_from_param=year_from_param,
+                year_to_param=year_to_param,
+                min_page_count_param=min_page_count_param,
+                page_size_param=page_size_param,
+                sort_by_param=request.args.get('sort_by'),
+                sort_dir_param=request.args.get('sort_dir'),
+                cursor_param=cursor_param,
+            )
+            return jsonify(window)
+        except Exception as e:
+            print(f"Error loading table window: {e}")
+            return jsonify({'status': 'error', 'message': 'Failed to load table window'}), 500
 
     # Use the updated helper function to render the table, passing the search query
     table_html = render_papers_table(
@@ -1347,6 +2028,9 @@ def load_table():
         year_from_param=year_from_param,
         year_to_param=year_to_param,
         min_page_count_param=min_page_count_param,
+        page_size_param=page_size_param,
+        sort_by_param=request.args.get('sort_by'),
+        sort_dir_param=request.args.get('sort_dir'),
     )
     return table_html
 
@@ -1370,7 +2054,8 @@ def update_paper():
 
 @app.route('/upload_bibtex', methods=['POST'])
 def upload_bibtex():
-    """Endpoint to handle BibTeX/CSV file upload and import."""
+    """Endpoint to handle BibTeX/CSV file upload. The import is queued as a background job:
+       returns 202 with a job_id to poll at /jobs/<job_id>."""
     global DATABASE # Assuming DATABASE is defined globally as before
     if 'file' not in request.files:
         return jsonify({'status': 'error', 'message': 'No file part'}), 400
@@ -1388,51 +2073,75 @@ def upload_bibtex():
     # --- END NEW ---
 
     filename = file.filename.lower()
+    if filename.endswith('.bib'):
+        kind = 'bib'
+    elif filename.endswith('.csv'):
+        # CSV exports (IEEE Xplore, Scopus, ACM) are mapped straight to papers rows
+        kind = 'csv'
+    else:
+        return jsonify({'status': 'error', 'message': 'Invalid file type. Please upload a .bib or .csv file.'}), 400
+
     try:
         import import_bibtex
-        with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
+        # Optional worker process count for parsing/normalization ('auto' or 0 = one per CPU)
+        jobs = import_bibtex.parse_jobs(request.form.get('jobs'))
+        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{kind}') as tmp_file:
             file.save(tmp_file.name)
             tmp_file_path = tmp_file.name
-
-        if filename.endswith('.bib'):
-            # --- PASS the default value ---
-            import_bibtex.import_bibtex(tmp_file_path, DATABASE, default_is_survey_value=is_survey_default)
-            # --- END PASS ---
-        elif filename.endswith('.csv'):
-            bibtex_entries = import_bibtex.convert_csv_to_bibtex(tmp_file_path)
-            # Create temporary BibTeX file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.bib') as tmp_bib_file:
-                for entry in bibtex_entries:
-                    tmp_bib_file.write(entry.encode('utf-8'))
-                tmp_bib_path = tmp_bib_file.name
-            # --- PASS the default value ---
-            import_bibtex.import_bibtex(tmp_bib_path, DATABASE, default_is_survey_value=is_survey_default)
-            # --- END PASS ---
-            # Clean up the temporary BibTeX file
-            os.unlink(tmp_bib_path)
-        else:
-            # Clean up the temporary file before returning error
-            os.unlink(tmp_file_path)
-            return jsonify({'status': 'error', 'message': 'Invalid file type. Please upload a .bib or .csv file.'}), 400
-
-        # Clean up the temporary file
+        # The import runs in the background; the job owns (and deletes) the temporary file from here on
+        job = get_import_jobs().submit(tmp_file_path, file.filename, kind,
+                                       default_is_survey_value=is_survey_default, jobs=jobs)
+    except import_jobs.QueueFull as e:
         os.unlink(tmp_file_path)
-        return jsonify({'status': 'success', 'message': f'{"Primary" if import_type == "primary" else "Survey"} file imported successfully.'})
+        return jsonify({'status': 'error', 'message': str(e)}), 503
     except Exception as e:
-        # Ensure cleanup even if import fails
         if 'tmp_file_path' in locals():
             try:
                 os.unlink(tmp_file_path)
             except OSError:
                 pass # Ignore errors during cleanup
-        # Also clean up temporary BibTeX file if it was created
-        if 'tmp_bib_path' in locals():
-            try:
-                os.unlink(tmp_bib_path)
-            except OSError:
-                pass
         print(f"Error importing file: {e}")
         return jsonify({'status': 'error', 'message': f'Import failed: {str(e)}'}), 500
+    return jsonify({
+        'status': 'queued',
+        'message': f'{"Primary" if import_type == "primary" else "Survey"} file queued for import.',
+        'job_id': job['id'],
+        'job': job
+    }), 202
+
+# --- Background import jobs ---
+_import_jobs = None
+_import_jobs_lock = threading.Lock()
+
+def get_import_jobs():
+    """Returns the import job queue for DATABASE, starting its worker on first use."""
+    global _import_jobs
+    with _import_jobs_lock:
+        if _import_jobs is None:
+            _import_jobs = import_jobs.ImportJobQueue(DATABASE)
+        return _import_jobs
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Queued, running and recently finished import jobs, newest first."""
+    return jsonify({'status': 'success', 'jobs': get_import_jobs().list()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progress of one import job: status, parsed/inserted/skipped/failed counts and throughput."""
+    job = get_import_jobs().get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    return jsonify({'status': 'success', 'job': job})
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancels a queued or running import job. A queued job never starts; a running import stops after its
+       current chunk, and the chunks already imported are kept (importing the file again skips them)."""
+    job = get_import_jobs().cancel(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    return jsonify({'status': 'success', 'job': job})
 
 @app.route('/delete_paper/<paper_id>', methods=['DELETE'])
 def delete_paper(paper_id):
@@ -1440,19 +2149,16 @@ def delete_paper(paper_id):
     Deletes a paper record and its associated PDF files (original and annotated).
     """
     try:
-        conn = get_db_connection()
-        
-        # Fetch the paper record to get the filename
-        paper = conn.execute(
-            "SELECT pdf_filename FROM papers WHERE id = ?", (paper_id,)
-        ).fetchone()
+        with get_db_connection() as conn:
+            # Fetch the paper record to get the filename
+            paper = conn.execute(
+                "SELECT pdf_filename FROM papers WHERE id = ?", (paper_id,)
+            ).fetchone()
         
         if not paper:
-            conn.close()
             return jsonify({'status': 'error', 'message': 'Paper not found'}), 404
 
         filename = paper['pdf_filename']
-        conn.close()
 
         # Attempt to delete associated PDF files if they exist
         if filename: # Check if a filename was stored in the DB
@@ -1482,10 +2188,12 @@ def delete_paper(paper_id):
 
 
         # Delete the paper record from the database
-        conn = get_db_connection()
-        conn.execute("DELETE FROM papers WHERE id = ?", (paper_id,))
-        conn.commit()
-        conn.close()
+        with get_db_connection() as conn, db_pool.write_lock():
+            conn.execute("DELETE FROM papers WHERE id = ?", (paper_id,))
+            migrations.bump_revision(conn)
+            conn.commit()
+        get_fragment_cache().invalidate(paper_id)
+        forget_pdf_states(paper_id)
 
         print(f"Deleted paper record with ID: {paper_id}") # Debug log
         return jsonify({'status': 'success', 'message': 'Paper and associated files deleted successfully'})
@@ -1495,11 +2203,59 @@ def delete_paper(paper_id):
         return jsonify({'status': 'error', 'message': 'Failed to delete paper'}), 500
 
 
+# --- Production serving ---
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 5001
+PRODUCTION_THREADS = 8
+PRODUCTION_KEEP_ALIVE = 120         # Seconds an idle keep-alive connection is kept open
+PRODUCTION_MAX_REQUEST_MB = 4096    # Backups with PDFs reach /restore as a single request
+
+def serve_production(host=DEFAULT_HOST, port=DEFAULT_PORT, threads=PRODUCTION_THREADS,
+                     keep_alive=PRODUCTION_KEEP_ALIVE, max_request_mb=PRODUCTION_MAX_REQUEST_MB):
+    """Serves the app with waitress (see requirements.txt; the dev server does not need it) instead of the debug server.
+       One process with a pool of worker threads: import jobs, caches and the connection pool live in this
+       process, and db_pool.write_lock() serializes its SQLite writers. SIGINT/SIGTERM stop accepting
+       connections and let running requests finish (waitress waits up to 5 s) before the database is closed."""
+    try:
+        import waitress
+    except ImportError:
+        print("Error: --serve production requires waitress. Install it with: pip install waitress")
+        sys.exit(1)
+    max_request_bytes = max_request_mb * 1024 * 1024
+    app.config['MAX_CONTENT_LENGTH'] = max_request_bytes   # Flask answers 413 for larger uploads
+    server = waitress.create_server(app, host=host, port=port, threads=threads, channel_timeout=keep_alive,
+                                    max_request_body_size=max_request_bytes, ident='ResearchParsa')
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt  # server.run() drains the worker threads on KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f" * Serving on http://{host}:{port} with {threads} threads (waitress). Press Ctrl+C to stop.")
+    try:
+        server.run()
+    finally:
+        server.close()
+        db_pool.get_pool(DATABASE).close_all()
+        print("Server stopped.")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Browse and edit PCB inspection papers database.')
     parser.add_argument('db_file', nargs='?', help='SQLite database file path (optional)')
+    parser.add_argument('--serve', choices=['dev', 'production'], default='dev',
+                        help='dev: Flask debug server with reloader (default). production: multi-threaded waitress server')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--threads', type=int, default=PRODUCTION_THREADS,
+                        help=f'Production: worker threads handling requests (default: {PRODUCTION_THREADS})')
+    parser.add_argument('--keep-alive', type=int, default=PRODUCTION_KEEP_ALIVE,
+                        help=f'Production: seconds an idle connection is kept open (default: {PRODUCTION_KEEP_ALIVE})')
+    parser.add_argument('--max-request-mb', type=int, default=PRODUCTION_MAX_REQUEST_MB,
+                        help=f'Production: largest accepted request body in MB (default: {PRODUCTION_MAX_REQUEST_MB})')
     args = parser.parse_args()
+
+    # A restore interrupted halfway through swapping data/ is finished or rolled back before anything opens it
+    if backups.recover_interrupted_swap(globals.DATA_DIR, globals.PREVIOUS_DATA_DIR):
+        print(f"Recovered from an interrupted restore, see {globals.PREVIOUS_DATA_DIR}")
     
     if args.db_file:
         DATABASE = args.db_file
@@ -1552,6 +2308,8 @@ if __name__ == '__main__':
         if not cursor.fetchone():
             print(f"Error: Database '{DATABASE}' does not contain required 'papers' table")
             sys.exit(1)
+        # Bring older databases (and fallback.sqlite) up to the current schema in place
+        migrations.migrate_database(conn)
         conn.close()
     except sqlite3.Error as e:
         print(f"Error verifying database: {e}")
@@ -1563,21 +2321,24 @@ if __name__ == '__main__':
     # The standard Flask/Werkzeug reloader runs the script twice:
     # 1. Once in the parent process (to manage the reloader)
     # 2. Once in the child process (the actual server, where WERKZEUG_RUN_MAIN is set)
-    # We only want to open the browser in the child process.
-    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    # We only want to open the browser in the child process. The production server has no reloader: one process.
+    if args.serve == 'production' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
         # Function to open the browser after a delay
         def open_browser():
             import time
             time.sleep(2)  # Wait for the server to start
-            webbrowser.open("http://127.0.0.1:5001")
+            webbrowser.open(f"http://127.0.0.1:{args.port}")
 
         # Start the browser opener in a separate thread
         threading.Thread(target=open_browser, daemon=True).start()
-        print(" * Visit http://127.0.0.1:5001 to view the table.")
+        print(f" * Visit http://127.0.0.1:{args.port} to view the table.")
     
     # Ensure the templates and static folders exist
     if not os.path.exists('templates'):
         os.makedirs('templates')
     if not os.path.exists('static'):
         os.makedirs('static')
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    if args.serve == 'production':
+        serve_production(args.host, args.port, args.threads, args.keep_alive, args.max_request_mb)
+    else:
+        app.run(host=args.host, port=args.port, debug=True)
\ No newline at end of file
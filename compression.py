@@ -0,0 +1,67 @@
+# compression.py
+"""Response compression for browse_db.py (registered as an after_request hook).
+
+HTML and JSON responses above COMPRESS_MIN_SIZE are compressed with brotli when the client accepts it
+and the optional `brotli` package is installed, otherwise with gzip. Streamed and file responses
+(static export, XLSX, PDFs, static files) are left alone: they are either already compressed or sent
+straight from disk.
+"""
+import zlib
+
+try:
+    import brotli   # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024        # Bytes; smaller bodies are not worth a Content-Encoding
+GZIP_LEVEL = 6                  # zlib default: most of level 9's gain at a fraction of its cost
+BROTLI_QUALITY = 5              # Dynamic content: 5 is about gzip -6 speed with a smaller result
+COMPRESSIBLE_MIMETYPES = ('text/html', 'application/json', 'text/css', 'text/javascript', 'application/javascript')
+
+
+def available_encodings():
+    """Content codings this server can produce, preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encodings):
+    """Best available coding for a werkzeug Accept-Encoding header, or None."""
+    for encoding in available_encodings():
+        if accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)   # wbits=31: gzip container
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_response(response, accept_encodings):
+    """Compresses a buffered HTML/JSON response in place if the client accepts it. A strong ETag gets the
+       coding appended (like Apache's "-gzip"), since the compressed bytes are a different representation."""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = negotiate_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding))  # Also updates Content-Length
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+
+def etag_variants(etag):
+    """The ETags a client may hold for one representation: plain and one per content coding."""
+    return [etag] + [f'{etag}-{encoding}' for encoding in available_encodings()]
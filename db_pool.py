@@ -0,0 +1,225 @@
+# db_pool.py
+"""Long-lived SQLite connections shared by the Flask app (browse_db.py) and globals.py.
+
+Every thread gets one connection for as long as it holds it; nested get_db_connection() calls in the
+same thread reuse it. Released connections go back to a small idle list and are handed to the next
+thread, so the threaded dev server (a thread per request) and a fixed worker pool both reuse them.
+PRAGMAs are applied once per connection, and sqlite3's per-connection statement cache keeps prepared
+statements alive across requests.
+"""
+import sqlite3
+import threading
+import time
+
+# Applied once, when a connection is opened:
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),   # 256 MiB memory-mapped reads
+    ('cache_size', -64 * 1024),         # Negative = KiB, i.e. 64 MiB page cache
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),             # ms to wait for a concurrent writer instead of failing
+)
+STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection (sqlite3 default is 128)
+MAX_IDLE_CONNECTIONS = 8
+HOLDER_CHECK_INTERVAL = 0.5  # Seconds between drain()'s checks for holders whose thread has exited
+
+
+class _TrackedConnection(sqlite3.Connection):
+    """sqlite3.Connection that can carry the pool generation it was opened in."""
+    generation = 0
+
+
+class PooledConnection:
+    """Proxy returned by ConnectionPool.connect(). Behaves like sqlite3.Connection,
+       but close() hands the connection back to the pool instead of closing it.
+       Unlike sqlite3.Connection, `with get_db_connection() as conn:` releases the connection when the block
+       exits, even on an exception (an uncommitted transaction is rolled back, not committed)."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        # Idempotent: some callers close in both an except and a finally block
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+
+class ConnectionPool:
+    """Per-thread connection manager for a single database file."""
+
+    def __init__(self, db_path, max_idle=MAX_IDLE_CONNECTIONS):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle = []
+        self._generation = 0
+        self._in_use = 0        # Threads currently holding a connection
+        self._holders = {}      # Those threads -> their connection
+        self._draining = False  # Set by drain(): new holders wait until resume()
+        self._changed = threading.Condition(self._lock)
+        self._stats = {'opened': 0, 'closed': 0, 'acquired': 0, 'reused': 0}
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE,
+                               factory=_TrackedConnection)
+        conn.row_factory = sqlite3.Row
+        for name, value in CONNECTION_PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}").fetchall()
+        conn.generation = self._generation
+        return conn
+
+    def connect(self):
+        """Returns a PooledConnection for the calling thread, reusing a held or idle connection if possible."""
+        local = self._local
+        held = getattr(local, 'conn', None)
+        if held is None:
+            held = self._acquire()
+        else:
+            with self._lock:
+                self._stats['acquired'] += 1
+                self._stats['reused'] += 1
+        local.conn = held
+        local.depth = getattr(local, 'depth', 0) + 1
+        return PooledConnection(self, held)
+
+    def _acquire(self):
+        """Idle or new connection for a thread that holds none, registered as held by that thread."""
+        with self._lock:
+            self._stats['acquired'] += 1
+            self._changed.wait_for(lambda: not self._draining)
+            self._in_use += 1
+            if self._idle:
+                conn = self._idle.pop()
+                self._stats['reused'] += 1
+                self._holders[threading.current_thread()] = conn
+                return conn
+        try:
+            conn = self._open()
+        except BaseException:
+            with self._lock:
+                self._in_use -= 1
+                self._changed.notify_all()
+            raise
+        with self._lock:
+            self._stats['opened'] += 1
+            self._holders[threading.current_thread()] = conn
+        return conn
+
+    def release(self, conn):
+        """Called by PooledConnection.close(). The outermost release returns the connection to the idle list."""
+        local = self._local
+        local.depth -= 1
+        if local.depth > 0:
+            return
+        local.conn = None
+        if conn.in_transaction:
+            conn.rollback()  # Never leak an uncommitted transaction to the next user
+        with self._lock:
+            if self._holders.pop(threading.current_thread(), None) is not None:
+                self._in_use -= 1
+            self._changed.notify_all()
+            if conn.generation == self._generation and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._stats['closed'] += 1
+        conn.close()
+
+    def close_all(self):
+        """Closes idle connections and retires the ones currently in use (they are closed on release).
+           Must be called before the database file is replaced on disk (e.g. /restore)."""
+        with self._lock:
+            self._generation += 1
+            idle, self._idle = self._idle, []
+            self._stats['closed'] += len(idle)
+        for conn in idle:
+            conn.close()
+
+    def _discard_dead_holders(self):
+        """Forgets the connections of threads that exited without releasing them. Called with the lock held;
+           returns those connections, to be closed by the caller."""
+        dead = [thread for thread in self._holders if not thread.is_alive()]
+        self._in_use -= len(dead)
+        self._stats['closed'] += len(dead)
+        return [self._holders.pop(thread) for thread in dead]
+
+    def drain(self, timeout=None):
+        """Stops handing out connections and waits until every held one is released, then closes them all,
+           so nothing has the database file open (e.g. before /restore replaces it). Connections held by threads
+           that no longer exist are closed instead of waited for. The calling thread must not hold a connection.
+           Returns False, with the pool usable again, if that takes longer than timeout; after True the pool
+           stays closed to new holders until resume()."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        dead = []
+        with self._lock:
+            self._draining = True
+            while True:
+                dead.extend(self._discard_dead_holders())
+                if self._in_use == 0:
+                    break
+                remaining = HOLDER_CHECK_INTERVAL if deadline is None else deadline - time.monotonic()
+                if remaining <= 0:
+                    self._draining = False
+                    self._changed.notify_all()
+                    break
+                self._changed.wait(min(remaining, HOLDER_CHECK_INTERVAL))
+        for conn in dead:
+            conn.close()
+        if self._draining:
+            self.close_all()
+            return True
+        return False
+
+    def resume(self):
+        """Lets threads waiting in connect() continue after drain()."""
+        with self._lock:
+            self._draining = False
+            self._changed.notify_all()
+
+    def stats(self):
+        """Snapshot of pool counters, including the connection reuse rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        stats['reuse_rate'] = round(stats['reused'] / stats['acquired'], 4) if stats['acquired'] else 0.0
+        stats['database'] = self.db_path
+        return stats
+
+
+# SQLite allows one writer at a time. This process's writers hold this lock around their write
+# transaction, so concurrent requests (threaded server) queue here instead of racing for the database
+# lock and failing with "database is locked" once busy_timeout runs out.
+_write_lock = threading.RLock()
+
+def write_lock():
+    """Process-wide lock serializing write transactions: `with db_pool.write_lock(): ...; conn.commit()`."""
+    return _write_lock
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path):
+    """Returns the process-wide pool for db_path, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
+
+def get_connection(db_path):
+    """Shortcut for get_pool(db_path).connect()."""
+    return get_pool(db_path).connect()
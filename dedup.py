@@ -0,0 +1,201 @@
+# dedup.py
+"""Server-side near-duplicate detection for papers (/duplicates in browse_db.py, and the importer).
+
+Titles are reduced to a fingerprint (LaTeX commands, accents, case and punctuation removed) that is
+stored in papers.title_fingerprint. Equal fingerprints are duplicates; otherwise two titles match when
+the Jaccard similarity of their character trigrams reaches a threshold and their years are at most
+YEAR_TOLERANCE apart (preprint vs. published version).
+
+Candidate pairs come from trigram blocking with prefix filtering: each title's trigrams are ordered
+rarest first, and only the first few are indexed. Two sets can only reach the threshold if their
+prefixes share a trigram, so no pair is missed and titles are never compared all against all.
+"""
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+FUZZY_THRESHOLD = 0.85          # Trigram Jaccard similarity from which two titles are the same paper
+MIN_FINGERPRINT_LENGTH = 20     # Shorter titles ("Editorial", "Preface") are too generic to match on
+YEAR_TOLERANCE = 1              # Max. year difference (a preprint is often a year older than the paper)
+
+LATEX_COMMAND_RE = re.compile(r'\\(?:[a-zA-Z]+|[^a-zA-Z\s])')     # \emph, \textbf, accent commands like \" or \'
+LATEX_GROUPING_RE = re.compile(r'[{}$]')   # Braces and math delimiters: removed without a space, Sch\"{o}n -> Schon
+NON_ALNUM_RE = re.compile(r'[\W_]+')
+
+
+def title_fingerprint(title):
+    """Normalized title: no LaTeX commands, braces or math, no accents, lower case, and every run of
+       punctuation/whitespace collapsed to one space. '' for an empty title."""
+    if not title:
+        return ''
+    text = LATEX_GROUPING_RE.sub('', LATEX_COMMAND_RE.sub('', title))
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return NON_ALNUM_RE.sub(' ', text.casefold()).strip()
+
+
+def trigrams(fingerprint):
+    padded = f' {fingerprint} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def count_trigrams(fingerprints):
+    """Document frequency of every trigram: the "rarest first" order of TitleIndex."""
+    counts = defaultdict(int)
+    for fingerprint in fingerprints:
+        for gram in trigrams(fingerprint):
+            counts[gram] += 1
+    return dict(counts)
+
+
+def is_indexable(fingerprint):
+    return bool(fingerprint) and len(fingerprint) >= MIN_FINGERPRINT_LENGTH
+
+
+def normalize_year(year):
+    """Year as int, or None if unknown (unknown years match any year)."""
+    try:
+        return int(year) or None
+    except (TypeError, ValueError):
+        return None
+
+
+class TitleIndex:
+    """Fingerprint index answering "which known papers is this title a (near-)duplicate of?".
+
+    The trigram order (rarest first) is frozen from trigram_counts, usually the existing papers
+    (count_trigrams). Trigrams first seen in add() get ranks before all known ones, so every trigram
+    keeps its rank and the order stays consistent as papers are added.
+    """
+
+    def __init__(self, trigram_counts=None, threshold=FUZZY_THRESHOLD):
+        self.threshold = threshold
+        counts = trigram_counts or {}
+        self._rank = {gram: rank for rank, gram in enumerate(sorted(counts, key=lambda gram: (counts[gram], gram)))}
+        self._next_new_rank = -1
+        self._exact = defaultdict(list)     # fingerprint -> entry indexes
+        self._postings = defaultdict(list)  # prefix trigram -> entry indexes
+        self._entries = []                  # (paper_id, fingerprint, year, trigram set, set size)
+
+    @classmethod
+    def build(cls, papers, threshold=FUZZY_THRESHOLD):
+        """Index from (paper_id, fingerprint, year) tuples, e.g. the rows of the papers table."""
+        papers = [paper for paper in papers if is_indexable(paper[1])]
+        index = cls(count_trigrams(fingerprint for _, fingerprint, _ in papers), threshold)
+        for paper_id, fingerprint, year in papers:
+            index.add(paper_id, fingerprint, year)
+        return index
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _prefix_length(self, size):
+        """Number of (rarest) trigrams that must be indexed or probed for the threshold."""
+        return size - math.ceil(self.threshold * size) + 1
+
+    def add(self, paper_id, fingerprint, year):
+        if not is_indexable(fingerprint):
+            return
+        grams = trigrams(fingerprint)
+        rank = self._rank
+        for gram in grams:
+            if gram not in rank:
+                rank[gram] = self._next_new_rank
+                self._next_new_rank -= 1
+        entry = len(self._entries)
+        self._entries.append((paper_id, fingerprint, normalize_year(year), grams, len(grams)))
+        self._exact[fingerprint].append(entry)
+        for gram in sorted(grams, key=rank.__getitem__)[:self._prefix_length(len(grams))]:
+            self._postings[gram].append(entry)
+
+    def has_exact(self, fingerprint, year):
+        """True if a paper with this exact fingerprint and a compatible year is indexed."""
+        year = normalize_year(year)
+        return any(not year or not self._entries[entry][2] or abs(year - self._entries[entry][2]) <= YEAR_TOLERANCE
+                   for entry in self._exact.get(fingerprint, ()))
+
+    def matches(self, fingerprint, year):
+        """[(paper_id, similarity)] of the indexed papers this title duplicates, best first.
+           Similarity is 1.0 for an identical fingerprint."""
+        if not is_indexable(fingerprint):
+            return []
+        grams = trigrams(fingerprint)
+        rank = self._rank
+        known = sorted((gram for gram in grams if gram in rank), key=rank.__getitem__)
+        # Trigrams never added sort first and occur in no indexed title: they only use up the prefix
+        probe = known[:max(self._prefix_length(len(grams)) - (len(grams) - len(known)), 0)]
+        candidates = set(self._exact.get(fingerprint, ()))
+        for gram in probe:
+            candidates.update(self._postings.get(gram, ()))
+        year = normalize_year(year)
+        size = len(grams)
+        # Size filter: sets of very different sizes cannot reach the threshold
+        min_size = self.threshold * size
+        max_size = size / self.threshold
+        found = []
+        for entry in candidates:
+            paper_id, other_fingerprint, other_year, other_grams, other_size = self._entries[entry]
+            if other_size < min_size or other_size > max_size:
+                continue
+            if year and other_year and abs(year - other_year) > YEAR_TOLERANCE:
+                continue
+            if other_fingerprint == fingerprint:
+                found.append((paper_id, 1.0))
+                continue
+            shared = len(grams & other_grams)
+            similarity = shared / (size + other_size - shared)
+            if similarity >= self.threshold:
+                found.append((paper_id, round(similarity, 4)))
+        found.sort(key=lambda match: -match[1])
+        return found
+
+
+def refresh_fingerprints(conn):
+    """Computes title_fingerprint where it is missing: rows from before the column existed (migration 7), and
+       rows whose title was changed outside the app (a trigger clears it; the importer calls this first).
+       Runs in the caller's transaction; returns the number of rows updated."""
+    rows = conn.execute("SELECT rowid, title FROM papers WHERE title_fingerprint IS NULL").fetchall()
+    conn.executemany("UPDATE papers SET title_fingerprint = ? WHERE rowid = ?",
+                     [(title_fingerprint(title), rowid) for rowid, title in rows])
+    return len(rows)
+
+
+def find_duplicate_clusters(conn, threshold=FUZZY_THRESHOLD):
+    """Groups the papers that are (near-)duplicates of each other: every paper is matched against the
+       ones indexed before it, and matching pairs are merged with union-find.
+       Returns clusters, largest first, as {'papers': [...], 'similarity': lowest similarity of a merged pair}.
+       Only reads: a paper whose fingerprint is missing (see refresh_fingerprints) is left out until it is filled."""
+    papers = conn.execute("""
+        SELECT id, title, year, doi, journal, type, title_fingerprint FROM papers
+        WHERE length(title_fingerprint) >= ? ORDER BY id
+    """, (MIN_FINGERPRINT_LENGTH,)).fetchall()
+    index = TitleIndex(count_trigrams(paper[6] for paper in papers), threshold)
+
+    parent = {}         # paper id -> id it was merged into (roots are absent)
+    similarity = {}     # root -> lowest similarity of the pairs merged into its cluster
+    def find(paper_id):
+        while paper_id in parent:
+            parent[paper_id] = parent.get(parent[paper_id], parent[paper_id])   # Path halving
+            paper_id = parent[paper_id]
+        return paper_id
+
+    for paper_id, _, year, _, _, _, fingerprint in papers:
+        for other_id, score in index.matches(fingerprint, year):
+            root, other_root = find(paper_id), find(other_id)
+            lowest = min(score, similarity.get(root, 1.0))
+            if root != other_root:
+                lowest = min(lowest, similarity.pop(other_root, 1.0))
+                parent[other_root] = root
+            similarity[root] = lowest
+        index.add(paper_id, fingerprint, year)
+
+    clusters = defaultdict(list)
+    for paper_id, title, year, doi, journal, paper_type, _ in papers:
+        root = find(paper_id)
+        if root in similarity:
+            clusters[root].append({'id': paper_id, 'title': title, 'year': year, 'doi': doi,
+                                   'journal': journal, 'type': paper_type})
+    result = [{'papers': members, 'similarity': similarity[root]} for root, members in clusters.items()]
+    result.sort(key=lambda cluster: (-len(cluster['papers']), cluster['papers'][0]['title'] or ''))
+    return result
@@ -0,0 +1,115 @@
+# export_cache.py
+"""On-disk cache of generated exports (static HTML, XLSX) for browse_db.py.
+
+Entries are keyed by a tuple that includes the database's data revision (migrations.get_revision),
+so any write to papers makes older entries unreachable; they are then aged out by the size-bounded
+LRU eviction. Files are written to a temp name and renamed in, so a reader never sees a partial
+export, and the index is rebuilt from the directory at startup (last use = file mtime).
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024   # Total size of cached exports before the least recently used go
+TEMP_PREFIX = '.tmp_'
+
+
+class ExportCache:
+    """Size-bounded LRU of export files in cache_dir."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # file name -> size, least recently used first
+        self._stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+            if entry.name.startswith(TEMP_PREFIX):
+                _remove(entry.path)   # Left over from an export that never finished
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+
+    @staticmethod
+    def file_name(key, extension):
+        """Cache file name for a key tuple: a hash of its repr, plus the export's extension."""
+        return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32] + extension
+
+    def get(self, key, extension):
+        """Path of the cached export for key, or None. A hit makes it the most recently used entry."""
+        name = self.file_name(key, extension)
+        path = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if name not in self._entries or not os.path.exists(path):
+                self._entries.pop(name, None)
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(name)
+            self._stats['hits'] += 1
+        try:
+            os.utime(path)  # Keeps the LRU order across restarts
+        except OSError:
+            pass
+        return path
+
+    def new_temp_file(self, extension):
+        """Opens a temp file inside the cache dir (same filesystem, so put() is a rename). Returns (file, path)."""
+        fd, path = tempfile.mkstemp(prefix=TEMP_PREFIX, suffix=extension, dir=self.cache_dir)
+        return os.fdopen(fd, 'wb'), path
+
+    def put(self, key, extension, temp_path):
+        """Moves a finished temp file (from new_temp_file) into the cache under key and evicts
+           least recently used entries until the cache fits max_bytes. Returns the cached path.
+           The new entry itself is never evicted here, even if it alone exceeds max_bytes."""
+        name = self.file_name(key, extension)
+        path = os.path.join(self.cache_dir, name)
+        size = os.path.getsize(temp_path)
+        with self._lock:
+            os.replace(temp_path, path)
+            self._entries.pop(name, None)
+            self._entries[name] = size
+            total = sum(self._entries.values())
+            for old_name in list(self._entries)[:-1]:
+                if total <= self.max_bytes:
+                    break
+                if _remove(os.path.join(self.cache_dir, old_name)):
+                    total -= self._entries.pop(old_name)
+                    self._stats['evicted'] += 1
+        return path
+
+    def clear(self):
+        """Drops every entry (e.g. after /restore replaced the database)."""
+        with self._lock:
+            for name in list(self._entries):
+                if _remove(os.path.join(self.cache_dir, name)):
+                    del self._entries[name]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = sum(self._entries.values())
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+
+def _remove(path):
+    """Deletes a file. False if it could not be removed, e.g. it is still being sent (Windows)."""
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return True
+    except OSError:
+        return False
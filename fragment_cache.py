@@ -0,0 +1,69 @@
+# fragment_cache.py
+"""In-memory cache of rendered table rows (papers_table_row.html) for browse_db.py.
+
+One entry per paper, holding the HTML of its last render and the version it was rendered from: the
+row's `changed` timestamp, the PDF columns (serve_pdf updates pdf_state without touching `changed`)
+and the row template's identity. A lookup with any other version is a miss, and the fresh render
+replaces the entry, so edits never serve stale HTML even before invalidate() is called. The cache is
+bounded by the total size of the stored HTML, least recently used entries going first.
+"""
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024   # Rendered rows are ~2 KB: room for about 60k papers
+
+
+class FragmentCache:
+    """Size-bounded LRU of paper id -> (version, rendered HTML)."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # paper id -> (version, html), least recently used first
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evicted': 0, 'invalidated': 0}
+
+    def get(self, paper_id, version):
+        """Cached HTML of paper_id rendered at version, or None."""
+        with self._lock:
+            entry = self._entries.get(paper_id)
+            if entry is None or entry[0] != version:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(paper_id)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, paper_id, version, html):
+        with self._lock:
+            old = self._entries.pop(paper_id, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[paper_id] = (version, html)
+            self._bytes += len(html)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_html) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted_html)
+                self._stats['evicted'] += 1
+
+    def invalidate(self, paper_id):
+        """Drops the entry of an updated or deleted paper."""
+        with self._lock:
+            old = self._entries.pop(paper_id, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+                self._stats['invalidated'] += 1
+
+    def clear(self):
+        """Drops every entry (e.g. after /restore replaced the database)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        stats['max_bytes'] = self.max_bytes
+        return stats
@@ -2,11 +2,15 @@
 # **** This *has to be updated* when features or techniques change 
 # See DEFAULT_FEATURES and DEFAULT_TECHNIQUE below. ****
 
-import sqlite3
-
 import os
 
-DATABASE_FILE = os.path.join(os.getcwd(), 'data', 'db.sqlite')
+import db_pool
+
+DATA_DIR = os.path.join(os.getcwd(), 'data')
+# /restore swaps DATA_DIR for the restored tree; the replaced tree is kept here until the next restore
+PREVIOUS_DATA_DIR = os.path.join(os.getcwd(), 'data_before_restore')
+
+DATABASE_FILE = os.path.join(DATA_DIR, 'db.sqlite')
 os.makedirs(os.path.dirname(DATABASE_FILE), exist_ok=True)  # Ensure the directory exists
 
 PDF_STORAGE_DIR = os.path.join(os.getcwd(), 'data', 'pdf')
@@ -15,6 +19,16 @@ os.makedirs(PDF_STORAGE_DIR, exist_ok=True) # Ensure the directory exists
 ANNOTATED_PDF_STORAGE_DIR = os.path.join(os.getcwd(), 'data', 'pdf_annotated')
 os.makedirs(ANNOTATED_PDF_STORAGE_DIR, exist_ok=True)
 
+# Manifests of the last (full) backup, used to build incremental/differential backups
+BACKUP_STATE_FILE = os.path.join(os.getcwd(), 'data', 'backup_state.json')
+
+# Generated exports, reused until the data revision changes (outside data/: not backed up or restored)
+EXPORT_CACHE_DIR = os.path.join(os.getcwd(), 'export_cache')
+EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Rendered table rows kept in memory (see fragment_cache.py)
+FRAGMENT_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
 # --- Define emoji mapping for publication types ---
 TYPE_EMOJIS = {
     'article': '📄',        # Page facing up
@@ -38,10 +52,6 @@ PDF_EMOJIS = {
 
 def get_paper_by_id(db_path, paper_id):
     """Fetches a single paper's data from the database by its ID."""
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM papers WHERE id = ?", (paper_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with db_pool.get_connection(db_path) as conn:
+        row = conn.execute("SELECT * FROM papers WHERE id = ?", (paper_id,)).fetchone()
     return dict(row) if row else None
\ No newline at end of file
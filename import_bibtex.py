@@ -1,12 +1,17 @@
 # import_bibtex.py
 import sqlite3
-import bibtexparser
 from bibtexparser.bparser import BibTexParser
 from bibtexparser.customization import homogenize_latex_encoding
 import argparse
 import re 
 import csv
-from typing import List
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import db_pool
+import dedup
+import migrations
 
 def create_database(db_path):
     """Create SQLite database with a generic schema"""
@@ -45,6 +50,8 @@ def create_database(db_path):
         pdf_state TEXT DEFAULT 'none'      -- 'none', 'annotated', 'PDF'
     )
     ''')
+    conn.commit()
+    migrations.migrate_database(conn)
     cursor.execute('PRAGMA journal_mode = WAL')
     conn.commit()
     conn.close()
@@ -62,26 +69,28 @@ def parse_keywords(keywords_str):
         return ""
     return "; ".join(k.strip() for k in keywords_str.split(','))
 
+# Compiled once at import time: clean_latex_commands runs on every title and pages field
+LATEX_BRACE_RE = re.compile(r'(?<!\\)[{}]')
+LATEX_REPLACEMENTS = (
+    (re.compile(r'\\text(?:en|em)dash|\\(?:en|em)dash'), '-'),     # Dash commands -> regular dash
+    (re.compile(r'\\textellipsis|\\ldots|\\dots'), '...'),
+    (re.compile(r'\\[a-zA-Z]+'), ''),     # Any remaining LaTeX command (backslash followed by letters)
+)
+WHITESPACE_RE = re.compile(r'\s+')
+PAGES_RANGE_RE = re.compile(r'^(\d+)\s*[-–—]*\s*(\d+)?$')
+PAGES_PLUS_RE = re.compile(r'^\d+\+$')
+
 def clean_latex_commands(text):
     """Remove common LaTeX commands and formatting from text."""
     if not text:
         return text
     # Remove unescaped braces
-    text = re.sub(r'(?<!\\)\{', '', text)
-    text = re.sub(r'(?<!\\)\}', '', text)
-    # Replace LaTeX dash commands with regular dash
-    text = re.sub(r'\\textendash', '-', text)
-    text = re.sub(r'\\textemdash', '-', text)
-    text = re.sub(r'\\endash', '-', text)
-    text = re.sub(r'\\emdash', '-', text)
-    # Remove other common LaTeX commands
-    text = re.sub(r'\\textellipsis', '...', text)
-    text = re.sub(r'\\ldots', '...', text)
-    text = re.sub(r'\\dots', '...', text)
-    # Remove any remaining LaTeX commands (pattern: backslash followed by letters)
-    text = re.sub(r'\\[a-zA-Z]+', '', text)
+    text = LATEX_BRACE_RE.sub('', text)
+    # Replace dash/ellipsis commands, then drop the remaining ones
+    for pattern, replacement in LATEX_REPLACEMENTS:
+        text = pattern.sub(replacement, text)
     # Clean up extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = WHITESPACE_RE.sub(' ', text).strip()
     return text
 
 def parse_pages(pages_str):
@@ -97,7 +106,7 @@ def parse_pages(pages_str):
     pages_str = clean_latex_commands(pages_str).strip()
     # Match common formats including double hyphens
     # Covers: "123--456", "123-456", "123–456", "123—456"
-    match = re.match(r'^(\d+)\s*[-–—]*\s*(\d+)?$', pages_str.replace('--', '-'))
+    match = PAGES_RANGE_RE.match(pages_str.replace('--', '-'))
     if match:
         start_page = int(match.group(1))
         end_page = int(match.group(2)) if match.group(2) else start_page
@@ -106,7 +115,7 @@ def parse_pages(pages_str):
         return normalized, count
     else:
         # Handle "123+" format
-        if re.match(r'^\d+\+$', pages_str):
+        if PAGES_PLUS_RE.match(pages_str):
             page = int(pages_str[:-1])
             return f"{page} - {page}", 1
         elif pages_str.isdigit():
@@ -164,39 +173,6 @@ def clean_authors(authors_str: str) -> str:
     
     return " and ".join(cleaned_authors)
 
-def clean_title(title: str) -> str:
-    """Clean title for BibTeX format."""
-    if not title:
-        return ""
-    
-    title = title.replace('{', '\\{').replace('}', '\\}')
-    title = title.replace('#', '\\#')
-    title = title.replace('$', '\\$')
-    title = title.replace('%', '\\%')
-    title = title.replace('&', '\\&')
-    title = title.replace('_', '\\_')
-    title = title.replace('^', '\\^')
-    title = title.replace('~', '\\~')
-    
-    return title
-
-def escape_bibtex_field(text: str) -> str:
-    """Escape special characters in BibTeX fields."""
-    if not text:
-        return ""
-    
-    text = text.replace('{', '\\{').replace('}', '\\}')
-    text = text.replace('#', '\\#')
-    text = text.replace('$', '\\$')
-    text = text.replace('%', '\\%')
-    text = text.replace('&', '\\&')
-    text = text.replace('_', '\\_')
-    text = text.replace('^', '\\^')
-    text = text.replace('~', '\\~')
-    text = text.replace('\\', '\\textbackslash{}')
-    
-    return text
-
 def extract_month_from_date(date_str: str) -> str:
     """Extract month from date string like '30 May 2025'."""
     if not date_str:
@@ -221,311 +197,652 @@ def extract_month_from_date(date_str: str) -> str:
     return ""
 
 
-def convert_csv_to_bibtex(csv_file_path: str) -> List[str]:
-    """Convert a single CSV file to BibTeX entries."""
-    bibtex_entries = []
-    
-    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        
-        for row_idx, row in enumerate(reader):
+# --- Bulk import ---
+INSERT_BATCH_SIZE = 5000        # Rows per executemany() call
+MAX_REPORTED_ERRORS = 20        # Error messages kept in the import report
+
+PAPER_INSERT_COLUMNS = (
+    'id', 'type', 'title', 'authors', 'year', 'month', 'journal',
+    'volume', 'pages', 'page_count', 'doi', 'issn', 'abstract', 'keywords',
+    'research_area', 'is_offtopic', 'relevance', 'is_survey',
+    'changed', 'changed_by', 'verified', 'verified_by', 'reasoning_trace', 'verifier_trace', 'user_trace',
+    'title_fingerprint',
+)
+PAPER_INSERT_SQL = (
+    f"INSERT INTO papers ({', '.join(PAPER_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join(':' + c for c in PAPER_INSERT_COLUMNS)})"
+)
+
+def normalize_entry(entry, default_is_survey_value=None):
+    """Convert a parsed BibTeX entry (bibtexparser dict) into a papers row dict."""
+    # Prepare data for insertion
+    title_raw = entry.get('title', '')
+    cleaned_title = clean_latex_commands(title_raw)
+    # Handle pages and page_count
+    raw_pages = entry.get('pages', '')
+    normalized_pages, computed_page_count = parse_pages(raw_pages)
+    # Try to get page_count from numpages field
+    numpages_str = entry.get('numpages', '')
+    page_count = None
+    if numpages_str.isdigit():
+        page_count = int(numpages_str)
+    else:
+        page_count = computed_page_count  # fallback to computed value
+    # Set relevance based on is_offtopic (0 for offtopic, 10 for ontopic)
+    is_offtopic = None  # Default to unknown
+    relevance = None    # Default to unknown
+
+    # Determine is_survey value: use the default passed in, otherwise keep as None (unknown)
+    is_survey_value = default_is_survey_value
+
+    return {
+        'id': entry.get('ID', ''),
+        'type': entry.get('ENTRYTYPE', ''),
+        'title': cleaned_title,
+        'authors': parse_authors(entry.get('author', '')),
+        'year': int(entry.get('year', '0')) if entry.get('year', '').isdigit() else None,
+        'month': entry.get('month', ''),
+        'journal': entry.get('journal', '') or entry.get('booktitle', ''),
+        'volume': entry.get('volume', ''),
+        'pages': normalized_pages,
+        'page_count': page_count,
+        'doi': entry.get('doi', ''),
+        'issn': entry.get('issn', ''),
+        'abstract': entry.get('abstract', ''),
+        'keywords': parse_keywords(entry.get('keywords', '')),
+        'research_area': None,
+        'is_offtopic': is_offtopic,
+        'relevance': relevance,
+        # --- SET is_survey using the default value ---
+        'is_survey': is_survey_value,
+        # --- END SET ---
+        'changed': None,
+        'changed_by': None,
+        'verified': None,
+        'verified_by': None,
+        'reasoning_trace': None,
+        'verifier_trace': None,
+        'user_trace': None,
+        'title_fingerprint': dedup.title_fingerprint(cleaned_title),
+    }
+
+def title_key(title):
+    """Normalized title used for duplicate detection; matches the title_norm column (lower(trim(title)))."""
+    return (title or '').strip().lower()
+
+def new_import_report():
+    """Structured result of an import, returned instead of printing per-entry messages."""
+    return {'total': 0, 'imported': 0, 'skipped_duplicate': 0, 'possible_duplicates': 0, 'failed': 0, 'errors': []}
+
+def record_import_error(report, message):
+    report['failed'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append(message)
+
+def load_known_keys(conn):
+    """Loads the duplicate-detection keys of every paper already in the database, once per import,
+       including the title fingerprint index (dedup.TitleIndex) used for near-duplicates."""
+    dedup.refresh_fingerprints(conn)
+    known_keys = {'ids': set(), 'dois': set(), 'title_years': set()}
+    fingerprints = []
+    for paper_id, doi, title, year, fingerprint in conn.execute(
+            "SELECT id, doi, title, year, title_fingerprint FROM papers"):
+        known_keys['ids'].add(paper_id)
+        if doi:
+            known_keys['dois'].add(doi)
+        if title and year:
+            known_keys['title_years'].add((title_key(title), year))
+        fingerprints.append((paper_id, fingerprint, year))
+    known_keys['titles'] = dedup.TitleIndex.build(fingerprints)
+    return known_keys
+
+def is_duplicate_row(row, known_keys):
+    """Duplicate rules: same ID, same DOI, same title + year, or the same title fingerprint (case,
+       punctuation, LaTeX) within dedup.YEAR_TOLERANCE years. The title rules also apply to entries with
+       a DOI, since another database may have exported the same paper without it."""
+    if row['id'] in known_keys['ids']:
+        return True
+    if row['doi'] and row['doi'] in known_keys['dois']:
+        return True
+    if row['title'] and row['year'] and (title_key(row['title']), row['year']) in known_keys['title_years']:
+        return True
+    return known_keys['titles'].has_exact(row['title_fingerprint'], row['year'])
+
+def remember_row_keys(row, known_keys):
+    known_keys['ids'].add(row['id'])
+    if row['doi']:
+        known_keys['dois'].add(row['doi'])
+    if row['title'] and row['year']:
+        known_keys['title_years'].add((title_key(row['title']), row['year']))
+    known_keys['titles'].add(row['id'], row['title_fingerprint'], row['year'])
+
+def insert_paper_rows(conn, rows, known_keys, report):
+    """Deduplicates a chunk of normalized rows (against the DB and the rows seen so far in this import)
+       and inserts the rest with executemany. Must run inside the caller's transaction."""
+    batch = []
+    for row in rows:
+        report['total'] += 1
+        if is_duplicate_row(row, known_keys):
+            report['skipped_duplicate'] += 1
+            continue
+        if known_keys['titles'].matches(row['title_fingerprint'], row['year']):
+            # Similar title (e.g. preprint vs. published version): imported, but listed by /duplicates
+            report['possible_duplicates'] += 1
+        remember_row_keys(row, known_keys)
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            _insert_batch(conn, batch, report)
+            batch = []
+    if batch:
+        _insert_batch(conn, batch, report)
+
+def _insert_batch(conn, batch, report):
+    # executemany stops at the first bad row with the rows before it already inserted: the savepoint
+    # undoes them, so the row-by-row retry neither inserts them twice nor reports them as failed
+    conn.execute("SAVEPOINT insert_batch")
+    try:
+        conn.executemany(PAPER_INSERT_SQL, batch)
+        conn.execute("RELEASE insert_batch")
+        report['imported'] += len(batch)
+    except sqlite3.Error:
+        conn.execute("ROLLBACK TO insert_batch")
+        conn.execute("RELEASE insert_batch")
+        # Some row in the batch is invalid: retry row by row to only lose the bad ones
+        for row in batch:
             try:
-                # Create a unique key for the entry
-                title = row.get("Document Title", "")
-                authors = row.get("Authors", "")
-                
-                if authors:
-                    first_author = authors.split(';')[0].strip() if ';' in authors else authors.strip()
-                    first_author_name = first_author.split()[-1] if first_author.split() else "Unknown"
-                else:
-                    first_author_name = "Unknown"
-                
-                year = row.get("Publication Year", "0000")
-                title_part = clean_bibtex_key(title[:20]) if title else "title"
-                
-                key = f"{first_author_name}{year}{title_part}"
-                
-                # Ensure key is unique
-                original_key = key
-                counter = 1
-                while any(entry.startswith(f"@article{{{key}") or 
-                         entry.startswith(f"@inproceedings{{{key}") or 
-                         entry.startswith(f"@conference{{{key}") or 
-                         entry.startswith(f"@book{{{key}") for entry in bibtex_entries):
-                    key = f"{original_key}{counter}"
-                    counter += 1
-                
-                # Determine entry type using the Document Identifier field
-                doc_identifier = row.get("Document Identifier", "").strip().lower()
-                if "conference" in doc_identifier:
-                    entry_type = "inproceedings"
-                elif "journal" in doc_identifier:
-                    entry_type = "article"
-                else:
-                    # Fallback: try to determine from Publication Title if Document Identifier is not available
-                    pub_title = row.get("Publication Title", "").lower()
-                    if "conference" in pub_title or "inproceeding" in pub_title or "proceeding" in pub_title:
-                        entry_type = "inproceedings"
-                    elif "journal" in pub_title or "trans" in pub_title:
-                        entry_type = "article"
-                    else:
-                        entry_type = "article"
-                
-                # Start building the BibTeX entry
-                bibtex_entry = f"@{entry_type}{{{key},\n"
-                
-                # Add title
-                if title:
-                    bibtex_entry += f"  title = {{{clean_title(title)}}},\n"
-                
-                # Add authors
-                if authors:
-                    bibtex_entry += f"  author = {{{clean_authors(authors)}}},\n"
-                
-                # Add journal/booktitle
-                pub_title = row.get("Publication Title", "")
-                if pub_title:
-                    if entry_type == "inproceedings":
-                        bibtex_entry += f"  booktitle = {{{escape_bibtex_field(pub_title)}}},\n"
-                    else:
-                        bibtex_entry += f"  journal = {{{escape_bibtex_field(pub_title)}}},\n"
-                
-                # Add year
-                if year and year != "0000":
-                    bibtex_entry += f"  year = {{{year}}},\n"
-                
-                # Add month
-                date_added = row.get("Date Added To Xplore", "")
-                if date_added:
-                    month = extract_month_from_date(date_added)
-                    if month:
-                        bibtex_entry += f"  month = {{{month}}},\n"
-                
-                # Add volume if available
-                volume = row.get("Volume", "").strip()
-                if volume:
-                    bibtex_entry += f"  volume = {{{volume}}},\n"
-                
-                # Add issue as number if available
-                issue = row.get("Issue", "").strip()
-                if issue:
-                    bibtex_entry += f"  number = {{{issue}}},\n"
-                
-                # Add pages if available
-                start_page = row.get("Start Page", "").strip()
-                end_page = row.get("End Page", "").strip()
-                if start_page and end_page:
-                    bibtex_entry += f"  pages = {{{start_page}--{end_page}}},\n"
-                elif start_page:
-                    bibtex_entry += f"  pages = {{{start_page}}},\n"
-                
-                # Add DOI if available
-                doi = row.get("DOI", "").strip()
-                if doi:
-                    bibtex_entry += f"  doi = {{{doi}}},\n"
-                
-                # Add ISSN if available
-                issn = row.get("ISSN", "").strip()
-                if issn:
-                    bibtex_entry += f"  issn = {{{issn}}},\n"
-                
-                # Add ISBN if available
-                isbn = row.get("ISBNs", "").strip()
-                if isbn:
-                    bibtex_entry += f"  isbn = {{{isbn}}},\n"
-                
-                # Add publisher if available
-                publisher = row.get("Publisher", "").strip()
-                if publisher:
-                    bibtex_entry += f"  publisher = {{{escape_bibtex_field(publisher)}}},\n"
-                
-                # Add abstract (the fully-featured part you wanted!)
-                abstract = row.get("Abstract", "").strip()
-                if abstract:
-                    bibtex_entry += f"  abstract = {{{escape_bibtex_field(abstract)}}},\n"
-                
-                # Add keywords from IEEE Terms (as keyword field)
-                ieee_terms = row.get("IEEE Terms", "").strip()
-                if ieee_terms:
-                    # Convert semicolon-separated terms to comma-separated keywords
-                    keywords = ieee_terms.replace(';', ',').replace('|', ',')
-                    bibtex_entry += f"  keywords = {{{escape_bibtex_field(keywords)}}},\n"
-                
-                # Add author keywords if available
-                author_keywords = row.get("Author Keywords", "").strip()
-                if author_keywords:
-                    if ieee_terms:  # If we already have keywords, append to them
-                        all_keywords = f"{ieee_terms}, {author_keywords}"
-                        all_keywords = all_keywords.replace(';', ',').replace('|', ',')
-                        bibtex_entry += f"  keywords = {{{escape_bibtex_field(all_keywords)}}},\n"
-                    else:
-                        keywords = author_keywords.replace(';', ',').replace('|', ',')
-                        bibtex_entry += f"  keywords = {{{escape_bibtex_field(keywords)}}},\n"
-                
-                # Add PDF link if available
-                pdf_link = row.get("PDF Link", "").strip()
-                if pdf_link:
-                    bibtex_entry += f"  url = {{{pdf_link}}},\n"
-                
-                # Add note about citation counts
-                citation_count = row.get("Article Citation Count", "").strip()
-                if citation_count and citation_count != "0":
-                    bibtex_entry += f"  note = {{Citations: {citation_count}}},\n"
-                
-                if row.get("Document Identifier"):
-                    doc_id = row.get("Document Identifier", "").strip()
-                    if doc_id:
-                        bibtex_entry += f"  file = {{{doc_id}}},\n"
-                
-                # Add reference count as a custom field
-                ref_count = row.get("Reference Count", "").strip()
-                if ref_count:
-                    bibtex_entry += f"  references = {{{ref_count}}},\n"
-                
-                # Add funding information as a custom field
-                funding = row.get("Funding Information", "").strip()
-                if funding:
-                    bibtex_entry += f"  funding = {{{escape_bibtex_field(funding)}}},\n"
-                
-                # Add Mesh terms as a custom field
-                mesh_terms = row.get("Mesh_Terms", "").strip()
-                if mesh_terms:
-                    bibtex_entry += f"  mesh = {{{escape_bibtex_field(mesh_terms)}}},\n"
-                
-                bibtex_entry += "}\n\n"
-                bibtex_entries.append(bibtex_entry)
-                
-            except Exception as e:
-                print(f"Error processing row {row_idx + 2} in {csv_file_path}: {e}")
-                continue
-    
-    return bibtex_entries
+                conn.execute(PAPER_INSERT_SQL, row)
+                report['imported'] += 1
+            except sqlite3.Error as e:
+                record_import_error(report, f"Error inserting entry '{row['id']}': {e}")
 
+def remove_placeholder_paper(conn):
+    """Removes the fallback.sqlite placeholder (id=1) once real data exists. Runs in the caller's transaction."""
+    conn.execute("DELETE FROM papers WHERE id = '1'")
 
+# --- Streaming BibTeX reader ---
+STREAM_READ_SIZE = 1 << 20      # Characters read from the .bib file at a time
+PARSE_CHUNK_SIZE = 500          # Entries parsed (and inserted) per chunk
+DEFAULT_IMPORT_JOBS = 1         # Worker processes for parsing/normalization; 1 = in-process
+MAX_IMPORT_JOBS = 32
+ENTRY_START_RE = re.compile(r'@\s*([A-Za-z]+)\s*([{(])')
+# Inside a block: escaped quotes, quotes, braces, parens, and an entry start at the beginning of a line
+BLOCK_TOKEN_RE = re.compile(r'\\"|["{}()]|\n[ \t]*@\s*[A-Za-z]+\s*[{(]')
+MAX_BLOCK_TOKEN_LENGTH = 64     # Tokens starting this close to the end of the buffer wait for the next read
 
+def iter_bibtex_blocks(text_file, read_size=STREAM_READ_SIZE, report=None):
+    """Yields the raw text of every top-level @type{...} block (entries, @string, @comment, @preamble)
+       without reading the whole file. Only the current block plus one read buffer is kept in memory.
+       Text between blocks is ignored, like BibTeX does.
+       Delimiters inside "quoted" values are ignored. A block that is still open when the next entry
+       starts at the beginning of a line (an unbalanced brace), or at the end of the file, is dropped
+       with an error in report and scanning resumes at that next entry."""
+    buffer = ''
+    eof = False
+    start = None    # Offset of the '@' of the block being scanned, None while looking for the next block
+    scan = 0        # Where to resume scanning in buffer
+    depth = 0       # Brace depth inside the current block
+    in_quotes = False
+    paren_block = False
+    quotes_delimit = True
+    while True:
+        if start is None:
+            match = ENTRY_START_RE.search(buffer, scan)
+            if match:
+                start = match.start()
+                scan = match.end()
+                # "@type(...)" blocks close on a ')' outside braced values; "@type{...}" on the matching '}'
+                paren_block = match.group(2) == '('
+                depth = 0 if paren_block else 1
+                in_quotes = False
+                # @comment bodies are free text: a quote there does not start a value
+                quotes_delimit = match.group(1).lower() != 'comment'
+            else:
+                if eof:
+                    return
+                # Only a trailing, possibly split "@type{" marker is worth keeping
+                at = buffer.rfind('@')
+                buffer = buffer[at:] if at != -1 and len(buffer) - at < 64 else ''
+                scan = 0
+                chunk = text_file.read(read_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+        end = None
+        resync = None
+        base_depth = 0 if paren_block else 1    # Depth of the field values, where quotes delimit
+        safe_end = len(buffer) if eof else len(buffer) - MAX_BLOCK_TOKEN_LENGTH
+        for match in BLOCK_TOKEN_RE.finditer(buffer, scan):
+            if match.start() >= safe_end:
+                break
+            scan = match.end()
+            token = match.group()
+            if token[0] == '\n':
+                resync = match.start() + 1  # Still open at the next entry: unbalanced brace or quote
+                break
+            if token == '\\"':
+                continue
+            if in_quotes:
+                if token == '"':
+                    in_quotes = False
+                continue
+            if token == '"':
+                in_quotes = quotes_delimit and depth == base_depth
+            elif token == '{':
+                depth += 1
+            elif token == '}':
+                depth -= 1
+                if depth == 0 and not paren_block:
+                    end = match.end()
+                    break
+            elif token == ')' and paren_block and depth == 0:
+                end = match.end()
+                break
+        else:
+            scan = max(scan, safe_end)  # No token before safe_end left: don't rescan that text
+        if end is not None:
+            yield buffer[start:end]
+            buffer = buffer[end:]
+            start = None
+            scan = 0
+            continue
+        if resync is None and eof:
+            resync = len(buffer)
+        if resync is not None:
+            if report is not None:
+                report['total'] += 1
+                record_import_error(report, f"Unterminated entry '{buffer[start:start + 60].splitlines()[0].strip()}...' skipped")
+            buffer = buffer[resync:]
+            start = None
+            scan = 0
+            continue
+        chunk = text_file.read(read_size)
+        eof = not chunk
+        buffer += chunk
 
-# Modify the function signature to accept the default value
-def import_bibtex(bib_file, db_path, default_is_survey_value=None): # Add default_is_survey_value parameter
-    """Import BibTeX file into SQLite database"""
-    # Configure BibTeX parser
+def make_bibtex_parser():
+    """BibTeX parser configured for import."""
     parser = BibTexParser(common_strings=True)
     parser.customization = homogenize_latex_encoding
     parser.ignore_nonstandard_types = False
-    # Parse BibTeX file
+    parser.expect_multiple_parse = True
+    return parser
+
+def parse_bibtex_blocks(parser, blocks, report):
+    """Parses a chunk of raw blocks and returns the parsed entries (dicts).
+       If the chunk fails as a whole, blocks are retried one by one so a single broken entry
+       only costs itself."""
+    try:
+        parser.parse("\n".join(blocks))
+        entries = parser.bib_database.entries
+    except Exception:
+        entries = []
+        for block in blocks:
+            parser.bib_database.entries = []
+            parser.bib_database._entries_dict = {}
+            try:
+                parser.parse(block)
+                entries.extend(parser.bib_database.entries)
+            except Exception as e:
+                report['total'] += 1
+                record_import_error(report, f"Could not parse entry '{block[:60].strip()}...': {e}")
+    # Entries were handed over: don't let the parser's database grow with the file
+    parser.bib_database.entries = []
+    parser.bib_database._entries_dict = {}
+    return entries
+
+STRING_BLOCK_RE = re.compile(r'@\s*string\s*[{(]', re.IGNORECASE)
+
+def iter_bibtex_block_chunks(bib_file, chunk_size=PARSE_CHUNK_SIZE, report=None):
+    """Streams a .bib file and yields (blocks, string_blocks) tuples, chunk_size blocks at a time.
+       string_blocks holds every @string macro seen so far, so a chunk can be parsed on its own
+       (e.g. in another process) and still resolve macros defined earlier in the file.
+       Unterminated blocks are recorded in report (see iter_bibtex_blocks)."""
+    string_blocks = []
     with open(bib_file, 'r', encoding='utf-8') as f:
-        bib_db = bibtexparser.load(f, parser=parser)
-    create_database(db_path)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    for entry in bib_db.entries:
-        # Prepare data for insertion
-        title_raw = entry.get('title', '')
-        cleaned_title = clean_latex_commands(title_raw)
-        # Handle pages and page_count
-        raw_pages = entry.get('pages', '')
-        normalized_pages, computed_page_count = parse_pages(raw_pages)
-        # Try to get page_count from numpages field
-        numpages_str = entry.get('numpages', '')
-        page_count = None
-        if numpages_str.isdigit():
-            page_count = int(numpages_str)
-        else:
-            page_count = computed_page_count  # fallback to computed value
-        # Set relevance based on is_offtopic (0 for offtopic, 10 for ontopic)
-        is_offtopic = None  # Default to unknown
-        relevance = None    # Default to unknown
-
-        # Determine is_survey value: use the default passed in, otherwise keep as None (unknown)
-        is_survey_value = default_is_survey_value
-
-        data = {
-            'id': entry.get('ID', ''),
-            'type': entry.get('ENTRYTYPE', ''),
-            'title': cleaned_title,
-            'authors': parse_authors(entry.get('author', '')),
-            'year': int(entry.get('year', '0')) if entry.get('year', '').isdigit() else None,
-            'month': entry.get('month', ''),
-            'journal': entry.get('journal', '') or entry.get('booktitle', ''),
-            'volume': entry.get('volume', ''),
-            'pages': normalized_pages,
-            'page_count': page_count,
-            'doi': entry.get('doi', ''),
-            'issn': entry.get('issn', ''),
-            'abstract': entry.get('abstract', ''),
-            'keywords': parse_keywords(entry.get('keywords', '')),
-            'research_area': None,
-            'is_offtopic': is_offtopic,
-            'relevance': relevance,
-            # --- SET is_survey using the default value ---
-            'is_survey': is_survey_value,
-            # --- END SET ---
-            'changed': None,
-            'changed_by': None,
-            'verified': None,
-            'verified_by': None,
-            'reasoning_trace': None,
-            'verifier_trace': None,
-            'user_trace': None,
-        }
-        # Check for duplicates: prioritize DOI, fallback to title + year
-        doi = data['doi']
-        title = data['title']
-        year = data['year']
-        duplicate_found = False
-        if doi:
-            cursor.execute("SELECT id FROM papers WHERE doi = ?", (doi,))
-            if cursor.fetchone():
-                print(f"Skipping duplicate entry with DOI '{doi}'")
-                duplicate_found = True
-        else:
-            # Fallback: check for same title and year
-            if title and year:
-                cursor.execute("SELECT id FROM papers WHERE title = ? AND year = ?", (title, year))
-                if cursor.fetchone():
-                    print(f"Skipping duplicate entry with title '{title}' and year '{year}'")
-                    duplicate_found = True
-
-        if duplicate_found:
-            continue  # Skip this entry
-        # Insert into database
+        blocks = []
+        for block in iter_bibtex_blocks(f, report=report):
+            if STRING_BLOCK_RE.match(block):
+                string_blocks.append(block)
+                continue
+            blocks.append(block)
+            if len(blocks) >= chunk_size:
+                yield blocks, tuple(string_blocks)
+                blocks = []
+        if blocks:
+            yield blocks, tuple(string_blocks)
+
+def normalize_entries(entries, default_is_survey_value, report):
+    """Normalizes parsed entries into papers rows, recording the ones that fail."""
+    rows = []
+    for entry in entries:
         try:
-            cursor.execute('''
-            INSERT INTO papers (
-                id, type, title, authors, year, month, journal,
-                volume, pages, page_count, doi, issn, abstract, keywords,
-                research_area, is_offtopic, relevance, is_survey,
-                changed, changed_by, verified, verified_by, reasoning_trace, verifier_trace, user_trace
-            ) VALUES (
-                :id, :type, :title, :authors, :year, :month, :journal,
-                :volume, :pages, :page_count, :doi, :issn, :abstract, :keywords,
-                :research_area, :is_offtopic, :relevance, :is_survey,
-                :changed, :changed_by, :verified, :verified_by, :reasoning_trace, :verifier_trace, :user_trace
-            )
-            ''', data)
-        except sqlite3.IntegrityError as e:
-            print(f"Warning: Skipping duplicate ID '{data['id']}' - {e}")
+            rows.append(normalize_entry(entry, default_is_survey_value))
         except Exception as e:
-            print(f"Error inserting entry '{data['id']}': {e}")
-
-    # Check if placeholder record with id=1 exists before import
-    cursor.execute("SELECT COUNT(*) FROM papers WHERE id = '1'")
-    placeholder_exists = cursor.fetchone()[0] > 0
-    # Delete the placeholder record with id=1 if it existed before import
-    if placeholder_exists:
-        cursor.execute("DELETE FROM papers WHERE id = '1'")
-        print("Removed placeholder record with id=1")
-    conn.commit()
-    print(f"Imported {len(bib_db.entries)} records into database '{db_path}'")
-    conn.close()
+            report['total'] += 1
+            record_import_error(report, f"Error processing entry '{entry.get('ID', '')}': {e}")
+    return rows
+
+def parse_and_normalize_chunk(blocks, string_blocks, default_is_survey_value):
+    """Parses and normalizes one chunk of raw blocks. Pure CPU work with no database access,
+       so it can run in a worker process. Returns (rows, report) where report only counts
+       the entries that failed in this chunk."""
+    report = new_import_report()
+    parser = make_bibtex_parser()
+    if string_blocks:
+        parse_bibtex_blocks(parser, string_blocks, report)  # Only defines macros, yields no entries
+    entries = parse_bibtex_blocks(parser, blocks, report)
+    return normalize_entries(entries, default_is_survey_value, report), report
+
+def merge_chunk_report(report, chunk_report):
+    """Adds the parse/normalize failures of one chunk to the import report."""
+    report['total'] += chunk_report['total']
+    report['failed'] += chunk_report['failed']
+    room = MAX_REPORTED_ERRORS - len(report['errors'])
+    report['errors'].extend(chunk_report['errors'][:max(room, 0)])
+
+def map_chunks_in_order(worker, chunks, jobs=1):
+    """Yields worker(*chunk) for every argument tuple in chunks, in order.
+       With jobs > 1 the calls run in a process pool (worker must be a module-level function);
+       at most 2 * jobs chunks are in flight, so memory stays bounded while the caller inserts."""
+    if jobs <= 1:
+        for chunk in chunks:
+            yield worker(*chunk)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(worker, *chunk))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_normalized_rows(bib_file, default_is_survey_value, report, jobs=1):
+    """Yields lists of normalized rows from a .bib file, one per chunk and in file order."""
+    chunks = ((blocks, string_blocks, default_is_survey_value)
+              for blocks, string_blocks in iter_bibtex_block_chunks(bib_file, report=report))
+    for rows, chunk_report in map_chunks_in_order(parse_and_normalize_chunk, chunks, jobs):
+        merge_chunk_report(report, chunk_report)
+        yield rows
+
+def parse_jobs(value, default=DEFAULT_IMPORT_JOBS):
+    """Worker count from a CLI/form value: 0 or 'auto' means one per CPU, missing/invalid means default."""
+    if value is None or value == '':
+        return default
+    if str(value).strip().lower() == 'auto':
+        return os.cpu_count() or 1
+    try:
+        jobs = int(value)
+    except (TypeError, ValueError):
+        return default
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return min(jobs, MAX_IMPORT_JOBS)
+
+def run_bulk_import(db_path, row_chunks, report, progress_callback=None):
+    """Inserts every chunk of normalized rows from row_chunks. Shared by the BibTeX and CSV importers; returns report.
+       Chunks are parsed outside any transaction; each one is then written in its own short transaction on
+       the pooled connection, under db_pool.write_lock(), so the app's other writers (edits, PDF uploads)
+       wait for one chunk at most instead of the whole import. An import that fails or is cancelled keeps
+       the chunks already committed: importing the file again skips them as duplicates."""
+    with db_pool.write_lock():
+        create_database(db_path)
+    conn = db_pool.get_connection(db_path)
+    try:
+        with db_pool.write_lock():
+            conn.execute("BEGIN IMMEDIATE")
+            known_keys = load_known_keys(conn)  # Also stores missing title fingerprints
+            conn.commit()
+        for rows in row_chunks:     # The next chunk is parsed here, while other writers can run
+            with db_pool.write_lock():
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    imported_before = report['imported']
+                    insert_paper_rows(conn, rows, known_keys, report)
+                    if report['imported'] > imported_before:
+                        remove_placeholder_paper(conn)
+                        migrations.bump_revision(conn)  # Cached exports of the old data are stale now
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            if progress_callback:
+                progress_callback(report)
+    finally:
+        conn.close()
+    return report
+
+def import_bibtex(bib_file, db_path, default_is_survey_value=None, progress_callback=None, jobs=DEFAULT_IMPORT_JOBS):
+    """Import BibTeX file into SQLite database, one short transaction per chunk (see run_bulk_import).
+       The file is streamed entry by entry and inserted in chunks, so memory use does not depend on file size.
+       jobs > 1 parses and normalizes chunks in that many worker processes; rows are still inserted
+       in file order by this process.
+       progress_callback(report), if given, is called after every chunk.
+       Returns an import report dict (see new_import_report)."""
+    report = new_import_report()
+    return run_bulk_import(db_path, iter_normalized_rows(bib_file, default_is_survey_value, report, jobs),
+                           report, progress_callback)
+
+# --- Direct CSV import ---
+# Column maps for the supported CSV exports: bibtexparser-style field -> CSV header(s).
+# A tuple means "first non-empty column" except for keywords, where all listed columns are combined.
+CSV_COLUMN_MAPS = {
+    'ieee': {   # IEEE Xplore "Export -> CSV"
+        'title': 'Document Title',
+        'author': 'Authors',
+        'journal': 'Publication Title',
+        'year': 'Publication Year',
+        'volume': 'Volume',
+        'start_page': 'Start Page',
+        'end_page': 'End Page',
+        'doi': 'DOI',
+        'issn': 'ISSN',
+        'abstract': 'Abstract',
+        'keywords': ('IEEE Terms', 'Author Keywords'),
+        'month_date': 'Date Added To Xplore',
+        'type_hint': ('Document Identifier', 'Publication Title'),
+        'author_order': 'first_last',   # "John Smith; Jane Doe"
+    },
+    'scopus': {  # Scopus "Export -> CSV"
+        'title': 'Title',
+        'author': ('Author full names', 'Authors'),
+        'journal': 'Source title',
+        'year': 'Year',
+        'volume': 'Volume',
+        'start_page': 'Page start',
+        'end_page': 'Page end',
+        'numpages': 'Page count',
+        'doi': 'DOI',
+        'issn': 'ISSN',
+        'abstract': 'Abstract',
+        'keywords': ('Author Keywords', 'Index Keywords'),
+        'type_hint': 'Document Type',
+        'author_order': 'last_first',   # "Smith, J.; Doe, A."
+    },
+    'acm': {    # ACM Digital Library CSV export (CSL field names)
+        'title': 'title',
+        'author': 'author',
+        'journal': ('container-title', 'collection-title'),
+        'year': 'issued',
+        'volume': 'volume',
+        'pages': 'page',
+        'numpages': 'number-of-pages',
+        'doi': 'DOI',
+        'issn': 'ISSN',
+        'abstract': 'abstract',
+        'keywords': ('keyword',),
+        'type_hint': 'type',
+        'author_order': 'last_first',
+    },
+}
+# Header that identifies each export format (checked in this order)
+CSV_FORMAT_SIGNATURES = (
+    ('ieee', 'Document Title'),
+    ('scopus', 'Source title'),
+    ('acm', 'container-title'),
+)
+CSV_KEYWORD_SPLIT_RE = re.compile(r'\s*[;,|]\s*')
+YEAR_RE = re.compile(r'\b(\d{4})\b')
+
+def detect_csv_format(fieldnames):
+    """Returns the CSV_COLUMN_MAPS key matching a CSV header, or None."""
+    headers = {name.strip() for name in fieldnames or () if name}
+    for csv_format, signature in CSV_FORMAT_SIGNATURES:
+        if signature in headers:
+            return csv_format
+    return None
+
+def _csv_value(row, columns):
+    """First non-empty value among the given column(s) of a csv.DictReader row."""
+    if isinstance(columns, str):
+        columns = (columns,)
+    for column in columns:
+        value = (row.get(column) or '').strip()
+        if value:
+            return value
+    return ''
+
+def csv_entry_type(type_hint):
+    """Maps a document type / identifier column to a BibTeX entry type."""
+    hint = type_hint.lower()
+    if 'conference' in hint or 'proceeding' in hint:
+        return 'inproceedings'
+    return 'article'
+
+def csv_row_to_entry(row, column_map):
+    """Converts one CSV row into a bibtexparser-style entry dict, so normalize_entry handles
+       CSV and BibTeX input identically. The ID is a base key; uniqueness is enforced by the caller."""
+    title = _csv_value(row, column_map['title'])
+    authors = [a.strip() for a in _csv_value(row, column_map['author']).split(';') if a.strip()]
+    if column_map.get('author_order') == 'first_last':
+        authors = clean_authors('; '.join(authors)).split(' and ') if authors else []
+    first_author = authors[0].split(',')[0].split() if authors else []
+    year_match = YEAR_RE.search(_csv_value(row, column_map['year']))
+    year = year_match.group(1) if year_match else ''
+    # Key: <first author surname><year><title start>, deduplicated by make_keys_unique()
+    key = f"{first_author[-1] if first_author else 'Unknown'}{year or '0000'}{clean_bibtex_key(title[:20]) if title else 'title'}"
+
+    pages = _csv_value(row, column_map.get('pages', ()))
+    if not pages:
+        start_page = _csv_value(row, column_map.get('start_page', ()))
+        end_page = _csv_value(row, column_map.get('end_page', ()))
+        pages = f"{start_page}--{end_page}" if start_page and end_page else start_page
+
+    keywords = []
+    for column in column_map.get('keywords', ()):
+        keywords.extend(k for k in CSV_KEYWORD_SPLIT_RE.split(_csv_value(row, column)) if k)
+
+    month_date = _csv_value(row, column_map.get('month_date', ()))
+    return {
+        'ID': key,
+        'ENTRYTYPE': csv_entry_type(_csv_value(row, column_map['type_hint'])),
+        'title': title,
+        'author': ' and '.join(authors),
+        'year': year,
+        'month': extract_month_from_date(month_date) if month_date else '',
+        'journal': _csv_value(row, column_map['journal']),
+        'volume': _csv_value(row, column_map['volume']),
+        'pages': pages,
+        'numpages': _csv_value(row, column_map.get('numpages', ())),
+        'doi': _csv_value(row, column_map['doi']),
+        'issn': _csv_value(row, column_map['issn']),
+        'abstract': _csv_value(row, column_map['abstract']),
+        'keywords': ', '.join(keywords),
+    }
+
+def normalize_csv_chunk(csv_rows, column_map, first_line, default_is_survey_value):
+    """Normalizes one chunk of CSV rows into papers rows. Pure CPU work, so it can run in a worker process.
+       Returns (rows, report) where report only counts the rows that failed in this chunk."""
+    report = new_import_report()
+    rows = []
+    for line, csv_row in enumerate(csv_rows, first_line):
+        try:
+            rows.append(normalize_entry(csv_row_to_entry(csv_row, column_map), default_is_survey_value))
+        except Exception as e:
+            report['total'] += 1
+            record_import_error(report, f"Error processing CSV line {line}: {e}")
+    return rows, report
+
+def iter_csv_row_chunks(csv_file, csv_format=None, chunk_size=PARSE_CHUNK_SIZE):
+    """Streams a CSV export with csv.DictReader and yields (csv_rows, column_map, first_line) chunks.
+       csv_format is a CSV_COLUMN_MAPS key; None detects it from the header."""
+    with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:  # utf-8-sig: IEEE exports start with a BOM
+        reader = csv.DictReader(f)
+        csv_format = csv_format or detect_csv_format(reader.fieldnames)
+        if csv_format not in CSV_COLUMN_MAPS:
+            raise ValueError(f"Unrecognized CSV format (supported: {', '.join(CSV_COLUMN_MAPS)})")
+        column_map = CSV_COLUMN_MAPS[csv_format]
+        csv_rows = []
+        first_line = 2  # Line 1 is the header
+        for csv_row in reader:
+            csv_rows.append(csv_row)
+            if len(csv_rows) >= chunk_size:
+                yield csv_rows, column_map, first_line
+                first_line += len(csv_rows)
+                csv_rows = []
+        if csv_rows:
+            yield csv_rows, column_map, first_line
+
+def make_keys_unique(rows, used_keys):
+    """Appends a counter to generated keys already used earlier in the same file (O(1) per row)."""
+    for row in rows:
+        key = original_key = row['id']
+        counter = 1
+        while key in used_keys:
+            key = f"{original_key}{counter}"
+            counter += 1
+        row['id'] = key
+        used_keys.add(key)
+
+def iter_normalized_csv_rows(csv_file, default_is_survey_value, report, jobs=1, csv_format=None):
+    """Yields lists of normalized rows from a CSV export, one per chunk and in file order."""
+    used_keys = set()
+    chunks = ((csv_rows, column_map, first_line, default_is_survey_value)
+              for csv_rows, column_map, first_line in iter_csv_row_chunks(csv_file, csv_format))
+    for rows, chunk_report in map_chunks_in_order(normalize_csv_chunk, chunks, jobs):
+        merge_chunk_report(report, chunk_report)
+        make_keys_unique(rows, used_keys)
+        yield rows
+
+def import_csv(csv_file, db_path, default_is_survey_value=None, progress_callback=None, jobs=DEFAULT_IMPORT_JOBS,
+               csv_format=None):
+    """Import an IEEE Xplore / Scopus / ACM CSV export straight into the database, without converting
+       it to BibTeX first. Same transactions, duplicate rules and report as import_bibtex().
+       csv_format is a CSV_COLUMN_MAPS key; None detects it from the header."""
+    report = new_import_report()
+    return run_bulk_import(db_path, iter_normalized_csv_rows(csv_file, default_is_survey_value, report, jobs, csv_format),
+                           report, progress_callback)
+
+def format_import_report(report):
+    """One-line human readable summary of an import report."""
+    summary = (f"{report['imported']} imported, {report['skipped_duplicate']} duplicates skipped, "
+               f"{report['failed']} failed (of {report['total']} entries)")
+    if report.get('possible_duplicates'):
+        summary += f"; {report['possible_duplicates']} possible duplicates imported (see /duplicates)"
+    return summary
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         # *** UPDATED DESCRIPTION ***
-        description='Convert BibTeX to SQLite database')
-    parser.add_argument('bib_file', help='Input BibTeX file path')
+        description='Import BibTeX or CSV exports into the SQLite database')
+    parser.add_argument('bib_file', help='Input BibTeX (.bib) or CSV export (.csv) file path')
     parser.add_argument('db_file', help='Output SQLite database file path')
+    parser.add_argument('--jobs', '-j', default=str(DEFAULT_IMPORT_JOBS),
+                        help='Worker processes for parsing/normalization (0 or "auto" = one per CPU, default: 1)')
+    parser.add_argument('--csv-format', choices=sorted(CSV_COLUMN_MAPS),
+                        help='Column map for .csv input (default: detected from the header)')
     # Note: The command-line script might need adjustment if it's expected to set the default is_survey value,
     # but the primary use case described involves the web interface.
     args = parser.parse_args()
     # Call with default is_survey as None for command-line usage, unless specified otherwise
-    import_bibtex(args.bib_file, args.db_file, default_is_survey_value=None)
\ No newline at end of file
+    def print_progress(report):
+        print(f"\r{report['total']} entries processed, {report['imported']} imported...", end='', flush=True)
+    if args.bib_file.lower().endswith('.csv'):
+        report = import_csv(args.bib_file, args.db_file, default_is_survey_value=None, progress_callback=print_progress,
+                            jobs=parse_jobs(args.jobs), csv_format=args.csv_format)
+    else:
+        report = import_bibtex(args.bib_file, args.db_file, default_is_survey_value=None, progress_callback=print_progress,
+                               jobs=parse_jobs(args.jobs))
+    print(f"\rImport into '{args.db_file}': {format_import_report(report)}")
+    for message in report['errors']:
+        print(f"  {message}")
@@ -0,0 +1,194 @@
+# import_jobs.py
+"""Background import jobs for /upload_bibtex.
+
+Uploads are queued and imported by a worker thread, so the request returns a job id at once and the
+browser polls /jobs/<id> for progress. SQLite has a single writer, so one worker is the default (imports write through db_pool.write_lock()); the
+queue is bounded so a burst of uploads is refused instead of piling up temp files.
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+
+import import_bibtex
+
+MAX_QUEUED_JOBS = 4         # Jobs waiting for a worker; further uploads get an error
+IMPORT_WORKERS = 1          # Imports share one write lock with the app, more workers would just wait on it
+JOB_HISTORY_SIZE = 50       # Finished jobs kept for /jobs/<id>
+
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+
+class ImportCancelled(Exception):
+    """Raised from the progress callback to stop a running import after the current chunk."""
+
+
+class QueueFull(Exception):
+    """Raised by ImportJobQueue.submit() when MAX_QUEUED_JOBS are already waiting."""
+
+
+class ImportJobQueue:
+    """Bounded queue of import jobs processed by background worker threads."""
+
+    def __init__(self, db_path, max_queued=MAX_QUEUED_JOBS, workers=IMPORT_WORKERS, history_size=JOB_HISTORY_SIZE):
+        self.db_path = db_path
+        self.history_size = history_size
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._jobs = {}         # job_id -> job dict, in submission order
+        self._cancel_events = {}
+        self._suspended = False
+        self._job_finished = threading.Condition(self._lock)
+        self._workers = [threading.Thread(target=self._worker, name=f'import-worker-{i}', daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, file_path, filename, kind, default_is_survey_value=None, jobs=1):
+        """Queues an import of file_path ('bib' or 'csv'). The job owns file_path and deletes it when done.
+           Returns a snapshot of the new job; raises QueueFull if the queue is full."""
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'filename': filename,
+            'kind': kind,
+            'status': 'queued',
+            'message': 'Waiting for a worker',
+            'created': time.time(),
+            'started': None,
+            'finished': None,
+            'parsed': 0,
+            'inserted': 0,
+            'skipped': 0,
+            'possible_duplicates': 0,
+            'failed': 0,
+            'entries_per_second': 0.0,
+            'errors': [],
+        }
+        task = (job_id, file_path, kind, default_is_survey_value, jobs)
+        with self._lock:
+            if self._suspended:
+                raise QueueFull('Imports are paused while a backup is being restored, try again later')
+            self._jobs[job_id] = job
+            self._cancel_events[job_id] = threading.Event()
+            try:
+                self._queue.put_nowait(task)
+            except queue.Full:
+                del self._jobs[job_id]
+                del self._cancel_events[job_id]
+                raise QueueFull(f'Too many imports waiting ({self._queue.maxsize}), try again later')
+            return dict(job)
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if unknown (or dropped from the history)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, errors=list(job['errors'])) if job else None
+
+    def list(self):
+        """Snapshots of all known jobs, newest first."""
+        with self._lock:
+            return [dict(job, errors=list(job['errors'])) for job in reversed(list(self._jobs.values()))]
+
+    def cancel(self, job_id):
+        """Requests cancellation. Queued jobs never start; running ones stop after the current chunk
+           (chunks already written stay imported).
+           Returns the job snapshot, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] not in FINISHED_STATES:
+                self._cancel_events[job_id].set()
+                if job['status'] == 'queued':
+                    self._finish(job, 'cancelled', 'Cancelled before it started')
+                else:
+                    job['message'] = 'Cancelling...'
+            return dict(job, errors=list(job['errors']))
+
+    def suspend(self, timeout=None):
+        """Cancels every queued and running job and refuses new ones until resume(), e.g. while /restore
+           replaces the database. Returns True once no import is running, False if that takes longer than timeout."""
+        with self._lock:
+            self._suspended = True
+            for job in list(self._jobs.values()):
+                if job['status'] == 'queued':
+                    self._finish(job, 'cancelled', 'Cancelled: a backup was restored')
+                elif job['status'] == 'running':
+                    self._cancel_events[job['id']].set()
+                    job['message'] = 'Cancelling...'
+            return self._job_finished.wait_for(
+                lambda: not any(job['status'] == 'running' for job in self._jobs.values()), timeout)
+
+    def resume(self):
+        """Accepts new jobs again after suspend()."""
+        with self._lock:
+            self._suspended = False
+
+    def _finish(self, job, status, message):
+        """Marks a job finished and trims the history. Caller holds self._lock."""
+        job['status'] = status
+        job['message'] = message
+        job['finished'] = time.time()
+        self._cancel_events.pop(job['id'], None)
+        self._job_finished.notify_all()
+        finished = [job_id for job_id, j in self._jobs.items() if j['status'] in FINISHED_STATES]
+        for job_id in finished[:max(len(finished) - self.history_size, 0)]:
+            del self._jobs[job_id]
+
+    def _update_progress(self, job, report):
+        elapsed = time.time() - job['started']
+        job['parsed'] = report['total']
+        job['inserted'] = report['imported']
+        job['skipped'] = report['skipped_duplicate']
+        job['possible_duplicates'] = report['possible_duplicates']
+        job['failed'] = report['failed']
+        job['errors'] = list(report['errors'])
+        job['entries_per_second'] = round(report['total'] / elapsed, 1) if elapsed > 0 else 0.0
+
+    def _worker(self):
+        while True:
+            job_id, file_path, kind, default_is_survey_value, jobs = self._queue.get()
+            try:
+                self._run(job_id, file_path, kind, default_is_survey_value, jobs)
+            finally:
+                try:
+                    os.unlink(file_path)
+                except OSError:
+                    pass
+                self._queue.task_done()
+
+    def _run(self, job_id, file_path, kind, default_is_survey_value, jobs):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            cancel_event = self._cancel_events.get(job_id)
+            if job is None or job['status'] != 'queued':
+                return  # Cancelled while waiting
+            job['status'] = 'running'
+            job['message'] = 'Importing'
+            job['started'] = time.time()
+
+        def progress_callback(report):
+            with self._lock:
+                self._update_progress(job, report)
+            if cancel_event.is_set():
+                raise ImportCancelled()
+
+        importer = import_bibtex.import_csv if kind == 'csv' else import_bibtex.import_bibtex
+        try:
+            report = importer(file_path, self.db_path, default_is_survey_value=default_is_survey_value,
+                              progress_callback=progress_callback, jobs=jobs)
+        except ImportCancelled:
+            with self._lock:
+                self._finish(job, 'cancelled', f"Cancelled, {job['inserted']} papers were already imported")
+            return
+        except Exception as e:
+            print(f"Import job {job_id} ({job['filename']}) failed: {e}")
+            with self._lock:
+                self._finish(job, 'failed', f'Import failed: {e}')
+            return
+        with self._lock:
+            self._update_progress(job, report)
+            self._finish(job, 'succeeded', import_bibtex.format_import_report(report))
+        print(f"Imported {job['filename']}: {import_bibtex.format_import_report(report)}")
@@ -0,0 +1,240 @@
+# migrations.py
+"""Versioned schema migrations for the papers database.
+
+The schema version is stored in PRAGMA user_version. migrate_database() applies every migration newer
+than that, each one in its own transaction, so existing databases (including a copied fallback.sqlite
+or a restored backup) upgrade in place. Called by import_bibtex.create_database and at browse_db.py startup.
+New schema changes go at the end of MIGRATIONS with the next version number; never edit applied ones.
+"""
+import re
+import sqlite3
+
+import dedup
+
+# Columns indexed for full-text search (title first: it gets the highest bm25 weight in /search)
+FTS_COLUMNS = ('title', 'abstract', 'keywords', 'authors', 'user_trace')
+# Normalized term tables: (table, semicolon-separated source column in papers, term column)
+TERM_TABLES = (
+    ('paper_keywords', 'keywords', 'keyword'),
+    ('paper_authors', 'authors', 'author'),
+)
+TERM_SEPARATOR = ';'
+TRIM_CHARS_SQL = "' ' || char(9, 10, 13)"  # Characters trimmed from terms, as a SQL expression (like JS trim())
+ROWID_ALIAS = 'paper_rowid'  # INTEGER PRIMARY KEY of papers: the rowid the FTS index is keyed on
+
+def create_fts_index(conn):
+    """Create the FTS5 index over papers and the triggers that keep it in sync.
+       External-content table: the text lives only in `papers`, FTS stores just the index.
+       Safe to call on existing databases; the index is built from current rows on first creation."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='papers_fts'")
+    needs_rebuild = cursor.fetchone() is None
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    cursor.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+        {columns},
+        content='papers', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''')
+    # Triggers cover every writer: import_bibtex, update_paper_custom_fields and delete_paper
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS papers_fts_ai AFTER INSERT ON papers BEGIN
+        INSERT INTO papers_fts(rowid, {columns}) VALUES (new.rowid, {new_values});
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS papers_fts_ad AFTER DELETE ON papers BEGIN
+        INSERT INTO papers_fts(papers_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS papers_fts_au AFTER UPDATE OF {columns} ON papers BEGIN
+        INSERT INTO papers_fts(papers_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});
+        INSERT INTO papers_fts(rowid, {columns}) VALUES (new.rowid, {new_values});
+    END
+    ''')
+    if needs_rebuild:
+        cursor.execute("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')")
+
+def get_column_names(conn, table):
+    """Returns the column names of a table, including generated columns."""
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})").fetchall()}
+
+def add_secondary_indexes(conn):
+    """Indexes for import deduplication and fetch_papers filters/ordering.
+       Normalized title and "has comment" are VIRTUAL generated columns, so no data is rewritten."""
+    columns = get_column_names(conn, 'papers')
+    if 'title_norm' not in columns:
+        conn.execute("ALTER TABLE papers ADD COLUMN title_norm TEXT GENERATED ALWAYS AS (lower(trim(title))) VIRTUAL")
+    if 'has_user_trace' not in columns:
+        conn.execute("ALTER TABLE papers ADD COLUMN has_user_trace INTEGER "
+                     "GENERATED ALWAYS AS (user_trace IS NOT NULL AND user_trace != '') VIRTUAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_doi ON papers(doi)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_title_norm_year ON papers(title_norm, year)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_filters ON papers(is_offtopic, year, page_count)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_has_user_trace ON papers(has_user_trace)")
+
+def add_revision_counter(conn):
+    """Key/value table holding the data revision: a counter bumped by every write to papers,
+       so derived data (export cache) can tell whether it is still current."""
+    conn.execute("CREATE TABLE IF NOT EXISTS db_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('revision', 0)")
+
+def term_rows_sql(column, source='new'):
+    """SELECT yielding (paper_id, position, term) for every non-empty ';'-separated term of column, for the
+       trigger row 'new' or (any other source) for every row of papers under that alias.
+       Triggers cannot use recursive CTEs, so the list is turned into a JSON array instead: json_quote()
+       escapes the text and ';' never occurs in a JSON escape, so replacing it splits the string."""
+    array = f"'[' || replace(json_quote({source}.{column}), '{TERM_SEPARATOR}', '\",\"') || ']'"
+    term = f"trim(j.value, {TRIM_CHARS_SQL})"
+    papers = '' if source == 'new' else f"papers {source}, "
+    return f"SELECT {source}.id, j.key, {term} FROM {papers}json_each({array}) AS j WHERE {term} != ''"
+
+def create_term_tables(conn):
+    """paper_keywords / paper_authors: one row per term of papers.keywords / papers.authors, indexed by term,
+       so frequency counts and term lookups do not re-split the strings. Triggers keep them in sync with
+       every writer (like the FTS index); existing rows are backfilled."""
+    for table, column, term_column in TERM_TABLES:
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            paper_id TEXT NOT NULL,            -- papers.id
+            position INTEGER NOT NULL,         -- Index of the term in the semicolon-separated list
+            {term_column} TEXT NOT NULL,
+            PRIMARY KEY (paper_id, position)
+        ) WITHOUT ROWID
+        ''')
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{term_column} ON {table}({term_column}, paper_id)")
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON papers BEGIN
+            INSERT INTO {table} (paper_id, position, {term_column}) {term_rows_sql(column)};
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON papers BEGIN
+            DELETE FROM {table} WHERE paper_id = old.id;
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF id, {column} ON papers BEGIN
+            DELETE FROM {table} WHERE paper_id = old.id;
+            INSERT INTO {table} (paper_id, position, {term_column}) {term_rows_sql(column)};
+        END
+        ''')
+    rebuild_term_tables(conn)
+
+def rebuild_term_tables(conn):
+    """Refills the term tables from papers (backfill for existing databases, or repair). Runs in the caller's transaction."""
+    for table, column, term_column in TERM_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} (paper_id, position, {term_column}) {term_rows_sql(column, 'p')}")
+
+def add_title_fingerprint(conn):
+    """Normalized title for near-duplicate detection (dedup.title_fingerprint). It is computed in Python, so
+       existing rows are filled by fill_title_fingerprints(); a title change outside the app clears it again."""
+    if 'title_fingerprint' not in get_column_names(conn, 'papers'):
+        conn.execute("ALTER TABLE papers ADD COLUMN title_fingerprint TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_title_fingerprint ON papers(title_fingerprint)")
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS papers_title_fingerprint_au AFTER UPDATE OF title ON papers BEGIN
+        UPDATE papers SET title_fingerprint = NULL WHERE rowid = new.rowid;
+    END
+    ''')
+
+def add_rowid_alias(conn):
+    """Gives papers an explicit INTEGER PRIMARY KEY (ROWID_ALIAS) next to its TEXT id, which becomes UNIQUE.
+       The FTS index is keyed on papers.rowid, and VACUUM may renumber the implicit rowid of a table without
+       one. SQLite can't add a primary key in place, so the table is rebuilt with the same rowids, its indexes
+       and triggers are recreated, and the FTS index is rebuilt (repairing a database vacuumed before)."""
+    if ROWID_ALIAS in get_column_names(conn, 'papers'):
+        return
+    table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='papers'").fetchone()[0]
+    new_sql, count = re.subn(r'\bid\s+TEXT\s+PRIMARY\s+KEY\b,', f'{ROWID_ALIAS} INTEGER PRIMARY KEY,\n        id TEXT UNIQUE,     ',
+                             table_sql, count=1, flags=re.IGNORECASE)
+    if count != 1:
+        raise sqlite3.OperationalError("Unexpected papers schema: no 'id TEXT PRIMARY KEY,' column")
+    new_sql = re.sub(r'^CREATE TABLE\s+"?papers"?', 'CREATE TABLE papers_new', new_sql, count=1, flags=re.IGNORECASE)
+    dependents = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'papers' AND type IN ('index', 'trigger') AND sql IS NOT NULL")]
+    # Generated columns (hidden 2/3) are computed by the new table itself
+    columns = ", ".join(row[1] for row in conn.execute("PRAGMA table_xinfo(papers)") if row[6] == 0)
+    conn.execute(new_sql)
+    conn.execute(f"INSERT INTO papers_new ({ROWID_ALIAS}, {columns}) SELECT rowid, {columns} FROM papers")
+    conn.execute("DROP TABLE papers")  # Also drops its indexes and triggers, recreated below
+    conn.execute("ALTER TABLE papers_new RENAME TO papers")
+    for sql in dependents:
+        conn.execute(sql)
+    conn.execute("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')")
+
+def fill_title_fingerprints(conn):
+    """Computes the missing title fingerprints, so /duplicates only has to read them."""
+    dedup.refresh_fingerprints(conn)
+
+# (version, description, function) - append only.
+MIGRATIONS = [
+    (1, "full-text search index", create_fts_index),
+    (2, "secondary indexes and normalized title column", add_secondary_indexes),
+    (3, "data revision counter", add_revision_counter),
+    (4, "keyword and author term tables", create_term_tables),
+    (5, "title fingerprint for duplicate detection", add_title_fingerprint),
+    (6, "explicit rowid for the full-text search index", add_rowid_alias),
+    (7, "title fingerprints of existing papers", fill_title_fingerprints),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate_database(conn):
+    """Applies all pending migrations to an open connection. Returns the resulting schema version."""
+    current_version = get_schema_version(conn)
+    if conn.in_transaction:
+        conn.commit()
+    for version, description, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+        print(f"Applying database migration {version}: {description}")
+        try:
+            conn.execute("BEGIN")
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        current_version = version
+    return current_version
+
+# --- Data revision ---
+def get_revision(conn):
+    """Current data revision (0 for a database without the counter)."""
+    try:
+        row = conn.execute("SELECT value FROM db_meta WHERE key = 'revision'").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # Not migrated yet
+    return row[0] if row else 0
+
+def bump_revision(conn, above=0):
+    """Increments the data revision, to at least above + 1. Runs in the caller's transaction:
+       call it next to the write it accounts for, before the commit."""
+    conn.execute("UPDATE db_meta SET value = max(value, ?) + 1 WHERE key = 'revision'", (above,))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Apply pending schema migrations to a papers database')
+    parser.add_argument('db_file', help='SQLite database file path')
+    parser.add_argument('--rebuild-terms', action='store_true',
+                        help='Refill the keyword/author term tables from papers (normally kept in sync by triggers)')
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db_file)
+    try:
+        print(f"Schema version {migrate_database(conn)}")
+        if args.rebuild_terms:
+            with conn:
+                rebuild_term_tables(conn)
+            counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table, _, _ in TERM_TABLES}
+            print("Rebuilt term tables: " + ", ".join(f"{table} {count} rows" for table, count in counts.items()))
+    finally:
+        conn.close()
@@ -0,0 +1,168 @@
+# paper_stats.py
+"""Pre-aggregated statistics for the stats modal (/stats in browse_db.py).
+
+The same aggregates static/stats.js computes by walking the table rows, but with grouped SQL over
+the whole filtered set, so they no longer depend on how many rows the browser has loaded. Results
+are cached in memory per data revision (migrations.get_revision) and filter set: any write to papers
+bumps the revision, which makes older entries unreachable until they fall out of the small LRU.
+"""
+import threading
+from collections import OrderedDict
+
+import migrations
+
+STATS_CACHE_SIZE = 32       # Distinct (revision, filters) results kept in memory
+MIN_TERM_COUNT = 2          # Keywords/authors/research areas listed in the modal (same cut-off as stats.js)
+RELEVANCE_BINS = 11         # Histogram bins for relevance scores 0..10
+TRIM_CHARS_SQL = migrations.TRIM_CHARS_SQL
+
+# Survey filter of the table (filtering.js SURVEY_FILTER_STATES) -> extra WHERE condition
+SURVEY_FILTER_CONDITIONS = {
+    'surveys': "p.is_survey = 1",
+    'non_surveys': "(p.is_survey IS NULL OR p.is_survey != 1)",
+}
+
+
+def survey_filter_condition(survey_filter):
+    """WHERE condition for the table's tri-state survey filter ('all', 'surveys', 'non_surveys'), or None."""
+    return SURVEY_FILTER_CONDITIONS.get(survey_filter)
+
+
+def _where(conditions):
+    return ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+
+def _term_counts(conn, table, term_column, conditions, params, min_count=MIN_TERM_COUNT):
+    """Counts the terms of a term table (paper_keywords, paper_authors; see migrations.TERM_TABLES)
+       over the filtered papers. Only the (usually short) list of frequent terms leaves SQLite."""
+    query = f"""
+        SELECT t.{term_column}, COUNT(*) AS count FROM {table} t JOIN papers p ON p.id = t.paper_id
+        {_where(conditions)}
+        GROUP BY t.{term_column} HAVING COUNT(*) >= ?
+        ORDER BY count DESC, t.{term_column}
+    """
+    return {row[0]: row[1] for row in conn.execute(query, params + [min_count])}
+
+
+def compute_stats(conn, conditions, params):
+    """Aggregates for the stats modal over the papers matching conditions/params (build_filter_conditions
+       output, 'p' alias). Keys mirror the structures in stats.js (latestCounts, latestYearlyData, ...)."""
+    where = _where(conditions)
+    revision = migrations.get_revision(conn)
+
+    total_papers = conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    # --- Status counts (footer / latestCounts) ---
+    row = conn.execute(f"""
+        SELECT COUNT(*),
+               SUM(p.pdf_state IN ('PDF', 'annotated')),
+               SUM(p.pdf_state = 'annotated'),
+               SUM(p.pdf_state = 'paywalled'),
+               SUM(p.is_offtopic = 1),
+               SUM(p.is_survey = 1),
+               SUM(p.changed_by = 'user'),
+               SUM(p.verified = 1),
+               SUM(p.verified_by = 'user'),
+               SUM(p.user_trace IS NOT NULL AND trim(p.user_trace, {TRIM_CHARS_SQL}) != '')
+        FROM papers p {where}
+    """, params).fetchone()
+    filtered_papers = row[0]
+    count_fields = ('pdf_present', 'pdf_annotated', 'pdf_paywalled', 'is_offtopic', 'is_survey',
+                    'changed_by', 'verified', 'verified_by', 'user_comment_state')
+    counts = {field: value or 0 for field, value in zip(count_fields, row[1:])}
+
+    # --- Per-year survey/primary and publication type counts (line charts) ---
+    year_conditions = conditions + ["p.year IS NOT NULL", "p.year != 0"]
+    survey_impl = {}
+    for year, surveys, impl in conn.execute(f"""
+        SELECT p.year, SUM(p.is_survey = 1), SUM(p.is_survey IS NULL OR p.is_survey != 1)
+        FROM papers p {_where(year_conditions)} GROUP BY p.year ORDER BY p.year
+    """, params):
+        survey_impl[year] = {'surveys': surveys, 'impl': impl}
+    pub_types = {}
+    for year, pub_type, count in conn.execute(f"""
+        SELECT p.year, p.type, COUNT(*) FROM papers p
+        {_where(year_conditions + ["p.type IS NOT NULL", "p.type != ''"])}
+        GROUP BY p.year, p.type ORDER BY p.year
+    """, params):
+        pub_types.setdefault(year, {})[pub_type] = count
+
+    # --- Journal / conference frequencies ---
+    journals = []
+    conferences = []
+    for kind, name, count in conn.execute(f"""
+        SELECT lower(p.type), trim(p.journal, {TRIM_CHARS_SQL}) AS name, COUNT(*) AS count FROM papers p
+        {_where(conditions + ["lower(p.type) IN ('article', 'inproceedings')", f"trim(p.journal, {TRIM_CHARS_SQL}) != ''"])}
+        GROUP BY lower(p.type), name ORDER BY count DESC, name
+    """, params):
+        (journals if kind == 'article' else conferences).append({'name': name, 'count': count})
+
+    # --- Relevance histogram ---
+    relevance = [0] * RELEVANCE_BINS
+    for score, count in conn.execute(f"""
+        SELECT p.relevance, COUNT(*) FROM papers p
+        {_where(conditions + ["p.relevance BETWEEN 0 AND ?"])} GROUP BY p.relevance
+    """, params + [RELEVANCE_BINS - 1]):
+        relevance[int(score)] += count
+
+    # --- Keyword / author / research area frequencies ---
+    research_areas = {name: count for name, count in conn.execute(f"""
+        SELECT trim(p.research_area, {TRIM_CHARS_SQL}) AS name, COUNT(*) AS count FROM papers p
+        {_where(conditions + [f"trim(p.research_area, {TRIM_CHARS_SQL}) != ''"])}
+        GROUP BY name HAVING COUNT(*) >= ? ORDER BY count DESC, name
+    """, params + [MIN_TERM_COUNT])}
+
+    return {
+        'total_papers': total_papers,
+        'filtered_papers': filtered_papers,
+        'counts': counts,
+        'yearly': {'survey_impl': survey_impl, 'pub_types': pub_types},
+        'journals': journals,
+        'conferences': conferences,
+        'relevance': relevance,
+        'keywords': _term_counts(conn, 'paper_keywords', 'keyword', conditions, params),
+        'authors': _term_counts(conn, 'paper_authors', 'author', conditions, params),
+        'research_areas': research_areas,
+        'revision': revision,
+    }
+
+
+class RevisionCache:
+    """Small in-memory LRU of results computed from the papers table (compute_stats(), duplicate clusters),
+       keyed by data revision and the caller's parameters."""
+
+    def __init__(self, max_entries=STATS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get_or_compute(self, conn, params_key, compute):
+        """Cached result for params_key at the database's current revision; compute(conn) on a miss.
+           The revision is read first, so a concurrent write can only make an entry newer than its key."""
+        key = (migrations.get_revision(conn), params_key)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return result
+            self._stats['misses'] += 1
+        result = compute(conn)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Drops every entry (e.g. after /restore replaced the database)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
@@ -374,6 +374,16 @@ function applyServerSideFilters() {     //moved from filtering as it has server-
     } else {
         urlParams.delete('min_page_count');
     }
+    if (isServerPaginated()) {
+        // Keyset-paginated mode: request the first window, sorted server-side
+        urlParams.set('page_size', tbody.dataset.pageSize);
+        if (currentClientSort.column) {
+            urlParams.set('sort_by', currentClientSort.column);
+            urlParams.set('sort_dir', currentClientSort.direction);
+        }
+        loadTableWindow(urlParams, '', true);
+        return;
+    }
     // Construct the URL for the /load_table endpoint with current parameters
     const loadTableUrl = `/load_table?${urlParams.toString()}`;
 
@@ -399,6 +409,77 @@ function applyServerSideFilters() {     //moved from filtering as it has server-
         });
 }
 
+// --- Keyset-paginated table windows (only active when the page was loaded with ?page_size=N) ---
+let tableWindowRequest = null;
+let pageSentinelObserver = null;
+
+/**
+ * Fetches one window of rows from /load_table and appends it to the table.
+ * @param {URLSearchParams} urlParams - Current server-side filter and sort parameters.
+ * @param {string} cursor - Cursor of the window to fetch ('' for the first one).
+ * @param {boolean} replace - If true, existing rows are removed first (filters/sort changed).
+ */
+function loadTableWindow(urlParams, cursor, replace) {
+    if (tableWindowRequest && !replace) return; // Already loading the next window
+    const windowParams = new URLSearchParams(urlParams);
+    windowParams.set('page_size', tbody.dataset.pageSize);
+    windowParams.set('cursor', cursor);
+    const request = fetch(`/load_table?${windowParams.toString()}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (tableWindowRequest !== request) return; // Superseded by a newer request
+            if (data.status !== 'success') {
+                throw new Error(data.message || 'Failed to load table window');
+            }
+            if (replace) {
+                tbody.querySelectorAll('tr[data-paper-id], tr.detail-row, tr.page-sentinel').forEach(row => row.remove());
+                urlParams.delete('cursor');
+                const newUrl = `${window.location.pathname}?${urlParams.toString()}`;
+                window.history.replaceState({ path: newUrl }, '', newUrl);
+            } else {
+                tbody.querySelectorAll('tr.page-sentinel').forEach(row => row.remove());
+            }
+            tbody.dataset.filteredTotal = data.total;
+            tbody.insertAdjacentHTML('beforeend', data.html);
+            observePageSentinel();
+            applyLocalFilters(); //update local filters and let it remove busy state
+        })
+        .catch(error => {
+            console.error('Error fetching table window:', error);
+            document.documentElement.classList.remove('busyCursor');
+        })
+        .finally(() => {
+            if (tableWindowRequest === request) tableWindowRequest = null;
+        });
+    tableWindowRequest = request;
+}
+
+/** Loads the next window as soon as the sentinel row at the end of the table scrolls into view. */
+function observePageSentinel() {
+    if (!isServerPaginated() || !('IntersectionObserver' in window)) return;
+    if (!pageSentinelObserver) {
+        pageSentinelObserver = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                if (!entry.isIntersecting) return;
+                const urlParams = new URLSearchParams(window.location.search);
+                if (currentClientSort.column) {
+                    urlParams.set('sort_by', currentClientSort.column);
+                    urlParams.set('sort_dir', currentClientSort.direction);
+                }
+                loadTableWindow(urlParams, entry.target.dataset.nextCursor, false);
+            });
+        }, { root: document.getElementById('papers-table-container'), rootMargin: '800px 0px' });
+    }
+    pageSentinelObserver.disconnect();
+    const sentinel = tbody.querySelector('tr.page-sentinel');
+    if (sentinel) pageSentinelObserver.observe(sentinel);
+}
+
 // Add a hidden file input element dynamically if it doesn't exist already
 // (This avoids needing to add it to index.html)
 if (!document.getElementById('pdf-file-input')) {
@@ -633,8 +714,34 @@ document.addEventListener('DOMContentLoaded', function () {
     minPageCountInput.addEventListener('change', showApplyButton);
     hideOfftopicCheckbox.addEventListener('change', applyServerSideFilters);
     applyButton.addEventListener('click', applyServerSideFilters);
-
-    //server-side search removed for now as FTS is broken. Using full-client-side search instead (filtering.js, shared with HTML export):
+    observePageSentinel();
+
+    // Server-side full-text search (FTS5, /search). filtering.js falls back to its full client-side scan
+    // (shared with the HTML export) until the server answers for the current term.
+    let serverSearchTimeoutId = null;
+    let serverSearchController = null;
+    searchInput.addEventListener('input', () => {
+        clearTimeout(serverSearchTimeoutId);
+        if (serverSearchController) serverSearchController.abort();
+        const term = searchInput.value.toLowerCase().trim();
+        if (!term) {
+            serverSearchResult = null;
+            return;
+        }
+        serverSearchTimeoutId = setTimeout(() => {
+            serverSearchController = new AbortController();
+            fetch(`/search?q=${encodeURIComponent(term)}&limit=0&snippets=0`, { signal: serverSearchController.signal })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.status !== 'success' || searchInput.value.toLowerCase().trim() !== term) return;
+                    serverSearchResult = { term, ids: new Set(data.results.map(result => result.id)) };
+                    applyLocalFilters();
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') console.error('Server search failed, using client-side search:', error);
+                });
+        }, 150);
+    });
 
     // Click Handler for Editable Status Cells
     document.addEventListener('click', function (event) {
@@ -746,6 +853,33 @@ document.addEventListener('DOMContentLoaded', function () {
     const importSurveyBtn = document.getElementById('import-survey-btn');
     const bibtexFileInput = document.getElementById('bibtex-file-input');
 
+    const IMPORT_JOB_POLL_MS = 1000;
+
+    /** Polls /jobs/<jobId> until the import finishes. Resolves with the final job,
+     *  calling onProgress(job) on every poll while it is queued or running. */
+    function waitForImportJob(jobId, onProgress) {
+        return new Promise((resolve, reject) => {
+            function poll() {
+                fetch(`/jobs/${jobId}`)
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.status !== 'success') {
+                            throw new Error(data.message || 'Lost track of the import job');
+                        }
+                        const job = data.job;
+                        if (job.status === 'queued' || job.status === 'running') {
+                            if (onProgress) onProgress(job);
+                            setTimeout(poll, IMPORT_JOB_POLL_MS);
+                        } else {
+                            resolve(job);
+                        }
+                    })
+                    .catch(reject);
+            }
+            poll();
+        });
+    }
+
     function handleFileImport(file, importType) {
          if (!file) {
             console.error("No file selected for import.");
@@ -786,12 +920,23 @@ document.addEventListener('DOMContentLoaded', function () {
             return response.json();
         })
         .then(data => {
-            if (data.status === 'success') {
-                console.log(data.message);
+            if (data.status !== 'queued') {
+                throw new Error(data.message);
+            }
+            // The import runs in the background: follow its progress on the buttons
+            return waitForImportJob(data.job_id, job => {
+                const progressText = `Importing... ${job.parsed} entries (${job.entries_per_second}/s)`;
+                importPrimaryBtn.textContent = progressText;
+                importSurveyBtn.textContent = progressText;
+            });
+        })
+        .then(job => {
+            if (job.status === 'succeeded') {
+                console.log(job.message);
                 setTimeout(() => { window.location.reload(); }, 1500); // Reload after delay
             } else {
-                console.error("Import Error:", data.message);
-                alert(`Import failed: ${data.message}`);
+                console.error("Import Error:", job.message);
+                alert(job.message);
             }
         })
         .catch(error => {
@@ -871,11 +1016,17 @@ document.addEventListener('DOMContentLoaded', function () {
                 return response.json();
             })
             .then(data => {
-                if (data.status === 'success') {
+                if (data.status !== 'queued') {
+                    throw new Error(data.message);
+                }
+                return waitForImportJob(data.job_id);
+            })
+            .then(job => {
+                if (job.status === 'succeeded') {
                     setTimeout(() => { window.location.reload(); }, 1500); // Reload after delay
                 } else {
-                    console.error("Import Error:", data.message);
-                    alert(`Import failed: ${data.message}`);
+                    console.error("Import Error:", job.message);
+                    alert(job.message);
                 }
             })
             .catch(error => {
@@ -886,6 +1037,27 @@ document.addEventListener('DOMContentLoaded', function () {
     });
     // --- End BibTeX Import Logic ---
 
+    // Downloads through a hidden iframe, so the browser still streams the file straight to disk, but an
+    // error response doesn't replace the page: a download never fires the iframe's load event, so a load
+    // means the server answered with an error (a JSON {status, message}) instead of the file.
+    function startDownload(url, onError) {
+        const frame = document.createElement('iframe');
+        frame.style.display = 'none';
+        document.body.appendChild(frame);
+        frame.addEventListener('load', function() {
+            let message = 'The server did not return a file.';
+            try {
+                const data = JSON.parse(frame.contentDocument.body.textContent);
+                if (data.message) message = data.message;
+            } catch (e) {
+                // Not a JSON error: keep the generic message
+            }
+            frame.remove();
+            onError(message);
+        });
+        frame.src = url;
+    }
+
     // --- Export HTML Button ---
     const exportHtmlBtn = document.getElementById('export-html-btn');
     exportHtmlBtn.addEventListener('click', function() {
@@ -921,18 +1093,8 @@ document.addEventListener('DOMContentLoaded', function () {
 
         //console.log("Export URL:", exportUrl);
 
-        // --- Trigger the download asynchronously ---
-        // Create a temporary invisible anchor element
-        const link = document.createElement('a');
-        link.href = exportUrl;
-        link.style.display = 'none';
-        // The filename will be suggested by the server's Content-Disposition header
-        // link.download = 'PCBPapers_export.html'; // Optional: Suggest a default name if server doesn't set it
-
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
-        // Note: The browser's download manager should handle the file save dialog.
+        // Trigger the download; the filename is suggested by the server's Content-Disposition header
+        startDownload(exportUrl, message => alert(`Export failed: ${message}`));
     });
 
     document.getElementById('export-xlsx-btn').addEventListener('click', function() {
@@ -955,58 +1117,36 @@ document.addEventListener('DOMContentLoaded', function () {
         //console.log("Exporting Excel with URL:", exportUrl);
 
         // Trigger the download
-        window.location.href = exportUrl;
+        startDownload(exportUrl, message => alert(`Export failed: ${message}`));
     });
 
-    const backupBtn = document.getElementById('backup-btn');
-    backupBtn.addEventListener('click', function() {
-        document.documentElement.classList.add('busyCursor');
-        //console.log("Backup button clicked");
-        backupStatusMessage.textContent = 'Creating backup...';
-        backupStatusMessage.style.color = '';
+    function startBackup(mode) {
         // Create backup URL with current filters
         const currentUrlParams = new URLSearchParams(window.location.search);
+        currentUrlParams.set('mode', mode);
         const backupUrl = `/backup?${currentUrlParams.toString()}`;
 
-        // Use fetch to get the backup file
-        fetch(backupUrl)
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error(`Backup failed: ${response.status} ${response.statusText}`);
-                }
-                // Extract filename from Content-Disposition header
-                const contentDisposition = response.headers.get('Content-Disposition');
-                let filename = 'backup.parça.zst';
-                if (contentDisposition) {
-                    const filenameMatch = contentDisposition.match(/filename="([^"]+)"/);
-                    if (filenameMatch) {
-                        filename = filenameMatch[1];
-                    }
-                }
-                return response.blob().then(blob => ({ blob, filename }));
-            })
-            .then(({ blob, filename }) => {
-                // Create a download link for the backup file
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = filename;
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                window.URL.revokeObjectURL(url);
-
-                backupStatusMessage.textContent = 'Backup created successfully!';
-                backupStatusMessage.style.color = 'green';
-                document.documentElement.classList.remove('busyCursor');
-            })
-            .catch(error => {
-                console.error('Backup error:', error);
-                backupStatusMessage.textContent = `Backup Error: ${error.message}`;
-                backupStatusMessage.style.color = 'red';
-                alert(`An error occurred during backup: ${error.message}`);
-                document.documentElement.classList.remove('busyCursor');
-            });
+        // Downloaded so the browser streams the archive straight to disk
+        // (fetch + blob would hold the whole backup in memory)
+        startDownload(backupUrl, message => {
+            console.error("Backup Error:", message);
+            backupStatusMessage.textContent = `Backup Error: ${message}`;
+            backupStatusMessage.style.color = 'red';
+            alert(`Backup failed: ${message}`);
+        });
+        backupStatusMessage.textContent = 'Backup download started.';
+        backupStatusMessage.style.color = 'green';
+    }
+
+    const backupBtn = document.getElementById('backup-btn');
+    backupBtn.addEventListener('click', function() {
+        //console.log("Backup button clicked");
+        startBackup('full');
+    });
+    // Incremental backups only hold what changed since the previous backup: restoring one needs
+    // the whole chain (full backup + every incremental after it), selected together
+    document.getElementById('backup-incremental-btn').addEventListener('click', function() {
+        startBackup('incremental');
     });
 
     restoreBtn.addEventListener('click', function() {
@@ -1015,28 +1155,33 @@ document.addEventListener('DOMContentLoaded', function () {
         const fileInput = document.createElement('input');
         fileInput.type = 'file';
         fileInput.accept = '.zst';
+        fileInput.multiple = true; // A full backup plus its incremental backups
         fileInput.style.display = 'none';
         fileInput.addEventListener('change', function(event) {
-            const file = event.target.files[0];
-            if (!file) return;
+            const files = Array.from(event.target.files);
+            if (files.length === 0) return;
             // Validate file extension
-            if (!file.name.endsWith('.parça.zst')) {
+            if (!files.every(file => file.name.endsWith('.parça.zst'))) {
                 alert('Invalid backup file. Expected .parça.zst file.');
                 return;
             }
 
-            // Create FormData and send restore request
-            const formData = new FormData();
-            formData.append('backup_file', file);
+            // A single backup is sent as the raw request body, so the server extracts it while it uploads;
+            // a chain of backups needs FormData
+            let requestOptions;
+            if (files.length === 1) {
+                requestOptions = { method: 'POST', body: files[0], headers: { 'Content-Type': 'application/zstd' } };
+            } else {
+                const formData = new FormData();
+                files.forEach(file => formData.append('backup_file', file));
+                requestOptions = { method: 'POST', body: formData };
+            }
 
             // Show status message
-                backupStatusMessage.textContent = `Restoring from ${file.name}...`;
+                backupStatusMessage.textContent = `Restoring from ${files.map(file => file.name).join(', ')}...`;
                 backupStatusMessage.style.color = '';
 
-            fetch('/restore', {
-                method: 'POST',
-                body: formData
-            })
+            fetch('/restore', requestOptions)
             .then(response => response.json())
             .then(data => {
                 document.documentElement.classList.add('busyCursor');
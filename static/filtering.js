@@ -21,6 +21,27 @@ const verifiedByCellIndex = 14;
 const commentedCellIndex = 15;
 const detailsCellIndex = 16;
 
+// Row accessors for filtering.js and stats.js. In the HTML export, rows that have not scrolled into view yet
+// are empty placeholders (data-export-pending): their values come from the export payload (ghpages.js).
+function rowCellText(row, cellIndex) {
+    if (row.dataset.exportPending) return exportCellText(row, cellIndex);
+    const cell = row.cells[cellIndex];
+    return cell ? cell.textContent.trim() : '';
+}
+
+function rowFieldText(row, field, fallback = '') {
+    if (row.dataset.exportPending) return exportFieldText(row, field, fallback);
+    const cell = row.querySelector(`[data-field="${field}"]`);
+    return cell ? cell.textContent.trim() : fallback;
+}
+
+/** Publication type of a row: the type cell's title (the full type name) or its text. */
+function rowTypeName(row) {
+    if (row.dataset.exportPending) return exportTypeName(row);
+    const typeCell = row.cells[typeCellIndex];
+    return typeCell ? typeCell.getAttribute('title') || typeCell.textContent.trim() : '';
+}
+
 // Generic filter elements - adjust selectors as needed for your HTML
 const searchInput = document.getElementById('search-input');
 const hideOfftopicCheckbox = document.getElementById('hide-offtopic-checkbox');
@@ -43,6 +64,8 @@ let currentClientSort = { column: null, direction: 'ASC' };
 // Pre-compiled regular expressions for search (if needed)
 let searchRegex = null;
 let searchTerms = [];
+// Result of the server-side full-text search ({ term, ids: Set }), set by comms.js. Always null in the HTML export.
+let serverSearchResult = null;
 
 // Symbol weights for sorting status cells (✔️, ❌, ❔)
 const SYMBOL_SORT_WEIGHTS = {
@@ -66,6 +89,11 @@ const duplicateCountElement = document.getElementById('duplicate-papers-count');
 // Add the WeakMap for caching row data
 const rowCache = new WeakMap();
 
+/** True when the server renders the table in keyset-paginated windows (?page_size=N); rows are then sorted server-side. */
+function isServerPaginated() {
+    return !!(tbody && tbody.dataset.pageSize);
+}
+
 /**
  * Applies alternating row shading to visible main rows.
  * Ensures detail rows follow their main row's shading.
@@ -306,48 +334,45 @@ function applyLocalFilters() {
             // Check if operation was cancelled during the loop
             if (signal.aborted) return;
             const row = rows[i];
-            // Cache status cells
-            const surveyCell = row.querySelector('.editable-status[data-field="is_survey"]');
-            const offtopicCell = row.querySelector('.editable-status[data-field="is_offtopic"]');
-
-            // Cache hidden data text
+            // Cache hidden data text and main row text content (excluding hidden data cells)
             let hiddenDataText = '';
-            const hiddenDataCells = row.querySelectorAll('td.hidden-data-cell');
-            for (let j = 0; j < hiddenDataCells.length; j++) {
-                // Check if operation was cancelled during the loop
-                if (signal.aborted) return;
-                hiddenDataText += ' ' + (hiddenDataCells[j].textContent || '').toLowerCase();
-            }
-            // Cache main row text content (excluding hidden data cells) and the paper ID
             let visibleRowText = '';
             // Include the paper ID in the searchable text
             const paperId = row.getAttribute('data-paper-id'); // Get the paper ID
             if (paperId) {
                 visibleRowText += ' ' + paperId.toLowerCase(); // Add it to the searchable text
             }
-            for (let j = 0; j < row.cells.length; j++) {
-                // Check if operation was cancelled during the loop
-                if (signal.aborted) return;
-                if (!row.cells[j].classList.contains('hidden-data-cell')) {
-                    visibleRowText += ' ' + row.cells[j].textContent.toLowerCase();
+            if (row.dataset.exportPending) {
+                const exportTexts = exportSearchTexts(row);
+                hiddenDataText = exportTexts.hiddenDataText;
+                visibleRowText += exportTexts.visibleRowText;
+            } else {
+                const hiddenDataCells = row.querySelectorAll('td.hidden-data-cell');
+                for (let j = 0; j < hiddenDataCells.length; j++) {
+                    // Check if operation was cancelled during the loop
+                    if (signal.aborted) return;
+                    hiddenDataText += ' ' + (hiddenDataCells[j].textContent || '').toLowerCase();
+                }
+                for (let j = 0; j < row.cells.length; j++) {
+                    // Check if operation was cancelled during the loop
+                    if (signal.aborted) return;
+                    if (!row.cells[j].classList.contains('hidden-data-cell')) {
+                        visibleRowText += ' ' + row.cells[j].textContent.toLowerCase();
+                    }
                 }
             }
-            // Cache frequently accessed text values
-            const journalText = row.cells[journalCellIndex]?.textContent?.trim().toLowerCase() || '';
-            const titleText = row.cells[titleCellIndex]?.textContent?.trim().toLowerCase() || '';
-            const authorsText = row.cells[authorsCellIndex]?.textContent?.trim().toLowerCase() || ''; // Cache authors text
 
             // Store all cached data in the WeakMap using the row element as the key
             rowCache.set(row, {
-                surveyStatus: surveyCell ? surveyCell.textContent.trim() : '❔',
-                offtopicStatus: offtopicCell ? offtopicCell.textContent.trim() : 'N/A',
+                surveyStatus: rowFieldText(row, 'is_survey', '❔'),
+                offtopicStatus: rowFieldText(row, 'is_offtopic', 'N/A'),
                 hiddenDataText,
                 visibleRowText,
-                journalText,
-                titleText,
-                authorsText, // Added authors text
-                pageCount: row.cells[pageCountCellIndex]?.textContent?.trim() || '',
-                year: row.cells[yearCellIndex]?.textContent?.trim() || ''
+                journalText: rowCellText(row, journalCellIndex).toLowerCase(),
+                titleText: rowCellText(row, titleCellIndex).toLowerCase(),
+                authorsText: rowCellText(row, authorsCellIndex).toLowerCase(),
+                pageCount: rowCellText(row, pageCountCellIndex),
+                year: rowCellText(row, yearCellIndex)
             });
         }
         /* ---------- 1.  shared batch containers ---------- */
@@ -388,8 +413,13 @@ function applyLocalFilters() {
             ---------------------------------------------------- */
             // Search Term
             if (showRow && searchTerm) {
-                // Fast string inclusion check first
-                if (!cachedData.visibleRowText.includes(searchTerm) && !cachedData.hiddenDataText.includes(searchTerm)) {
+                if (serverSearchResult && serverSearchResult.term === searchTerm) {
+                    // The server's FTS index already matched abstract/keywords/authors/comments: only scan visible cells here
+                    if (!serverSearchResult.ids.has(row.getAttribute('data-paper-id')) && !cachedData.visibleRowText.includes(searchTerm)) {
+                        showRow = false;
+                    }
+                } else if (!cachedData.visibleRowText.includes(searchTerm) && !cachedData.hiddenDataText.includes(searchTerm)) {
+                    // Fast string inclusion check first
                     showRow = false;
                 }
                 // If still showing, do more complex search if needed
@@ -447,8 +477,8 @@ function applyLocalFilters() {
                 applyButton.style.opacity = '0';
                 applyButton.style.pointerEvents = 'none';
             }
-            // Apply the current sort after filtering
-            if (currentClientSort.column) {
+            // Apply the current sort after filtering (paginated windows already arrive sorted)
+            if (currentClientSort.column && !isServerPaginated()) {
                 performSort(currentClientSort.column, currentClientSort.direction);
             }
             updateUrlWithClientFilters();
@@ -496,6 +526,27 @@ const NON_EDITABLE_STATUS_FIELDS = new Set([
     // e.g., 'some_other_field_name'
 ]);
 
+/** Compares strings like SQLite's COLLATE NOCASE, so sorting a server-paginated table matches the server's
+ *  windowed order (SORT_KEY_EXPRESSIONS in browse_db.py): ASCII letters are compared as lower case, everything
+ *  else by code point (UTF-8 byte order, where astral characters, i.e. surrogate pairs, come after the rest of
+ *  the BMP). Fully loaded tables and the HTML export keep the natural localeCompare order. */
+function compareNoCase(a, b) {
+    const length = Math.min(a.length, b.length);
+    for (let i = 0; i < length; i++) {
+        let x = a.charCodeAt(i);
+        let y = b.charCodeAt(i);
+        if (x >= 65 && x <= 90) x += 32;
+        if (y >= 65 && y <= 90) y += 32;
+        if (x !== y) {
+            const xSurrogate = x >= 0xD800 && x <= 0xDFFF;
+            const ySurrogate = y >= 0xD800 && y <= 0xDFFF;
+            if (xSurrogate !== ySurrogate) return xSurrogate ? 1 : -1;
+            return x - y;
+        }
+    }
+    return a.length - b.length;
+}
+
 function performSort(sortBy, direction, visibleRows = null) {
     if (!sortBy) return;
     // Use provided visible rows or get them from DOM
@@ -511,14 +562,14 @@ function performSort(sortBy, direction, visibleRows = null) {
     const isDateSort = sortBy === 'changed'; // Adjust 'changed' if your data-sort attribute is different
     const isNumericSort = ['year', 'estimated_score', 'page_count', 'relevance'].includes(sortBy);
     const isPDFSort = sortBy === 'pdf-link';
+    const compareText = isServerPaginated() ? compareNoCase : (a, b) => a.localeCompare(b, undefined, { sensitivity: 'base' });
     const isEditableStatusSort = !isNumericSort && !isPDFSort && !NON_EDITABLE_STATUS_FIELDS.has(sortBy) && !['title', 'journal', 'authors', 'changed_by', 'changed', 'verified_by'].includes(sortBy); // Excluded 'authors' from editable status check
     for (let i = 0; i < rowsToSort.length; i++) {
         const mainRow = rowsToSort[i];
         const paperId = mainRow.getAttribute('data-paper-id');
         let cellValue;
         if (isDateSort) {
-            const cell = mainRow.cells[headerIndex];
-            const cellText = cell ? cell.textContent.trim() : '';
+            const cellText = rowCellText(mainRow, headerIndex);
             // Parse the date string DD/MM/YY HH:MM:SS
             // Note: This assumes the date is always in this format. Adjust regex if format can vary.
             const dateMatch = cellText.match(/(\d{2})\/(\d{2})\/(\d{2})\s+(\d{2}):(\d{2}):(\d{2})/);
@@ -533,17 +584,13 @@ function performSort(sortBy, direction, visibleRows = null) {
                 cellValue = new Date(NaN); // Invalid Date object
             }
         } else if (isNumericSort) {
-            const cell = mainRow.cells[headerIndex];
-            cellValue = cell ? parseFloat(cell.textContent.trim()) || 0 : 0;
+            cellValue = parseFloat(rowCellText(mainRow, headerIndex)) || 0;
         } else if (isPDFSort) {
-            const cell = mainRow.cells[headerIndex];
-            cellValue = SYMBOL_PDF_WEIGHTS[cell?.textContent.trim()] ?? 0;
+            cellValue = SYMBOL_PDF_WEIGHTS[rowCellText(mainRow, headerIndex)] ?? 0;
         } else if (isEditableStatusSort) {
-            const cell = mainRow.querySelector(`.editable-status[data-field="${sortBy}"]`);
-            cellValue = SYMBOL_SORT_WEIGHTS[cell?.textContent.trim()] ?? 0;
+            cellValue = SYMBOL_SORT_WEIGHTS[rowFieldText(mainRow, sortBy)] ?? 0;
         } else {
-            const cell = mainRow.cells[headerIndex];
-            const cellText = cell ? cell.textContent.trim() : '';
+            const cellText = rowCellText(mainRow, headerIndex);
             if (NON_EDITABLE_STATUS_FIELDS.has(sortBy)) {
                 // For 'authors', 'type', 'relevance', 'estimated_score', etc., use direct text content
                 // If they contain symbols, SYMBOL_SORT_WEIGHTS will be used below
@@ -579,7 +626,7 @@ function performSort(sortBy, direction, visibleRows = null) {
                 comparison = aValue - bValue; // Subtraction works for valid dates
             }
         } else if (typeof aValue === 'string' && typeof bValue === 'string') {
-            comparison = aValue.localeCompare(bValue, undefined, { sensitivity: 'base' });
+            comparison = compareText(aValue, bValue);
         } else {
             // Handle comparisons between different types if necessary, defaulting to value comparison
             if (aValue > bValue) comparison = 1;
@@ -620,6 +667,16 @@ function sortTable() {
             newDirection = currentClientSort.direction === 'DESC' ? 'ASC' : 'DESC';
         }
         currentClientSort = { column: sortBy, direction: newDirection };
+        if (isServerPaginated()) {
+            // Only a window of rows is loaded: re-query the server in the new order
+            document.querySelectorAll('th .sort-indicator').forEach(ind => ind.textContent = '');
+            const indicator = this.querySelector('.sort-indicator');
+            if (indicator) {
+                indicator.textContent = newDirection === 'ASC' ? '▲' : '▼';
+            }
+            applyServerSideFilters();
+            return;
+        }
         // Perform the sort immediately on current visible rows
         performSort(sortBy, currentClientSort.direction);
         // Then apply the same UI updates that happen in the filtering flow
@@ -732,6 +789,9 @@ function restoreDetailState() {
         const mainRow = document.querySelector(`tr[data-paper-id="${paperId}"]:not(.filter-hidden)`);
         if (mainRow) {
             // Main row exists and is visible after filtering
+            if (mainRow.dataset.exportPending) {
+                renderExportRow(mainRow); // HTML export placeholder: the toggle button is not there yet
+            }
             const toggleButton = mainRow.querySelector('.toggle-btn');
             if (toggleButton) {
                 // Check if the detail row is already expanded
@@ -5,6 +5,239 @@ const minPageCountInput = document.getElementById('min-page-count');
 const yearFromInput = document.getElementById('year-from');
 const yearToInput = document.getElementById('year-to');
 
+// --- Paper rows from the columnar #export-data payload (see iter_export_payload_json() in browse_db.py) ---
+// Every paper starts as an empty placeholder row; its cells are only built when it scrolls near the view
+// (renderExportRow). Until then filtering.js and stats.js read its values from the payload, through
+// rowCellText()/rowFieldText(). Detail rows are built when first expanded.
+const exportData = JSON.parse(document.getElementById('export-data').textContent);
+// The columns are written in chunks of papers: join them into one array per column
+exportData.columns = {};
+for (const name of Object.keys(exportData.chunks[0])) {
+    exportData.columns[name] = exportData.chunks.flatMap(chunk => chunk[name]);
+}
+exportData.count = exportData.columns.id.length;
+delete exportData.chunks;
+const EXPORT_FLAG_OFFTOPIC_SHIFT = 0;
+const EXPORT_FLAG_SURVEY_SHIFT = 2;
+const EXPORT_FLAG_PDF_STATE_SHIFT = 4;
+const EXPORT_STATUS_SYMBOLS = ['❔', '✔️', '❌'];     // 2-bit status: unknown, true, false (as render_status)
+const HTML_ESCAPES = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+
+// Cells of a main row by position, as exportRowCellsHtml() renders them; the hidden data cells come last
+const EXPORT_HIDDEN_CELLS_START = 13;
+const EXPORT_FIELD_CELLS = {
+    'authors': 2, 'is_offtopic': 7, 'is_survey': 9, 'user_comment_state': 11,
+    'abstract': 13, 'keywords': 14, 'user_trace': 15, 'research_area': 16,
+};
+const EXPORT_RENDER_MARGIN = '1500px 0px';     // Placeholder rows are rendered this far before they scroll into view
+const exportCellTextCache = new Array(exportData.count);
+let exportRowObserver = null;
+
+function escapeHtml(value) {
+    return String(value).replace(/[&<>"']/g, ch => HTML_ESCAPES[ch]);
+}
+
+function exportTermsText(name, i) {
+    // Authors/keywords column entries are dictionary indexes, or the original string if it didn't round-trip
+    const value = exportData.columns[name][i];
+    if (Array.isArray(value)) {
+        const dict = exportData.dicts[name];
+        return value.map(index => dict[index]).join('; ');
+    }
+    return value || '';
+}
+
+function exportTermsList(name, i) {
+    return exportTermsText(name, i).split(';').map(term => term.trim()).filter(term => term);
+}
+
+function exportCellTexts(i) {
+    // What textContent.trim() gives for each cell of row i once it is rendered
+    let texts = exportCellTextCache[i];
+    if (!texts) {
+        const columns = exportData.columns;
+        const dicts = exportData.dicts;
+        const flags = columns.flags[i];
+        const pdfState = dicts.pdf_states[flags >> EXPORT_FLAG_PDF_STATE_SHIFT];
+        const type = dicts.types[columns.type[i]];
+        texts = exportCellTextCache[i] = [
+            columns.pdf_filename[i] || pdfState === 'paywalled' ? (exportData.pdf_emojis[pdfState] || '') : '',
+            columns.title[i],
+            exportTermsText('authors', i),
+            String(columns.year[i] || ''),
+            String(columns.page_count[i] || ''),
+            dicts.journals[columns.journal[i]],
+            exportData.type_emojis[type] || exportData.default_type_emoji,
+            EXPORT_STATUS_SYMBOLS[(flags >> EXPORT_FLAG_OFFTOPIC_SHIFT) & 3],
+            String(columns.relevance[i] || ''),
+            EXPORT_STATUS_SYMBOLS[(flags >> EXPORT_FLAG_SURVEY_SHIFT) & 3],
+            columns.changed[i],
+            columns.user_trace[i].trim() ? '✔️' : '❌',
+            'Show',
+            columns.abstract[i],
+            exportTermsText('keywords', i),
+            columns.user_trace[i],
+            dicts.research_areas[columns.research_area[i]],
+        ].map(text => text.trim());
+    }
+    return texts;
+}
+
+// Values of a placeholder row (data-export-pending), for rowCellText()/rowFieldText()/rowTypeName() in filtering.js
+function exportCellText(row, cellIndex) {
+    return exportCellTexts(Number(row.dataset.exportIndex))[cellIndex] ?? '';
+}
+
+function exportFieldText(row, field, fallback) {
+    const cellIndex = EXPORT_FIELD_CELLS[field];
+    return cellIndex === undefined ? fallback : exportCellText(row, cellIndex);
+}
+
+function exportTypeName(row) {
+    const i = Number(row.dataset.exportIndex);
+    return exportData.dicts.types[exportData.columns.type[i]] || exportCellText(row, typeCellIndex);
+}
+
+function exportSearchTexts(row) {
+    // The lowercased visible and hidden cell texts filtering.js searches in
+    const texts = exportCellTexts(Number(row.dataset.exportIndex));
+    return {
+        visibleRowText: ' ' + texts.slice(0, EXPORT_HIDDEN_CELLS_START).join(' ').toLowerCase(),
+        hiddenDataText: ' ' + texts.slice(EXPORT_HIDDEN_CELLS_START).join(' ').toLowerCase(),
+    };
+}
+
+function exportRowCellsHtml(i) {
+    const columns = exportData.columns;
+    const dicts = exportData.dicts;
+    const flags = columns.flags[i];
+    const pdfState = dicts.pdf_states[flags >> EXPORT_FLAG_PDF_STATE_SHIFT];
+    const pdfEmoji = escapeHtml(exportData.pdf_emojis[pdfState] || '');
+    const pdfFilename = columns.pdf_filename[i];
+    const type = dicts.types[columns.type[i]];
+    const doi = columns.doi[i];
+    const userTrace = columns.user_trace[i];
+
+    let pdfCell;
+    if (pdfFilename) {
+        const folder = pdfState === 'annotated' ? 'data/pdf_annotated/' : 'data/pdf/';
+        pdfCell = `<td class="status-cell pdf-status"><a href="${folder}${escapeHtml(pdfFilename)}" target="_blank" class="pdf-link" title="Open PDF">${pdfEmoji}</a></td>`;
+    } else {
+        pdfCell = `<td>${pdfState === 'paywalled' ? `<span title="This paper is paywalled">${pdfEmoji}</span>` : ''}</td>`;
+    }
+    const title = escapeHtml(columns.title[i]);
+    const titleCell = doi
+        ? `<td class="title-cell"><a href="https://doi.org/${escapeHtml(doi)}" target="_blank">${title}</a></td>`
+        : `<td class="title-cell"><span style="font-weight: 300;">${title}</span></td>`;
+
+    return `${pdfCell}${titleCell}`
+        + `<td class="secondary-text-cell" data-field="authors">${escapeHtml(exportTermsText('authors', i))}</td>`
+        + `<td class="secondary-text-cell number-cell">${escapeHtml(columns.year[i] || '')}</td>`
+        + `<td class="secondary-text-cell number-cell">${escapeHtml(columns.page_count[i] || '')}</td>`
+        + `<td class="secondary-text-cell">${escapeHtml(dicts.journals[columns.journal[i]])}</td>`
+        + `<td class="status-cell" title="${escapeHtml(type)}">${escapeHtml(exportData.type_emojis[type] || exportData.default_type_emoji)}</td>`
+        + `<td class="status-cell editable-status" data-field="is_offtopic">${EXPORT_STATUS_SYMBOLS[(flags >> EXPORT_FLAG_OFFTOPIC_SHIFT) & 3]}</td>`
+        + `<td class="secondary-text-cell number-cell">${escapeHtml(columns.relevance[i] || '')}</td>`
+        + `<td class="status-cell editable-status" data-field="is_survey">${EXPORT_STATUS_SYMBOLS[(flags >> EXPORT_FLAG_SURVEY_SHIFT) & 3]}</td>`
+        + `<td class="secondary-text-cell changed-cell">${escapeHtml(columns.changed[i])}</td>`
+        + `<td class="status-cell" data-field="user_comment_state">${userTrace.trim() ? '✔️' : '❌'}</td>`
+        + `<td class="toggle-btn" onclick="toggleDetails(this)"><span>Show</span></td>`
+        // Hidden data cells for faster stats retrieval
+        + `<td class="hidden-data-cell" data-field="abstract" style="display: none;">${escapeHtml(columns.abstract[i])}</td>`
+        + `<td class="hidden-data-cell" data-field="keywords" style="display: none;">${escapeHtml(exportTermsText('keywords', i))}</td>`
+        + `<td class="hidden-data-cell" data-field="user_trace" style="display: none;">${escapeHtml(userTrace)}</td>`
+        + `<td class="hidden-data-cell" data-field="research_area" style="display: none;">${escapeHtml(dicts.research_areas[columns.research_area[i]])}</td>`;
+}
+
+function exportClickableTerms(name, i) {
+    return exportTermsList(name, i).map(term => {
+        const escaped = escapeHtml(term);
+        return `<span class="clickable-item" data-search-field="${name}" data-search-term="${escaped}">${escaped};</span>`;
+    }).join(' ');
+}
+
+function exportDetailHtml(i) {
+    const columns = exportData.columns;
+    const paperId = escapeHtml(columns.id[i]);
+    const doi = escapeHtml(columns.doi[i]);
+    const issn = escapeHtml(columns.issn[i]);
+    return `<div class="detail-flex-container">
+    <div class="detail-content detail-abstract">
+        <div class="id-section">
+            <strong>ID:</strong> ${paperId}
+            <button type="button" class="id-copy-btn" onclick="copyPaperId(exportData.columns.id[${i}], this)">Copy</button>
+        </div>
+        <p><strong>Abstract:</strong> ${escapeHtml(columns.abstract[i])}</p>
+    </div>
+    <div class="detail-content detail-metadata">
+        <div class="bibtex-section">
+            <strong>BibTeX Citation:</strong>
+            <button type="button" class="bibtex-copy-btn" onclick="copyBibtex(exportData.columns.bibtex[${i}], this)">Copy</button>
+            <pre class="bibtex-pre">${escapeHtml(columns.bibtex[i])}</pre>
+        </div>
+        <div class="searchable-section">
+            <span style="font-size:0.8em; color: var(--light-colored-btn-text);">Click on any keyword or author below to <strong>search</strong> for it:</span>
+            <p><strong>Keywords:</strong> <span class="clickable-keywords">${exportClickableTerms('keywords', i)}</span></p>
+            <p><strong>Authors:</strong> <span class="clickable-authors">${exportClickableTerms('authors', i)}</span></p>
+        </div>
+        <p>
+            <strong>DOI:</strong> ${doi ? `<a href="https://doi.org/${doi}" target="_blank">${doi}</a>` : ''}<br>
+            <strong> ISSN:</strong> ${issn || 'None'}
+            <strong> — Page Range/Start:</strong> ${escapeHtml(columns.pages[i])}
+        </p>
+    </div>
+    <div class="edit-section detail-edit">
+        <form id="form-${paperId}" data-paper-id="${paperId}">
+            <label>Research Area:
+                <input disabled type="text" class="editable" name="research_area" value="${escapeHtml(exportData.dicts.research_areas[columns.research_area[i]])}">
+            </label>
+            <label>Page count:
+                <input disabled type="text" class="editable" name="page_count" value="${escapeHtml(columns.page_count[i] || '')}">
+            </label>
+            <label>Relevance:
+                <input disabled type="text" class="editable" name="relevance" value="${escapeHtml(columns.relevance[i] || '')}" placeholder="0 - 10">
+            </label>
+            <label>User comments:
+                <textarea disabled class="editable" name="user_trace">${escapeHtml(columns.user_trace[i])}</textarea>
+            </label>
+        </form>
+    </div>
+</div>`;
+}
+
+function renderExportRow(row) {
+    // Replaces the placeholder cell of a main row with its real cells
+    if (!row.dataset.exportPending) return;
+    row.innerHTML = exportRowCellsHtml(Number(row.dataset.exportIndex));
+    delete row.dataset.exportPending;
+    if (exportRowObserver) exportRowObserver.unobserve(row);
+}
+
+function renderExportRows() {
+    const ids = exportData.columns.id;
+    const html = new Array(exportData.count);
+    for (let i = 0; i < exportData.count; i++) {
+        html[i] = `<tr data-paper-id="${escapeHtml(ids[i])}" data-export-index="${i}" data-export-pending="1"><td class="export-pending-cell" colspan="17"></td></tr>`
+            + `<tr class="detail-row"><td colspan="17"></td></tr>`;
+    }
+    const exportTbody = document.querySelector('#papersTable tbody');
+    exportTbody.insertAdjacentHTML('beforeend', html.join(''));
+    const placeholders = exportTbody.querySelectorAll('tr[data-export-pending]');
+    if (!('IntersectionObserver' in window)) {
+        placeholders.forEach(renderExportRow); // Everything up front
+        return;
+    }
+    // The table scrolls inside its container, so that is the root the margin applies to
+    exportRowObserver = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) renderExportRow(entry.target);
+        });
+    }, { root: document.getElementById('papers-table-container'), rootMargin: EXPORT_RENDER_MARGIN });
+    placeholders.forEach(row => exportRowObserver.observe(row));
+}
+
+renderExportRows(); // Before anything below (or in stats.js / filtering.js) queries the rows
+
 const allRows = document.querySelectorAll('#papersTable tbody tr[data-paper-id]');
 const totalPaperCount = allRows.length;
 
@@ -33,6 +266,10 @@ function toggleDetails(element) {
     } else {
         // Showing the detail row
         if (detailRow) {
+            if (!detailRow.dataset.rendered) { // Detail rows are built on first expand
+                detailRow.cells[0].innerHTML = exportDetailHtml(Number(row.dataset.exportIndex));
+                detailRow.dataset.rendered = '1';
+            }
             detailRow.classList.add('expanded');
             const detailContentContainer = detailRow.querySelector('.detail-flex-container');
             if (detailContentContainer) {
@@ -1,5 +1,15 @@
 //static/pdfjs/web/autosave.js
 //Autosave script for ResearchParça Annotator based on PDF.js
+// Load PDFs on demand: /serve_pdf answers range requests, so PDF.js only fetches the pages being viewed
+// instead of streaming the whole file. Set before the viewer reads its options (webviewerloaded).
+document.addEventListener('webviewerloaded', function () {
+    const options = window.PDFViewerApplicationOptions;
+    if (options) {
+        options.set('disableAutoFetch', true);
+        options.set('disableStream', true);
+    }
+});
+
 document.addEventListener('DOMContentLoaded', function () {
     const PDFViewerApplication = window.PDFViewerApplication;
     if (!PDFViewerApplication) {
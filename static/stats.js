@@ -11,6 +11,7 @@ let latestYearlyData = {};
 let isStacked = false; // Default state
 let isCumulative = false; // Default state
 let showPieCharts = false; // Default to bar charts
+let serverStats = null; // Aggregates from /stats for the current modal, null = computed from the table rows
 
 // --- DOM Elements ---
 const statsBtn = document.getElementById('stats-btn');
@@ -59,6 +60,62 @@ const COUNT_FIELDS = [
     'changed_by', 'verified', 'verified_by', 'user_comment_state' // user counting (Top-level)
 ];
 
+/**
+ * Server page only: the table may hold just the first windows of rows, so the stats modal asks /stats
+ * for aggregates over the whole filtered set. A client-side search narrows rows beyond the server
+ * filters, so it (and the HTML export, which has no server) keeps counting the visible rows.
+ */
+function canUseServerStats() {
+    return document.body.id !== 'html-export' && !searchInput.value.trim();
+}
+
+function fetchServerStats() {
+    const urlParams = new URLSearchParams(window.location.search);
+    const statsParams = new URLSearchParams();
+    ['hide_offtopic', 'year_from', 'year_to', 'min_page_count'].forEach(param => {
+        if (urlParams.has(param)) statsParams.set(param, urlParams.get(param));
+    });
+    statsParams.set('survey_filter', currentSurveyFilterState);
+    return fetch(`/stats?${statsParams.toString()}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.status !== 'success') {
+                throw new Error(data.message || 'Failed to load statistics');
+            }
+            return data.stats;
+        });
+}
+
+/** Opens the stats modal: server aggregates where possible, otherwise (or if /stats fails) the visible rows. */
+function openStatsModal() {
+    document.documentElement.classList.add('busyCursor');
+    serverStats = null;
+    if (!canUseServerStats()) {
+        buildStatsLists();
+        displayStats();
+        return;
+    }
+    fetchServerStats()
+        .then(stats => { serverStats = stats; })
+        .catch(error => console.error('Error fetching /stats, counting the loaded rows instead:', error))
+        .finally(() => {
+            buildStatsLists();
+            displayStats();
+        });
+}
+
+/** Paper counts behind the distribution charts: { visible: filtered papers, total: all papers in the DB } */
+function getStatsPaperCounts() {
+    if (serverStats) {
+        return { visible: serverStats.filtered_papers, total: serverStats.total_papers };
+    }
+    const totalPaperCountCell = document.getElementById('total-papers-count');
+    return {
+        visible: document.querySelectorAll('#papersTable tbody tr[data-paper-id]:not(.filter-hidden)').length,
+        total: totalPaperCountCell ? parseInt(totalPaperCountCell.textContent.trim(), 10) : 0
+    };
+}
+
 /** updateCounts() is used by filtering.js and comms.js! */
 function updateCounts() { 
     const counts = {};
@@ -78,27 +135,23 @@ function updateCounts() {
 
     // Count symbols in visible rows and collect yearly data
     visibleRows.forEach(row => {
-        const pdfCell = row.cells[pdfCellIndex];
-        if (pdfCell) {
-            const pdfContent = pdfCell.textContent.trim();
-            // Increment counts based on the emoji in the PDF cell
-            if (pdfContent === '📕') { // PDF present
-                counts['pdf_present'] = (counts['pdf_present'] || 0) + 1;
-            } else if (pdfContent === '📗') { // Annotated PDF present
-                counts['pdf_annotated'] = (counts['pdf_annotated'] || 0) + 1;
-                counts['pdf_present'] = (counts['pdf_present'] || 0) + 1;       // Also count annotated as a PDF present
-            } else if (pdfContent === '💰') {
-                counts['pdf_paywalled'] = (counts['pdf_paywalled'] || 0) + 1;
-            }
-            // '❔' means no PDF, so no increment needed for this state
+        const pdfContent = rowCellText(row, pdfCellIndex);
+        // Increment counts based on the emoji in the PDF cell
+        if (pdfContent === '📕') { // PDF present
+            counts['pdf_present'] = (counts['pdf_present'] || 0) + 1;
+        } else if (pdfContent === '📗') { // Annotated PDF present
+            counts['pdf_annotated'] = (counts['pdf_annotated'] || 0) + 1;
+            counts['pdf_present'] = (counts['pdf_present'] || 0) + 1;       // Also count annotated as a PDF present
+        } else if (pdfContent === '💰') {
+            counts['pdf_paywalled'] = (counts['pdf_paywalled'] || 0) + 1;
         }
+        // '❔' means no PDF, so no increment needed for this state
         COUNT_FIELDS.forEach(field => {
             // Skip the PDF fields as they are handled separately above
             if (field === 'pdf_present' || field === 'pdf_annotated') {
                 return; // Skip to the next field
             }
-            const cell = row.querySelector(`[data-field="${field}"]`);
-            const cellText = cell ? cell.textContent.trim() : '';
+            const cellText = rowFieldText(row, field);
             if (field === 'model') {
                 if (cellText && cellText !== '') { // Check if there's content
                     // Split the content by comma and trim whitespace
@@ -106,8 +159,7 @@ function updateCounts() {
                     // Add the number of distinct models found in this cell to the total count
                     counts[field] += modelNames.length;
                     // --- Update Yearly Model Counts ---
-                    const yearCell = row.cells[yearCellIndex];
-                    const yearText = yearCell ? yearCell.textContent.trim() : '';
+                    const yearText = rowCellText(row, yearCellIndex);
                     const year = yearText ? parseInt(yearText, 10) : null;
                     if (year && !isNaN(year)) {
                         if (!yearlyModels[year]) {
@@ -132,8 +184,7 @@ function updateCounts() {
                 }
             }
         });
-        const yearCell = row.cells[yearCellIndex]; // Assuming Year is the 3rd column (index 2)
-        const yearText = yearCell ? yearCell.textContent.trim() : '';
+        const yearText = rowCellText(row, yearCellIndex);
         const year = yearText ? parseInt(yearText, 10) : null;
         if (year && !isNaN(year)) {
             // Initialize yearly data objects for the year if they don't exist
@@ -141,8 +192,7 @@ function updateCounts() {
                 yearlySurveyImpl[year] = { surveys: 0, impl: 0 };
             }
             // Update Publication Type counts ---
-            const typeCell = row.cells[typeCellIndex]; // Assuming Type is the 1st column (index 0)
-            const pubTypeText = typeCell ? typeCell.getAttribute('title') || typeCell.textContent.trim() : ''; // Use title for full type if available
+            const pubTypeText = rowTypeName(row); // Full type name if available
             if (pubTypeText) {
                 if (!yearlyPubTypes[year]) {
                     yearlyPubTypes[year] = {}; // Initialize object for this year's types
@@ -151,8 +201,7 @@ function updateCounts() {
                 yearlyPubTypes[year][pubTypeText] = (yearlyPubTypes[year][pubTypeText] || 0) + 1;
             }
             // Update Survey/Impl counts
-            const isSurveyCell = row.querySelector('.editable-status[data-field="is_survey"]');
-            const isSurvey = isSurveyCell && isSurveyCell.textContent.trim() === '✔️';
+            const isSurvey = rowFieldText(row, 'is_survey') === '✔️';
             if (isSurvey) {
                 yearlySurveyImpl[year].surveys++;
             } else {
@@ -161,12 +210,20 @@ function updateCounts() {
         }
     });
 
-    // Make counts available outside this function
-    latestCounts = counts;
-    latestYearlyData = {
-        surveyImpl: yearlySurveyImpl,
-        pubTypes: yearlyPubTypes,
-    };
+    // Make counts available outside this function (the modal's /stats aggregates cover all filtered papers, keep them)
+    if (serverStats) {
+        latestCounts = serverStats.counts;
+        latestYearlyData = {
+            surveyImpl: serverStats.yearly.survey_impl,
+            pubTypes: serverStats.yearly.pub_types,
+        };
+    } else {
+        latestCounts = counts;
+        latestYearlyData = {
+            surveyImpl: yearlySurveyImpl,
+            pubTypes: yearlyPubTypes,
+        };
+    }
 
     // ... (rest of the function remains the same: visible/loaded counts, footer updates)
     if (document.body.id === 'html-export') {
@@ -176,7 +233,8 @@ function updateCounts() {
         // Original code for other pages
         const visiblePapersCountCell = document.getElementById('visible-papers-count');
         const loadedPapersCountCell = document.getElementById('loaded-papers-count');
-        loadedPapersCountCell.textContent = loadedPaperCount;
+        const filteredTotal = document.querySelector('#papersTable tbody')?.dataset.filteredTotal;
+        loadedPapersCountCell.textContent = filteredTotal ? `${loadedPaperCount} of ${filteredTotal}` : loadedPaperCount;
         visiblePapersCountCell.textContent = visiblePaperCount;
     }
 
@@ -203,23 +261,22 @@ function updateCounts() {
 }
 
 function calculateJournalConferenceStats() {
+    if (serverStats) {
+        return { journals: serverStats.journals, conferences: serverStats.conferences };
+    }
     const journalCounts = {};
     const conferenceCounts = {};
     // Select only VISIBLE main rows
     const visibleRows = document.querySelectorAll('#papersTable tbody tr[data-paper-id]:not(.filter-hidden)');
     visibleRows.forEach(row => {
-        const journalCell = row.cells[journalCellIndex]; // Use the global defined in globals.js
-        const typeCell = row.cells[typeCellIndex]; // Use the global defined in globals.js
-        if (journalCell && typeCell) {
-            const journalName = journalCell.textContent.trim();
-            const type = typeCell.getAttribute('title') || typeCell.textContent.trim(); // Prefer title attribute for type
-            // Only count if journal name is not empty
-            if (journalName) {
-                if (type && type.toLowerCase() === 'article') {
-                    journalCounts[journalName] = (journalCounts[journalName] || 0) + 1;
-                } else if (type && type.toLowerCase() === 'inproceedings') {
-                    conferenceCounts[journalName] = (conferenceCounts[journalName] || 0) + 1; // Use journal cell content for conf name
-                }
+        const journalName = rowCellText(row, journalCellIndex);
+        const type = rowTypeName(row); // Prefers the type cell's title attribute
+        // Only count if journal name is not empty
+        if (journalName) {
+            if (type && type.toLowerCase() === 'article') {
+                journalCounts[journalName] = (journalCounts[journalName] || 0) + 1;
+            } else if (type && type.toLowerCase() === 'inproceedings') {
+                conferenceCounts[journalName] = (conferenceCounts[journalName] || 0) + 1; // Use journal cell content for conf name
             }
         }
     });
@@ -298,66 +355,57 @@ function buildStatsLists() {
         otherDetectedFeatures: {},
         modelNames: {}
     };
-    const visibleRows = document.querySelectorAll('#papersTable tbody tr[data-paper-id]:not(.filter-hidden)');
+    if (serverStats) {
+        stats.keywords = serverStats.keywords;
+        stats.authors = serverStats.authors;
+        stats.researchAreas = serverStats.research_areas;
+    }
+    // With server stats there is nothing left to count in the rows
+    const visibleRows = serverStats ? [] : document.querySelectorAll('#papersTable tbody tr[data-paper-id]:not(.filter-hidden)');
     visibleRows.forEach(row => {
         // --- Get Journal/Conference and Type (same as before) ---
-        const journalCell = row.cells[journalCellIndex]; // Index 4 (Journal/Conf column)
-        const typeCell = row.cells[typeCellIndex]; // Index 5 (Type column) - Assuming typeCellIndex is defined globally
-        if (journalCell && typeCell) { // Ensure cells exist
-            const journalConfName = journalCell.textContent.trim();
-            const typeValue = (typeCell.getAttribute('title') || typeCell.textContent.trim()).toLowerCase(); // Use title if available, standardize case
-            if (journalConfName) {
-                // Determine if it's a journal or conference based on type
-                // Common BibTeX types: 'article' -> journal, 'inproceedings', 'proceedings', 'conference' -> conference
-                if (typeValue === 'article') {
-                    stats.journals[journalConfName] = (stats.journals[journalConfName] || 0) + 1;
-                } else if (typeValue === 'inproceedings' || typeValue === 'proceedings' || typeValue === 'conference') {
-                    stats.conferences[journalConfName] = (stats.conferences[journalConfName] || 0) + 1;
-                } else {
-                    // Optional: Handle other types or log them if needed
-                    // //console.log(`Unrecognized type for ${journalConfName}: ${typeValue}`);
-                    // You could add them to a 'miscellaneous' category if desired
-                }
+        const journalConfName = rowCellText(row, journalCellIndex);
+        const typeValue = rowTypeName(row).toLowerCase(); // Standardize case
+        if (journalConfName) {
+            // Determine if it's a journal or conference based on type
+            // Common BibTeX types: 'article' -> journal, 'inproceedings', 'proceedings', 'conference' -> conference
+            if (typeValue === 'article') {
+                stats.journals[journalConfName] = (stats.journals[journalConfName] || 0) + 1;
+            } else if (typeValue === 'inproceedings' || typeValue === 'proceedings' || typeValue === 'conference') {
+                stats.conferences[journalConfName] = (stats.conferences[journalConfName] || 0) + 1;
+            } else {
+                // Optional: Handle other types or log them if needed
+                // //console.log(`Unrecognized type for ${journalConfName}: ${typeValue}`);
+                // You could add them to a 'miscellaneous' category if desired
             }
         }
-        // --- Get data from hidden cells ---
-        // Find the hidden cells by their data-field attribute within the current row
-        const keywordsCell = row.querySelector('td[data-field="keywords"]');
-        const authorsCell = row.querySelector('td[data-field="authors"]');
-        const researchAreaCell = row.querySelector('td[data-field="research_area"]');
-
+        // --- Get data from hidden cells, by their data-field attribute ---
         // --- Extract and Process Keywords ---
-        if (keywordsCell) { // Check if the cell exists before accessing its content
-            const keywordsText = keywordsCell.textContent.trim();
-            if (keywordsText) {
-                const keywordsList = keywordsText.split(';')
-                    .map(kw => kw.trim())
-                    .filter(kw => kw.length > 0);
-                keywordsList.forEach(keyword => {
-                    stats.keywords[keyword] = (stats.keywords[keyword] || 0) + 1;
-                });
-            }
+        const keywordsText = rowFieldText(row, 'keywords');
+        if (keywordsText) {
+            const keywordsList = keywordsText.split(';')
+                .map(kw => kw.trim())
+                .filter(kw => kw.length > 0);
+            keywordsList.forEach(keyword => {
+                stats.keywords[keyword] = (stats.keywords[keyword] || 0) + 1;
+            });
         }
 
         // --- Extract and Process Authors ---
-        if (authorsCell) { // Check if the cell exists before accessing its content
-            const authorsText = authorsCell.textContent.trim();
-            if (authorsText) {
-                const authorsList = authorsText.split(';')
-                    .map(author => author.trim())
-                    .filter(author => author.length > 0);
-                authorsList.forEach(author => {
-                    stats.authors[author] = (stats.authors[author] || 0) + 1;
-                });
-            }
+        const authorsText = rowFieldText(row, 'authors');
+        if (authorsText) {
+            const authorsList = authorsText.split(';')
+                .map(author => author.trim())
+                .filter(author => author.length > 0);
+            authorsList.forEach(author => {
+                stats.authors[author] = (stats.authors[author] || 0) + 1;
+            });
         }
 
         // --- Extract and Process Research Area ---
-        if (researchAreaCell) { // Check if the cell exists before accessing its content
-            const researchAreaText = researchAreaCell.textContent.trim();
-            if (researchAreaText) {
-                stats.researchAreas[researchAreaText] = (stats.researchAreas[researchAreaText] || 0) + 1;
-            }
+        const researchAreaText = rowFieldText(row, 'research_area');
+        if (researchAreaText) {
+            stats.researchAreas[researchAreaText] = (stats.researchAreas[researchAreaText] || 0) + 1;
         }
     });
 
@@ -513,15 +561,12 @@ function preparePubTypesDistData() {
 }
 
 function prepareRelevanceHistogramData(visibleRows) {
-    const relevanceCounts = Array(11).fill(0); // Index 0-10 for scores 0-10
-    visibleRows.forEach(row => {
-        const relevanceCell = row.cells[relevanceCellIndex]; // Assume relevanceCellIndex is defined globally
-        if (relevanceCell) {
-            const relevanceText = relevanceCell.textContent.trim();
-            const relevanceScore = parseInt(relevanceText, 10);
-            if (!isNaN(relevanceScore) && relevanceScore >= 0 && relevanceScore <= 10) {
-                relevanceCounts[relevanceScore]++;
-            }
+    const relevanceCounts = serverStats ? serverStats.relevance.slice() : Array(11).fill(0); // Index 0-10 for scores 0-10
+    (serverStats ? [] : visibleRows).forEach(row => {
+        const relevanceText = rowCellText(row, relevanceCellIndex);
+        const relevanceScore = parseInt(relevanceText, 10);
+        if (!isNaN(relevanceScore) && relevanceScore >= 0 && relevanceScore <= 10) {
+            relevanceCounts[relevanceScore]++;
         }
     });
     return {
@@ -884,15 +929,11 @@ function displayStats() {
     document.documentElement.classList.add('busyCursor');
     
     setTimeout(() => {
-        updateCounts(); // Run updateCounts to get the latest data for visible rows
+        updateCounts(); // Run updateCounts to get the latest data for visible rows (or the /stats aggregates)
 
         // --- Read Counts and Paper Counts ---
-        // Get the total number of currently visible papers directly
         const visibleRows = document.querySelectorAll('#papersTable tbody tr[data-paper-id]:not(.filter-hidden)');
-        const totalVisiblePaperCount = visibleRows.length;
-        // Get the total number of *all* papers from the footer cell
-        const totalPaperCountCell = document.getElementById('total-papers-count');
-        const totalAllPaperCount = totalPaperCountCell ? parseInt(totalPaperCountCell.textContent.trim(), 10) : 0;
+        const { visible: totalVisiblePaperCount, total: totalAllPaperCount } = getStatsPaperCounts();
 
         // --- Destroy existing charts if they exist (important for re-renders) ---
         destroyExistingCharts();
@@ -1186,11 +1227,7 @@ document.addEventListener('DOMContentLoaded', function () {
     pieToggle.checked = false;
     cloudToggle.checked = false;
 
-    statsBtn.addEventListener('click', function () {
-        document.documentElement.classList.add('busyCursor');
-        buildStatsLists();
-        displayStats();
-    });
+    statsBtn.addEventListener('click', openStatsModal);
 
     stackingToggle.addEventListener('change', function () {
         isStacked = this.checked; // Update the state variable
@@ -1243,19 +1280,10 @@ document.addEventListener('DOMContentLoaded', function () {
         showPieCharts = this.checked; // Update the state variable
 
         // Prepare the updated data based on the new showPieCharts state
-        const surveyVsImplDistChartData = prepareSurveyVsImplDistData(
-            // You need to get the current totalVisiblePaperCount here.
-            // It's calculated in displayStats but not stored globally.
-            // Option 1: Store it in a global variable like latestCounts/YearlyData
-            // Option 2: Recalculate it here (less efficient but simpler for this change)
-            document.querySelectorAll('#papersTable tbody tr[data-paper-id]:not(.filter-hidden)').length
-        );
+        const paperCounts = getStatsPaperCounts();
+        const surveyVsImplDistChartData = prepareSurveyVsImplDistData(paperCounts.visible);
         const pubTypesDistChartData = preparePubTypesDistData();
-        const scopeChartData = prepareScopeData(
-            // Similarly, you need the visible and total counts here
-            document.querySelectorAll('#papersTable tbody tr[data-paper-id]:not(.filter-hidden)').length,
-            parseInt(document.getElementById('total-papers-count')?.textContent.trim() || '0', 10)
-        );
+        const scopeChartData = prepareScopeData(paperCounts.visible, paperCounts.total);
 
         // Determine the chart type ('bar' or 'pie')
         const chartType = showPieCharts ? 'pie' : 'bar';
@@ -1311,7 +1339,6 @@ document.addEventListener('DOMContentLoaded', function () {
         // Add the F4 key check for opening the stats panel
         if (event.key === 'F4') {
             event.preventDefault(); // Prevent any default F4 behavior (though browsers often don't have one)
-            document.documentElement.classList.add('busyCursor');
             closeSmallModal();
             if (document.body.id !== "html-export") {
                 // Assuming these functions exist in the global scope or are imported
@@ -1319,8 +1346,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 closeExporthModal();
                 closeImportModal()
             }
-            buildStatsLists(); // Ensure lists are built before displaying
-            displayStats();
+            openStatsModal(); // Builds the lists before displaying
         }
     });
 
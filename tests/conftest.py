@@ -0,0 +1,11 @@
+# tests/conftest.py
+"""Shared setup: the app's modules are flat top-level files, imported the way browse_db.py imports them.
+globals.py creates its data/ directories under the working directory at import time, so the tests run
+from a scratch directory instead of the checkout."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix='researchparsa-tests-'))
@@ -0,0 +1,311 @@
+# tests/test_browse_db.py
+import hashlib
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+
+import openpyxl
+import pytest
+import zstandard as zstd
+
+import backups
+import browse_db
+import db_pool
+import globals
+import import_bibtex
+import migrations
+
+
+def import_text(text):
+    bib_path = os.path.join(globals.DATA_DIR, 'import.bib')
+    with open(bib_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    try:
+        import_bibtex.import_bibtex(bib_path, browse_db.DATABASE, jobs=1)
+    finally:
+        os.unlink(bib_path)
+
+
+def paper_ids():
+    conn = browse_db.get_db_connection()
+    try:
+        return sorted(row['id'] for row in conn.execute("SELECT id FROM papers"))
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def client():
+    db_path = os.path.join(globals.DATA_DIR, 'db.sqlite')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
+    db_pool.get_pool(db_path).close_all()
+    browse_db.DATABASE = db_path
+    import_bibtex.create_database(db_path)
+    import_text("@article{first, title={First paper}, author={Doe, Jane}, year=2020}\n")
+    browse_db.app.config['TESTING'] = True
+    with browse_db.app.test_client() as client:
+        yield client
+
+
+def make_backup(client):
+    response = client.get('/backup')
+    assert response.status_code == 200
+    return response.get_data()
+
+
+def archive_contents(archive):
+    with zstd.ZstdDecompressor().stream_reader(io.BytesIO(archive)) as reader:
+        with tarfile.open(fileobj=reader, mode='r|') as tar:
+            return {member.name: tar.extractfile(member).read() for member in tar if member.isfile()}
+
+
+def test_backup_hashes_pdfs_while_streaming(client):
+    os.makedirs(globals.PDF_STORAGE_DIR, exist_ok=True)
+    for name, data in (('a.pdf', b'%PDF-a'), ('b.pdf', b'%PDF-b')):
+        with open(os.path.join(globals.PDF_STORAGE_DIR, name), 'wb') as f:
+            f.write(data)
+    contents = archive_contents(make_backup(client))
+    manifest = json.loads(contents[backups.MANIFEST_NAME])
+    assert manifest['files']['data/pdf/a.pdf']['sha256'] == hashlib.sha256(b'%PDF-a').hexdigest()
+
+    with open(os.path.join(globals.PDF_STORAGE_DIR, 'b.pdf'), 'wb') as f:
+        f.write(b'%PDF-b, edited')
+    response = client.get('/backup?mode=incremental')
+    contents = archive_contents(response.get_data())
+    assert [name for name in contents if name.startswith('data/pdf/')] == ['data/pdf/b.pdf']
+    manifest = json.loads(contents[backups.MANIFEST_NAME])
+    assert manifest['files']['data/pdf/b.pdf']['sha256'] == hashlib.sha256(b'%PDF-b, edited').hexdigest()
+    assert manifest['files']['data/pdf/a.pdf']['sha256'] == hashlib.sha256(b'%PDF-a').hexdigest()
+
+
+def test_restore_from_multipart_chain_replaces_data(client):
+    archive = make_backup(client)
+    import_text("@article{second, title={Second paper}, author={Roe, Rick}, year=2021}\n")
+    assert paper_ids() == ['first', 'second']
+
+    response = client.post('/restore', data={'backup_file': (io.BytesIO(archive), 'full' + backups.BACKUP_EXTENSION)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    assert paper_ids() == ['first']
+    assert os.path.exists(os.path.join(globals.PREVIOUS_DATA_DIR, 'db.sqlite'))
+
+
+def test_restore_rejects_wrong_extension(client):
+    response = client.post('/restore', data={'backup_file': (io.BytesIO(b'not an archive'), 'backup.zip')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert paper_ids() == ['first']
+
+
+def test_restore_waits_for_checked_out_connections(client):
+    archive = make_backup(client)
+    holder = browse_db.get_db_connection()   # A request still reading the old database
+    finished = threading.Event()
+    results = []
+
+    def restore():
+        with browse_db.app.test_client() as other:
+            results.append(other.post('/restore', data=archive, content_type='application/zstd').status_code)
+        finished.set()
+
+    thread = threading.Thread(target=restore)
+    thread.start()
+    time.sleep(0.5)
+    assert not finished.is_set()
+    holder.close()
+    thread.join(10)
+    assert results == [200]
+
+
+def test_restore_after_a_failed_request(client):
+    archive = make_backup(client)
+    assert client.post('/update_paper', json={'id': 'first', 'no_such_column': 1}).status_code == 500
+    assert client.post('/restore', data=archive, content_type='application/zstd').status_code == 200
+
+
+def test_restore_skips_connections_of_exited_threads(client):
+    archive = make_backup(client)
+    thread = threading.Thread(target=browse_db.get_db_connection)   # Exits without releasing it
+    thread.start()
+    thread.join()
+    assert client.post('/restore', data=archive, content_type='application/zstd').status_code == 200
+    assert db_pool.get_pool(browse_db.DATABASE)._in_use == 0
+
+
+def test_restore_cancels_running_import(client, monkeypatch):
+    archive = make_backup(client)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_chunks(bib_file, default_is_survey_value, report, jobs=1):
+        for key in ('slow1', 'slow2'):
+            started.set()
+            release.wait(10)
+            report['total'] += 1
+            yield [import_bibtex.normalize_entry({'ID': key, 'ENTRYTYPE': 'article', 'title': key})]
+
+    monkeypatch.setattr(import_bibtex, 'iter_normalized_rows', slow_chunks)
+    jobs = browse_db.get_import_jobs()
+    bib_path = os.path.join(globals.DATA_DIR, 'queued.bib')
+    open(bib_path, 'w').close()
+    job = jobs.submit(bib_path, 'queued.bib', 'bib')
+    assert started.wait(10)
+
+    restore_results = []
+
+    def restore():
+        with browse_db.app.test_client() as other:
+            restore_results.append(other.post('/restore', data=archive, content_type='application/zstd').status_code)
+
+    thread = threading.Thread(target=restore)
+    thread.start()
+    time.sleep(0.2)
+    release.set()
+    thread.join(10)
+    assert restore_results == [200]
+    assert jobs.get(job['id'])['status'] == 'cancelled'
+    assert paper_ids() == ['first']   # Nothing from the cancelled import reached the restored database
+
+
+def test_restore_moves_revision_past_the_old_one(client):
+    archive = make_backup(client)
+    import_text("@article{second, title={Second paper}, author={Roe, Rick}, year=2021}\n")
+    conn = browse_db.get_db_connection()
+    old_revision = migrations.get_revision(conn)
+    conn.close()
+
+    assert client.post('/restore', data=archive, content_type='application/zstd').status_code == 200
+    conn = browse_db.get_db_connection()
+    assert migrations.get_revision(conn) > old_revision
+    conn.close()
+
+
+def test_failed_update_returns_its_connection_to_the_pool(client):
+    response = client.post('/update_paper', json={'id': 'first', 'no_such_column': 1})
+    assert response.status_code == 500
+    assert db_pool.get_pool(browse_db.DATABASE)._in_use == 0
+
+
+def test_etag_changes_when_data_changes(client):
+    first = client.get('/')
+    etag = first.headers['ETag'].strip('"')
+    assert client.get('/', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+
+    import_text("@article{second, title={Second paper}, author={Roe, Rick}, year=2021}\n")
+    second = client.get('/', headers={'If-None-Match': f'"{etag}"'})
+    assert second.status_code == 200
+    assert second.headers['ETag'].strip('"') != etag
+
+
+def test_etag_changes_after_restore(client):
+    archive = make_backup(client)
+    etag = client.get('/').headers['ETag']
+    assert client.post('/restore', data=archive, content_type='application/zstd').status_code == 200
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_search_results_survive_vacuum(client):
+    import_text("@article{second, title={Solder joint inspection}, author={Roe, Rick}, year=2021}\n"
+                "@article{third, title={Wire bonding}, author={Poe, Pat}, year=2022}\n")
+    assert client.delete('/delete_paper/first').status_code == 200
+    conn = browse_db.get_db_connection()
+    conn.execute("VACUUM")
+    assert conn.execute("SELECT COUNT(*) FROM papers WHERE rowid != paper_rowid").fetchone()[0] == 0
+    conn.close()
+    results = client.get('/search?q=solder').get_json()['results']
+    assert [result['id'] for result in results] == ['second']
+
+
+def test_title_windows_ignore_case_like_the_client_sort(client):
+    import_text("@article{b, title={apple pie}, author={Roe, Rick}, year=2021}\n"
+                "@article{c, title={Banana split}, author={Poe, Pat}, year=2022}\n")
+    titles, cursor = [], None
+    while True:
+        papers, total, cursor = browse_db.fetch_papers_page(hide_offtopic=False, sort_by='title', sort_dir='ASC',
+                                                            cursor=cursor, limit=1)
+        titles.extend(paper['title'] for paper in papers)
+        if cursor is None:
+            break
+    assert titles == ['apple pie', 'Banana split', 'First paper']
+
+
+def test_duplicates_only_read_while_a_write_is_running(client):
+    import_text("@article{second, title={Automated optical inspection of solder joints}, year=2021}\n"
+                "@article{third, title={Wire bonding reliability in power modules}, year=2021}\n")
+    response = client.post('/update_paper', json={'id': 'third', 'title': 'Automated Optical Inspection of Solder-Joints'})
+    assert response.get_json()['status'] == 'success'
+
+    results = []
+    writer_holds_lock = threading.Event()
+    release = threading.Event()
+
+    def writer():
+        with db_pool.write_lock():
+            writer_holds_lock.set()
+            release.wait(10)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    writer_holds_lock.wait(10)
+    reader = threading.Thread(target=lambda: results.append(browse_db.app.test_client().get('/duplicates').get_json()))
+    reader.start()
+    reader.join(10)
+    release.set()
+    thread.join()
+    assert results, "GET /duplicates waited for the write lock"
+    assert [sorted(paper['id'] for paper in cluster['papers']) for cluster in results[0]['clusters']] == [['second', 'third']]
+
+
+def test_xlsx_export_streams_rows_with_measured_widths(client):
+    import_text("@article{second, title={A much longer title for the second paper}, author={Roe, Rick}, year=2021}\n")
+    response = client.get('/xlsx_export?hide_offtopic=0&year_from=0&year_to=9999&min_page_count=0')
+    assert response.status_code == 200
+    sheet = openpyxl.load_workbook(io.BytesIO(response.get_data())).active
+    titles = [row[1] for row in sheet.iter_rows(min_row=2, values_only=True)]
+    assert sorted(titles) == ['A much longer title for the second paper', 'First paper']
+    assert sheet.column_dimensions['B'].width == len('A much longer title for the second paper') + 2
+    assert sheet.tables['PapersTable'].ref == 'A1:M3'
+
+
+def export_payload(papers):
+    return json.loads(''.join(browse_db.iter_export_payload_json(papers)))
+
+
+def test_export_payload_carries_server_bibtex(client):
+    papers = browse_db.fetch_papers(hide_offtopic=False)
+    bibtex = [entry for chunk in export_payload(papers)['chunks'] for entry in chunk['bibtex']]
+    assert bibtex == [browse_db.generate_bibtex_string(paper) for paper in papers]
+    assert '@article{first,' in bibtex[0]
+
+
+def test_export_payload_is_written_while_papers_are_read(client, monkeypatch):
+    monkeypatch.setattr(browse_db, 'EXPORT_PAYLOAD_CHUNK_SIZE', 2)
+    import_text("@article{second, title={Second paper}, author={Roe, Rick}, journal={J}, year=2021}\n"
+                "@article{third, title={Third paper}, author={Roe, Rick}, journal={J}, year=2022}\n")
+    read = []
+    def papers():
+        for paper in browse_db.iter_papers(False, 0, 9999, 0):
+            read.append(paper['id'])
+            yield paper
+    pieces = browse_db.iter_export_payload_json(papers())
+    next(pieces)            # Header
+    next(pieces)            # First chunk
+    assert len(read) == 2   # The third paper is not read yet
+    list(pieces)
+    assert len(read) == 3
+
+    payload = export_payload(browse_db.iter_papers(False, 0, 9999, 0))
+    assert [len(chunk['id']) for chunk in payload['chunks']] == [2, 1]
+    assert sorted(payload['dicts']['journals']) == ['', 'J']
+
+
+def test_export_payload_of_no_papers_has_the_column_names(client):
+    payload = export_payload([])
+    assert len(payload['chunks']) == 1 and payload['chunks'][0]['id'] == []
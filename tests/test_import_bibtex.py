@@ -0,0 +1,120 @@
+# tests/test_import_bibtex.py
+import io
+
+import pytest
+
+import import_bibtex
+
+
+def split_blocks(text, read_size=import_bibtex.STREAM_READ_SIZE):
+    report = import_bibtex.new_import_report()
+    blocks = list(import_bibtex.iter_bibtex_blocks(io.StringIO(text), read_size=read_size, report=report))
+    return blocks, report
+
+
+@pytest.mark.parametrize('read_size', [3, 17, 1 << 20])
+def test_unbalanced_brace_only_drops_its_own_entry(read_size):
+    text = ("@article{a, title={One}, year=2020}\n"
+            "@article{b, title={Two {broken}, year=2021}\n"
+            "@article{c, title={Three}, year=2022}\n"
+            "@article{d, title={Four}, year=2023}\n")
+    blocks, report = split_blocks(text, read_size)
+    assert [block[:10] for block in blocks] == ['@article{a', '@article{c', '@article{d']
+    assert report['failed'] == 1
+    assert "@article{b" in report['errors'][0]
+
+
+def test_unterminated_last_entry_is_reported():
+    blocks, report = split_blocks("@article{a, title={One}}\n@article{b, title={Two}\n")
+    assert blocks == ['@article{a, title={One}}']
+    assert report['failed'] == 1
+
+
+@pytest.mark.parametrize('read_size', [5, 1 << 20])
+def test_delimiters_inside_quoted_values_are_ignored(read_size):
+    text = ('@misc(d, title="Has ) paren", note={x})\n'
+            '@article{e, title="Sch\\"on } brace", year=2023}\n'
+            '@comment{He said "hi}\n')
+    blocks, report = split_blocks(text, read_size)
+    assert blocks == ['@misc(d, title="Has ) paren", note={x})',
+                      '@article{e, title="Sch\\"on } brace", year=2023}',
+                      '@comment{He said "hi}']
+    assert report['failed'] == 0
+
+
+def test_import_keeps_entries_after_a_broken_one(tmp_path):
+    bib = tmp_path / 'papers.bib'
+    bib.write_text("@article{a, title={First paper title}, year=2020}\n"
+                   "@article{b, title={Second {paper title}, year=2021}\n"
+                   "@article{c, title={Third paper title}, year=2022}\n"
+                   "@article{d, title={Fourth paper title}, year=2023}\n", encoding='utf-8')
+    report = import_bibtex.import_bibtex(str(bib), str(tmp_path / 'papers.sqlite'))
+    assert report['imported'] == 3
+    assert report['failed'] == 1
+
+
+def make_row(key, title):
+    return import_bibtex.normalize_entry({'ENTRYTYPE': 'article', 'ID': key, 'title': title, 'year': '2020'})
+
+
+def test_failed_batch_is_retried_row_by_row_without_double_inserts(tmp_path):
+    db_path = str(tmp_path / 'papers.sqlite')
+    import_bibtex.create_database(db_path)
+    conn = import_bibtex.sqlite3.connect(db_path)
+    conn.execute("BEGIN IMMEDIATE")
+    # The third row repeats the first id: executemany fails after inserting the first two
+    batch = [make_row('a', 'First title'), make_row('b', 'Second title'), make_row('a', 'Clash'),
+             make_row('c', 'Third title')]
+    report = import_bibtex.new_import_report()
+    import_bibtex._insert_batch(conn, batch, report)
+    conn.commit()
+    assert report['imported'] == 3
+    assert report['failed'] == 1
+    assert len(report['errors']) == 1
+    rows = conn.execute("SELECT id, title FROM papers WHERE id != '1' ORDER BY id").fetchall()
+    assert rows == [('a', 'First title'), ('b', 'Second title'), ('c', 'Third title')]
+    conn.close()
+
+
+def test_other_writers_are_not_blocked_while_the_next_chunk_is_parsed(tmp_path):
+    db_path = str(tmp_path / 'papers.sqlite')
+    import_bibtex.create_database(db_path)
+    writer_results = []
+
+    def concurrent_write():
+        conn = import_bibtex.db_pool.get_connection(db_path)
+        try:
+            with import_bibtex.db_pool.write_lock():
+                conn.execute("UPDATE papers SET user_trace = 'edited' WHERE id = 'a'")
+                conn.commit()
+            writer_results.append('ok')
+        except import_bibtex.sqlite3.Error as e:
+            writer_results.append(str(e))
+        finally:
+            conn.close()
+
+    def row_chunks():
+        yield [make_row('a', 'First title')]
+        # "Parsing" the second chunk: an edit from another thread must get through right away
+        thread = import_bibtex.db_pool.threading.Thread(target=concurrent_write)
+        thread.start()
+        thread.join(timeout=2)
+        yield [make_row('b', 'Second title')]
+
+    report = import_bibtex.run_bulk_import(db_path, row_chunks(), import_bibtex.new_import_report())
+    assert report['imported'] == 2
+    assert writer_results == ['ok']
+    conn = import_bibtex.sqlite3.connect(db_path)
+    assert conn.execute("SELECT user_trace FROM papers WHERE id = 'a'").fetchone() == ('edited',)
+    conn.close()
+
+
+def test_title_duplicates_are_skipped_even_with_a_doi(tmp_path):
+    bib = tmp_path / 'papers.bib'
+    bib.write_text("@article{a, title={Deep Learning for PCB Inspection}, year=2020}\n"
+                   "@article{b, title={Deep learning for {PCB} inspection.}, year=2020, doi={10.1000/b}}\n"
+                   "@article{c, title={Deep Learning for PCB Inspection}, year=2021, doi={10.1000/c}}\n",
+                   encoding='utf-8')
+    report = import_bibtex.import_bibtex(str(bib), str(tmp_path / 'papers.sqlite'))
+    assert report['imported'] == 1
+    assert report['skipped_duplicate'] == 2